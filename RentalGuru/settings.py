@@ -411,3 +411,30 @@ RENT_REQUEST_EXPIRATION_HOURS = 24
 
 # Время на отмену поездки с возвратом средств
 CANCELLATION_REFUND_LIMIT_HOURS = 48
+
+# Фильтрация каталога по денормализованной таблице VehicleSearchIndex
+# (включать после заполнения таблицы командой rebuild_search_index)
+VEHICLE_SEARCH_INDEX_ENABLED = getenv('VEHICLE_SEARCH_INDEX_ENABLED', 'False') == 'True'
+
+# Интервал (сек) записи буферизованных GPS-координат из Redis в базу
+GPS_FLUSH_INTERVAL = int(getenv('GPS_FLUSH_INTERVAL', '10'))
+# Окно объединения точек трекера в GPSTrackingConsumer (сек), максимум рассылок в секунду на транспорт
+# и минимальное смещение (м), меньше которого точка считается дублем
+GPS_COALESCE_WINDOW = float(getenv('GPS_COALESCE_WINDOW', '1'))
+GPS_MAX_UPDATES_PER_SECOND = float(getenv('GPS_MAX_UPDATES_PER_SECOND', '2'))
+GPS_MIN_DISTANCE_METERS = float(getenv('GPS_MIN_DISTANCE_METERS', '5'))
+
+# Присутствие в чатах (Redis): интервал heartbeat соединения и время (сек), после которого соединение без
+# heartbeat считается отключенным
+CHAT_PRESENCE_HEARTBEAT = int(getenv('CHAT_PRESENCE_HEARTBEAT', '30'))
+CHAT_PRESENCE_TTL = int(getenv('CHAT_PRESENCE_TTL', '90'))
+
+# Загрузка файлов в чат бинарными кадрами WebSocket: максимальный размер файла, размер кадра, время жизни
+# незавершенной загрузки (сек) и каталог временных файлов (должен быть общим для всех ASGI-воркеров)
+CHAT_UPLOAD_MAX_SIZE = int(getenv('CHAT_UPLOAD_MAX_SIZE', str(50 * 1024 * 1024)))
+CHAT_UPLOAD_CHUNK_SIZE = int(getenv('CHAT_UPLOAD_CHUNK_SIZE', str(256 * 1024)))
+CHAT_UPLOAD_TTL = int(getenv('CHAT_UPLOAD_TTL', str(24 * 60 * 60)))
+CHAT_UPLOAD_TMP_DIR = getenv('CHAT_UPLOAD_TMP_DIR', str(BASE_DIR / 'media' / 'tmp' / 'chat_uploads'))
+
+# Окно (сек), в течение которого новые сообщения чата объединяются в одно уведомление оффлайн-участнику
+CHAT_NOTIFICATION_WINDOW = int(getenv('CHAT_NOTIFICATION_WINDOW', '300'))
@@ -0,0 +1,71 @@
+"""
+Версионированный кэш ответов справочников.
+
+Для каждой модели в Redis хранится ключ версии, который увеличивается сигналами post_save/post_delete.
+Ответ list() сохраняется вместе с ETag, вычисленным из версий моделей и запроса, поэтому повторная загрузка —
+это один MGET (версии + ответ), а клиент с актуальным If-None-Match получает пустой 304.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def cache_version_key(model):
+    return f'response_cache:version:{model._meta.label_lower}'
+
+
+def bump_cache_version(model):
+    """ Новая версия справочника: все закэшированные ответы и ETag по этой модели становятся неактуальными """
+    cache.set(cache_version_key(model), time.time_ns(), timeout=None)
+
+
+class CachedListMixin:
+    """
+    Кэширование ответа list() для ListAPIView справочников.
+    cache_models — модели, от которых зависит ответ (по умолчанию модель queryset).
+    """
+    cache_models = None
+    cache_timeout = RESPONSE_CACHE_TIMEOUT
+
+    def get_cache_models(self):
+        return self.cache_models or [self.queryset.model]
+
+    def get_response_cache_key(self, request):
+        path_hash = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+        return f'response_cache:{self.__class__.__name__}:{path_hash}'
+
+    def get_etag(self, request, versions):
+        # Ответ переводится TranslationMiddleware; при пустом lang язык берется из профиля пользователя
+        language = getattr(request.user, 'language_id', None) if 'lang' in request.GET else None
+        raw = f'{request.get_full_path()}:{versions}:{language}'
+        return f'"{hashlib.md5(raw.encode("utf-8")).hexdigest()}"'
+
+    def list(self, request, *args, **kwargs):
+        version_keys = [cache_version_key(model) for model in self.get_cache_models()]
+        response_key = self.get_response_cache_key(request)
+
+        cached = cache.get_many(version_keys + [response_key])
+        versions = [cached.get(key) for key in version_keys]
+        if None in versions:
+            for key, version in zip(version_keys, versions):
+                if version is None:
+                    cache.add(key, time.time_ns(), timeout=None)
+            versions = [cache.get(key) for key in version_keys]
+
+        etag = self.get_etag(request, versions)
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        entry = cached.get(response_key)
+        if entry and entry.get('versions') == versions:
+            data = entry['data']
+        else:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(response_key, {'versions': versions, 'data': data}, timeout=self.cache_timeout)
+
+        return Response(data, headers={'ETag': etag})
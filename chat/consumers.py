@@ -1,3 +1,4 @@
+import asyncio
 import base64
 import io
 import logging
@@ -5,8 +6,10 @@ from decimal import Decimal
 
 from asgiref.sync import sync_to_async
 from django.contrib.contenttypes.models import ContentType
+from django.core.files import File
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
@@ -19,7 +22,10 @@ from RentalGuru.settings import HOST_URL
 from chat.models import MessageSupport, ChatSupport, Message, Chat, IssueSupport
 from manager.permissions import WebSocketPermissionChecker
 from notification.models import Notification
-from .tasks import translate_message
+from . import presence, uploads
+from .notifications import notify_new_message
+from .tasks import translate_messages
+from .translation import get_cached_translations
 import re
 
 TRANSACTION_MESSAGE_PATTERN = re.compile(
@@ -29,17 +35,23 @@ TRANSACTION_MESSAGE_PATTERN = re.compile(
     r'"deposit_cost"\s*:\s*\d+(\.\d+)?\s*,\s*"delivery_cost"\s*:\s*\d+(\.\d+)?\s*,\s*"delivery"\s*:\s*(true|false)'
 )
 
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
 logger = logging.getLogger(__name__)
 
 
 class BaseChatConsumer(AsyncWebsocketConsumer):
-    """ Базовый чат от кторого наследуются чат на аренду и чат с техподдержкой"""
-    language_preferences = {}
-    connected_users = {}
+    """
+    Базовый чат от кторого наследуются чат на аренду и чат с техподдержкой.
+    Онлайн-пользователи и языки соединений хранятся в Redis (chat/presence.py) и общие для всех воркеров.
+    """
 
     async def connect(self):
         self.chat_id = self.scope['url_route']['kwargs']['chat_id']
         self.chat_group_name = f'chat_{self.chat_id}'
+        self.heartbeat_task = None
+        self.upload = None
 
         query_params = dict(x.split('=') for x in self.scope['query_string'].decode().split('&'))
         token = query_params.get('token')
@@ -57,14 +69,8 @@ class BaseChatConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
 
-        if self.chat_group_name not in BaseChatConsumer.language_preferences:
-            BaseChatConsumer.language_preferences[self.chat_group_name] = {}
-
-        BaseChatConsumer.language_preferences[self.chat_group_name][self.channel_name] = self.language
-
-        if self.chat_group_name not in BaseChatConsumer.connected_users:
-            BaseChatConsumer.connected_users[self.chat_group_name] = set()
-        BaseChatConsumer.connected_users[self.chat_group_name].add(self.scope['user'].id)
+        await presence.join(self.chat_group_name, self.channel_name, self.scope['user'].id, self.language)
+        self.heartbeat_task = asyncio.create_task(self.presence_heartbeat())
 
         await self.channel_layer.group_add(
             self.chat_group_name,
@@ -74,6 +80,16 @@ class BaseChatConsumer(AsyncWebsocketConsumer):
         await self.accept()
         await self.send_previous_messages()
 
+    async def presence_heartbeat(self):
+        """ Продление присутствия соединения, пока оно открыто """
+        while True:
+            await asyncio.sleep(presence.get_heartbeat_interval())
+            try:
+                await presence.heartbeat(self.chat_group_name, self.channel_name, self.scope['user'].id,
+                                         self.language)
+            except Exception as e:
+                logger.error(f"Error updating chat presence: {str(e)}")
+
     @database_sync_to_async
     def get_user_from_token(self, token):
         """ Проверка токена """
@@ -81,37 +97,21 @@ class BaseChatConsumer(AsyncWebsocketConsumer):
         return JWTAuthentication().get_user(validated_token)
 
     async def disconnect(self, close_code):
-        if self.chat_group_name in BaseChatConsumer.language_preferences:
-            BaseChatConsumer.language_preferences[self.chat_group_name].pop(self.channel_name, None)
-            if not BaseChatConsumer.language_preferences[self.chat_group_name]:
-                BaseChatConsumer.language_preferences.pop(self.chat_group_name, None)
-
-        if hasattr(self, 'scope') and 'user' in self.scope and self.chat_group_name in BaseChatConsumer.connected_users:
-            BaseChatConsumer.connected_users[self.chat_group_name].discard(self.scope['user'].id)
-            if not BaseChatConsumer.connected_users[self.chat_group_name]:
-                BaseChatConsumer.connected_users.pop(self.chat_group_name, None)
+        if getattr(self, 'heartbeat_task', None):
+            self.heartbeat_task.cancel()
+            await presence.leave(self.chat_group_name, self.channel_name)
 
         await self.channel_layer.group_discard(
             self.chat_group_name,
             self.channel_name
         )
 
-    async def fetch_messages(self, offset=0, limit=20):
-        """ Получение сообщений с пагинацией """
-        chat = self.get_chat_instance()
-        messages_queryset = self.get_messages_queryset(chat)
-
-        messages = await database_sync_to_async(lambda: list(
-            messages_queryset.order_by('-timestamp')[offset:offset + limit]
-        ))()
-
-        formatted_messages = [
-            self.format_message(message, self.scope['user']) for message in messages
-        ]
-        return formatted_messages
+    async def receive(self, text_data=None, bytes_data=None):
+        """ Обработка сообщений в сокете; бинарные кадры — части загружаемого файла """
+        if bytes_data is not None:
+            await self.handle_upload_chunk(bytes_data)
+            return
 
-    async def receive(self, text_data):
-        """ Обработка сообщений в сокете """
         try:
             data = json.loads(text_data)
 
@@ -123,16 +123,22 @@ class BaseChatConsumer(AsyncWebsocketConsumer):
                 return
 
             if data['type'] == 'load_previous_messages':
+                before = data.get('before')
                 offset = data.get('offset', 0)
-                limit = data.get('limit', 20)
-                previous_messages = await self.load_previous_messages(offset, limit)
+                limit = data.get('limit', HISTORY_PAGE_SIZE)
+                previous_messages, has_more = await self.load_previous_messages(before, limit, offset)
                 await self.send(text_data=json.dumps({
                     'type': 'previous_messages',
                     'messages': previous_messages,
+                    'has_more': has_more,
+                    'before': previous_messages[0]['id'] if previous_messages else None,
                 }))
             elif data['type'] == "mark_as_read":
                 await self.mark_message_as_read(data)
 
+            elif data['type'] == 'upload_start':
+                await self.handle_upload_start(data)
+
             elif 'message' in data and isinstance(data['message'], str):
                 await self.handle_send_message({'message': data['message']})
                 return
@@ -183,13 +189,91 @@ class BaseChatConsumer(AsyncWebsocketConsumer):
                 'message': 'Internal server error'
             }))
 
-    async def handle_send_message(self, data):
+    async def handle_upload_start(self, data):
+        """ Начало или продолжение загрузки файла бинарными кадрами """
+        try:
+            self.upload = await sync_to_async(uploads.start_upload, thread_sensitive=False)(
+                self.scope['user'].id, self.chat_group_name, data.get('name'), data.get('content_type'),
+                data.get('size'), content=data.get('content', ''), upload_id=data.get('upload_id')
+            )
+        except uploads.UploadError as e:
+            self.upload = None
+            await self.send(text_data=json.dumps({'type': 'upload_error', 'message': str(e)}))
+            return
+
+        await self.send(text_data=json.dumps({
+            'type': 'upload_ready',
+            'upload_id': self.upload['upload_id'],
+            'offset': self.upload['offset'],
+            'chunk_size': uploads.get_chunk_size(),
+        }))
+        if uploads.is_complete(self.upload):
+            await self.finish_upload()
+
+    async def handle_upload_chunk(self, chunk):
+        """ Запись кадра во временный файл; после последнего кадра создается сообщение с файлом """
+        if self.upload is None:
+            await self.send(text_data=json.dumps({'type': 'upload_error', 'message': 'No active upload'}))
+            return
+        try:
+            offset = await sync_to_async(uploads.append_chunk, thread_sensitive=False)(self.upload, chunk)
+        except (uploads.UploadError, OSError) as e:
+            await self.send(text_data=json.dumps({
+                'type': 'upload_error',
+                'upload_id': self.upload['upload_id'],
+                'message': str(e),
+            }))
+            return
+
+        await self.send(text_data=json.dumps({
+            'type': 'upload_progress',
+            'upload_id': self.upload['upload_id'],
+            'offset': offset,
+        }))
+        if uploads.is_complete(self.upload):
+            await self.finish_upload()
+
+    async def finish_upload(self):
+        upload, self.upload = self.upload, None
+        file_field = self.get_messages_objects()._meta.get_field('file')
+        name = await self.get_upload_storage_name(upload['name'])
+
+        def store():
+            with open(upload['path'], 'rb') as source:
+                return file_field.storage.save(name, File(source, name=upload['name']))
+
+        # Копирование файла в хранилище идет в отдельном потоке, а не в общем потоке базы данных воркера:
+        # запись большого файла не задерживает запросы других чатов
+        try:
+            stored_name = await sync_to_async(store, thread_sensitive=False)()
+        except OSError as e:
+            logger.error(f"Error storing uploaded file: {e}")
+            stored_name = None
+
+        sent = False
+        if stored_name:
+            sent = await self.handle_send_message({'content': upload['content']}, file=stored_name)
+            if sent:
+                await sync_to_async(uploads.discard_upload, thread_sensitive=False)(upload)
+            else:
+                await sync_to_async(file_field.storage.delete, thread_sensitive=False)(stored_name)
+        await self.send(text_data=json.dumps({
+            'type': 'upload_complete' if sent else 'upload_error',
+            'upload_id': upload['upload_id'],
+        }))
+
+    @database_sync_to_async
+    def get_upload_storage_name(self, file_name):
+        """ Имя файла в хранилище по upload_to поля file сообщения этого чата """
+        message = self.get_messages_objects()(chat=self.get_chat_instance())
+        return message._meta.get_field('file').generate_filename(message, file_name)
+
+    async def handle_send_message(self, data, file=None):
         message_content = data.get('message') if isinstance(data.get('message'), str) else data.get('content', '')
         user = self.scope['user']
 
         base64_file = data.get('file')
-        file = None
-        if base64_file:
+        if base64_file and file is None:
             try:
                 file_data = base64.b64decode(base64_file.split(',')[-1])
                 file_name = data.get('name', 'unnamed_file')
@@ -230,10 +314,14 @@ class BaseChatConsumer(AsyncWebsocketConsumer):
             )
             # Запуск асинхронных переводов для всех языков в группе
             if not TRANSACTION_MESSAGE_PATTERN.search(json.dumps(message_data)):
-                if self.chat_group_name in BaseChatConsumer.language_preferences:
-                    for channel, lang in BaseChatConsumer.language_preferences[self.chat_group_name].items():
-                        if lang != 'original' and lang != self.language and channel != self.channel_name:
-                            translate_message.delay(message.id, message_content, lang, channel)
+                channels_by_language = {}
+                languages = await presence.channel_languages(self.chat_group_name)
+                for channel, lang in languages.items():
+                    if lang != 'original' and lang != self.language and channel != self.channel_name:
+                        channels_by_language.setdefault(lang, []).append(channel)
+                # Одна задача на язык, а не на каждое соединение
+                for lang, channels in channels_by_language.items():
+                    translate_messages.delay([[message.id, message_content]], lang, channels)
 
             return True
         except Exception as e:
@@ -248,9 +336,9 @@ class BaseChatConsumer(AsyncWebsocketConsumer):
         """ Создание уведомлений для оффлайн пользователей """
 
         chat_participants = await self.get_chat_participants()
-        connected_users = BaseChatConsumer.connected_users.get(self.chat_group_name, set())
-        offline_users = [user_id for user_id in chat_participants if
-                         user_id != sender_id and user_id not in connected_users]
+        offline_users = await presence.offline_user_ids(
+            self.chat_group_name, [user_id for user_id in chat_participants if user_id != sender_id]
+        )
 
         if offline_users:
             await self.create_notifications_for_users(offline_users)
@@ -269,18 +357,8 @@ class BaseChatConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def create_notifications_for_users(self, user_ids):
-        """ Создание уведомления """
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-
-        users = User.objects.filter(id__in=user_ids)
-        for user in users:
-            notification = Notification.objects.create(
-                user=user,
-                content="Получено новое сообщение"
-            )
-            # Отправляем push-уведомление
-            notification.send_notification()
+        """ Создание уведомлений одним bulk_create с объединением сообщений чата в окне (chat/notifications.py) """
+        notify_new_message(self.chat_group_name, user_ids)
 
     async def handle_update_message(self, data):
         try:
@@ -325,10 +403,18 @@ class BaseChatConsumer(AsyncWebsocketConsumer):
             logger.error(f"Error deleting message: {str(e)}")
             return False
 
-    async def load_previous_messages(self, offset, limit):
-        """ Загрузка предыдущих сообщений с учетом offset и limit """
-        messages = await self.get_previous_messages(offset, limit)
-        return messages
+    async def load_previous_messages(self, before=None, limit=HISTORY_PAGE_SIZE, offset=0):
+        """
+        Загрузка сообщений, отправленных раньше сообщения before (курсор — id самого старого загруженного
+        сообщения). Без before возвращается последняя страница; offset оставлен для старых клиентов.
+        """
+        try:
+            before = int(before) if before is not None else None
+            limit = min(max(int(limit), 1), HISTORY_MAX_PAGE_SIZE)
+            offset = max(int(offset or 0), 0)
+        except (TypeError, ValueError):
+            return [], False
+        return await self.get_previous_messages(before, limit, offset)
 
     @database_sync_to_async
     def save_message(self, user, message_content, file=None, language='ru'):
@@ -408,8 +494,11 @@ class BaseChatConsumer(AsyncWebsocketConsumer):
         return self.check_user_access(user, chat)
 
     @database_sync_to_async
-    def get_previous_messages(self, offset=0, limit=20):
-        """ Получение предыдущих сообщений с поддержкой пагинации """
+    def get_previous_messages(self, before=None, limit=HISTORY_PAGE_SIZE, offset=0):
+        """
+        Страница истории по ключу (timestamp, id): выборка идет по индексу (chat, -timestamp, -id) и не зависит
+        от глубины прокрутки. Возвращает (сообщения от старых к новым, есть ли еще более старые).
+        """
         chat = self.get_chat_instance()
         user = self.scope['user']
 
@@ -428,20 +517,47 @@ class BaseChatConsumer(AsyncWebsocketConsumer):
         if not show_all_messages:
             messages_queryset = messages_queryset.filter(deleted=False)
 
-        messages = messages_queryset.order_by('-timestamp')[offset:offset + limit]
+        if before is not None:
+            before_timestamp = self.get_messages_objects().objects.filter(
+                id=before, chat_id=chat.id
+            ).values_list('timestamp', flat=True).first()
+            if before_timestamp is None:
+                return [], False
+            # timestamp__lte дает верхнюю границу диапазона в условии индекса (chat, -timestamp, -id): из OR
+            # Postgres ее не выводит и без нее просматривает все более новые сообщения чата
+            messages_queryset = messages_queryset.filter(
+                Q(timestamp__lt=before_timestamp) | Q(timestamp=before_timestamp, id__lt=before),
+                timestamp__lte=before_timestamp,
+            )
+            offset = 0
+
+        messages = list(messages_queryset.order_by('-timestamp', '-id')[offset:offset + limit + 1])
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+
+        to_translate = [
+            message for message in messages
+            if (self.language != 'original' and
+                message.content and
+                self.language != getattr(message, 'language', 'ru') and
+                not TRANSACTION_MESSAGE_PATTERN.search(message.content))
+        ]
+        # Готовые переводы отдаются вместе со страницей, недостающие переводятся одной задачей
+        translations = get_cached_translations([message.content for message in to_translate], self.language)
+        missing = [[message.id, message.content] for message in to_translate if message.content not in translations]
+        translate_ids = {message.id for message in to_translate}
+        if missing:
+            translate_messages.delay(missing, self.language, [self.channel_name])
 
         message_data_list = []
 
         for message in reversed(messages):
             message_data = self.format_message(message, message.sender)
+            if message.id in translate_ids and message.content in translations:
+                message_data['translated_content'] = translations[message.content]
             message_data_list.append(message_data)
 
-            if (self.language != 'original' and
-                    self.language != getattr(message, 'language', 'ru') and
-                    not TRANSACTION_MESSAGE_PATTERN.search(message.content)):
-                translate_message.delay(message.id, message.content, self.language, self.channel_name)
-
-        return message_data_list
+        return message_data_list, has_more
 
     async def send_previous_messages(self):
         first_message = await self.get_first_message()
@@ -554,7 +670,11 @@ class ChatConsumer(BaseChatConsumer):
         self.connected_at = timezone.now()
         await super().connect()
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
+        if bytes_data is not None:
+            await super().receive(bytes_data=bytes_data)
+            return
+
         data = json.loads(text_data)
 
         if 'update_request_rent' in data:
@@ -810,8 +930,8 @@ class ChatConsumer(BaseChatConsumer):
         return chat.messages.order_by('timestamp').select_related(
             'sender'
         ).only(
-            'id', 'chat_id', 'sender_id', 'content', 'timestamp', 'file',
-            'sender__id', 'sender__first_name', 'sender__avatar', 'deleted'
+            'id', 'chat_id', 'sender_id', 'content', 'timestamp', 'file', 'deleted', 'is_read', 'language',
+            'sender__id', 'sender__first_name', 'sender__avatar'
         )
 
     def check_user_access(self, user, chat):
@@ -917,7 +1037,10 @@ class ChatSupportConsumer(BaseChatConsumer):
                                              language=language)
 
     def get_messages_queryset(self, chat):
-        return chat.message_support.select_related('sender').order_by('timestamp')
+        return chat.message_support.select_related('sender').only(
+            'id', 'chat_id', 'sender_id', 'content', 'timestamp', 'file', 'deleted', 'is_read', 'language',
+            'sender__id', 'sender__first_name', 'sender__avatar'
+        ).order_by('timestamp')
 
     def check_user_access(self, user, chat):
         if WebSocketPermissionChecker.check_chat_permission(user, chat):
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0029_alter_requestrent_promocode'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat', '-timestamp', '-id'], name='chat_message_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='messagesupport',
+            index=models.Index(fields=['chat', '-timestamp', '-id'], name='chat_msgsupport_history_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0030_message_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageTranslation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='SHA-256 текста')),
+                ('language', models.CharField(max_length=10, verbose_name='Язык перевода')),
+                ('translated_content', models.TextField(verbose_name='Перевод')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+            ],
+            options={
+                'verbose_name': 'Перевод сообщения',
+                'verbose_name_plural': 'Переводы сообщений',
+                'constraints': [models.UniqueConstraint(fields=('content_hash', 'language'), name='chat_translation_hash_lang_uniq')],
+            },
+        ),
+    ]
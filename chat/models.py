@@ -104,87 +104,15 @@ class RequestRent(models.Model):
 
     def calculate_rent_price(self):
         """Подсчитывает итоговую стоимость аренды с поддержкой почасовой оплаты."""
-        from vehicle.models import RentPrice
-        from datetime import datetime
-
-        # Если указано время аренды в пределах одного дня
-        if self.start_time and self.end_time and self.start_date and self.end_date and self.start_date == self.end_date:
-            start_datetime = datetime.combine(self.start_date, self.start_time)
-            end_datetime = datetime.combine(self.end_date, self.end_time)
-
-            if end_datetime <= start_datetime:
-                raise ValueError("Время окончания должно быть больше времени начала.")
-
-            total_duration = end_datetime - start_datetime
-            total_hours = total_duration.total_seconds() / 3600
-
-            # Если аренда >= 8 часов, пытаемся использовать дневной тариф
-            if total_hours >= 8:
-                daily_price = RentPrice.objects.filter(vehicle=self.vehicle, name='day').first()
-                if daily_price:
-                    # Есть дневной тариф - используем его (выгоднее для клиента)
-                    total_cost = float(daily_price.total)
-                    
-                    if self.delivery:
-                        total_cost += float(self.vehicle.price_delivery)
-                    
-                    return total_cost
-                else:
-                    # Нет дневного тарифа - ищем почасовой
-                    hourly_price = RentPrice.objects.filter(vehicle=self.vehicle, name='hour').first()
-                    if hourly_price:
-                        total_cost = total_hours * float(hourly_price.total)
-                        
-                        if self.delivery:
-                            total_cost += float(self.vehicle.price_delivery)
-                        
-                        return total_cost
-                    else:
-                        raise ValueError("Для аренды >= 8 часов требуется дневной или почасовой тариф.")
-            else:
-                # Меньше 8 часов - только почасовой тариф
-                hourly_price = RentPrice.objects.filter(vehicle=self.vehicle, name='hour').first()
-                if hourly_price:
-                    total_cost = total_hours * float(hourly_price.total)
-
-                    if self.delivery:
-                        total_cost += float(self.vehicle.price_delivery)
-
-                    return total_cost
-                else:
-                    raise ValueError("Для почасовой аренды (< 8 часов) требуется почасовой тариф.")
-
-        # Иначе используем оригинальную логику для дневных тарифов
-        rental_days = self.rental_days
-        if rental_days <= 0:
-            raise ValueError("Количество дней аренды должно быть положительным.")
-
-        period_priorities = [
-            ('year', 365),
-            ('month', 30),
-            ('week', 7),
-            ('day', 1),
-        ]
+        from vehicle.pricing import get_price_table, quote_rent
 
-        suitable_periods = [(period, days) for period, days in period_priorities if rental_days >= days]
-
-        if not suitable_periods:
-            raise ValueError("Не найден подходящий период аренды для текущего количества дней.")
-
-        for period, period_days in suitable_periods:
-            rent_price = RentPrice.objects.filter(vehicle=self.vehicle, name=period).first()
-            if rent_price:
-                break
-        else:
+        table = get_price_table(self.vehicle.pk)
+        if table is None:
             raise ValueError("Не найдена цена аренды для указанного транспортного средства.")
 
-        total_cost = (rental_days / period_days) * float(rent_price.total)
-
-        if self.delivery:
-            total_cost += float(self.vehicle.price_delivery)
-
-        return total_cost
-
+        quote = quote_rent(table, self.start_date, self.end_date, self.start_time, self.end_time,
+                           delivery=self.delivery, price_delivery=self.vehicle.price_delivery)
+        return quote['total_cost']
 
     def clean(self):
         super().clean()
@@ -387,6 +315,9 @@ class Message(models.Model):
     class Meta:
         verbose_name = 'Сообщение'
         verbose_name_plural = 'Сообщения'
+        indexes = [
+            models.Index(fields=['chat', '-timestamp', '-id'], name='chat_message_history_idx'),
+        ]
 
     def __str__(self):
         return self.content
@@ -455,6 +386,29 @@ class MessageSupport(models.Model):
     class Meta:
         verbose_name = 'Сообщение чата техподдержки'
         verbose_name_plural = 'Сообщения чата техподдержки'
+        indexes = [
+            models.Index(fields=['chat', '-timestamp', '-id'], name='chat_msgsupport_history_idx'),
+        ]
+
+    def __str__(self):
+        return self.content
+
+class MessageTranslation(models.Model):
+    """
+    Память переводов сообщений чатов. Ключ — хэш текста и язык перевода, поэтому одинаковые тексты (в том числе
+    в разных чатах и в чате техподдержки) переводятся один раз, а исправленное сообщение получает новый перевод.
+    """
+    content_hash = models.CharField(max_length=64, verbose_name='SHA-256 текста')
+    language = models.CharField(max_length=10, verbose_name='Язык перевода')
+    translated_content = models.TextField(verbose_name='Перевод')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создан')
+
+    class Meta:
+        verbose_name = 'Перевод сообщения'
+        verbose_name_plural = 'Переводы сообщений'
+        constraints = [
+            models.UniqueConstraint(fields=['content_hash', 'language'], name='chat_translation_hash_lang_uniq'),
+        ]
 
     def __str__(self):
-        return self.content
\ No newline at end of file
+        return f'{self.language}: {self.content_hash}'
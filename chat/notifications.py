@@ -0,0 +1,105 @@
+"""
+Уведомления оффлайн-участникам чата о новых сообщениях.
+
+Первое сообщение в окне CHAT_NOTIFICATION_WINDOW создает уведомление и отправляет письмо/push; следующие сообщения
+того же чата в этом окне не создают новых уведомлений, а обновляют текст существующего («Новых сообщений в чате: 3»).
+Счетчик и id уведомления хранятся в Redis по (чат, пользователь). Новые уведомления создаются одним bulk_create,
+рассылка ставится одной задачей send_notifications_batch на пачку получателей.
+"""
+from django.conf import settings
+
+from RentalGuru.settings import redis_1
+
+NOTIFICATION_BATCH_SIZE = 500
+
+# Счетчик сообщений (chat, user) и срок окна задаются одним атомарным шагом: ключ без TTL не может остаться,
+# даже если воркер упадет до создания уведомления. Возвращает {count, id уведомления или '', 1 если у ключа
+# не было срока (ключ, оставшийся от прерванной записи без TTL)}
+COUNT_MESSAGE_SCRIPT = """
+local count = redis.call('HINCRBY', KEYS[1], 'count', 1)
+local stale = 0
+if redis.call('TTL', KEYS[1]) < 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+    stale = count > 1 and 1 or 0
+end
+return {count, redis.call('HGET', KEYS[1], 'id') or '', stale}
+"""
+
+_count_message = None
+
+
+def get_count_message_script():
+    global _count_message
+    if _count_message is None:
+        _count_message = redis_1.register_script(COUNT_MESSAGE_SCRIPT)
+    return _count_message
+
+
+def get_notification_window():
+    return getattr(settings, 'CHAT_NOTIFICATION_WINDOW', 300)
+
+
+def notification_key(chat_group_name, user_id):
+    return f'chat:notify:{chat_group_name}:{user_id}'
+
+
+def notification_content(count):
+    if count <= 1:
+        return "Получено новое сообщение"
+    return f"Новых сообщений в чате: {count}"
+
+
+def notify_new_message(chat_group_name, user_ids):
+    """ Уведомляет пользователей user_ids о новом сообщении в чате """
+    from notification.models import Notification, send_notifications_batch
+
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return
+
+    window = get_notification_window()
+    count_message = get_count_message_script()
+    pipe = redis_1.pipeline(transaction=False)
+    for user_id in user_ids:
+        count_message(keys=[notification_key(chat_group_name, user_id)], args=[window], client=pipe)
+    results = pipe.execute()
+
+    new_users = []
+    updates = {}
+    for user_id, (count, notification_id, stale) in zip(user_ids, results):
+        if count == 1 or (stale and not notification_id):
+            # Первое сообщение окна или ключ без срока и без уведомления (запись была прервана): новое уведомление
+            new_users.append(user_id)
+        elif notification_id:
+            updates.setdefault(count, []).append(int(notification_id))
+        # Иначе уведомление этого окна создается параллельно другим воркером
+
+    # Уведомление уже отправлено в текущем окне: только обновляется его текст
+    for count, notification_ids in updates.items():
+        Notification.objects.filter(id__in=notification_ids).update(
+            content=notification_content(count), read_it=False
+        )
+
+    if not new_users:
+        return
+
+    # bulk_create не вызывает Notification.save, поэтому рассылка идет только через send_notifications_batch
+    try:
+        notifications = Notification.objects.bulk_create([
+            Notification(user_id=user_id, content=notification_content(1)) for user_id in new_users
+        ])
+    except Exception:
+        # Без id уведомления счетчик окна не должен блокировать следующие уведомления
+        redis_1.delete(*[notification_key(chat_group_name, user_id) for user_id in new_users])
+        raise
+
+    pipe = redis_1.pipeline(transaction=False)
+    for notification in notifications:
+        key = notification_key(chat_group_name, notification.user_id)
+        pipe.hset(key, mapping={'id': notification.id, 'count': 1})
+        pipe.expire(key, window)
+    pipe.execute()
+
+    notification_ids = [notification.id for notification in notifications]
+    for start in range(0, len(notification_ids), NOTIFICATION_BATCH_SIZE):
+        send_notifications_batch.delay(notification_ids[start:start + NOTIFICATION_BATCH_SIZE])
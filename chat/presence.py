@@ -0,0 +1,143 @@
+"""
+Присутствие пользователей в чатах (общее для всех ASGI-воркеров).
+
+Каждое WebSocket-соединение регистрируется в Redis: в отсортированном множестве chat:presence:{группа} хранится
+имя канала со сроком жизни (score — время истечения), в хэше chat:presence:{группа}:channels — id пользователя и
+выбранный язык. Consumer продлевает срок heartbeat-ом каждые CHAT_PRESENCE_HEARTBEAT секунд; соединение без
+heartbeat дольше CHAT_PRESENCE_TTL (упавший воркер) перестает считаться онлайн и удаляется при следующем чтении.
+"""
+import json
+import time
+
+import redis.asyncio as aioredis
+from django.conf import settings
+
+from RentalGuru.settings import redis_1, REDIS_URL
+
+# Удаление просроченных соединений одним атомарным шагом: соединение, успевшее продлить срок между чтением
+# и удалением, не теряет запись в хэше
+PRUNE_EXPIRED_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if #expired > 0 then
+    redis.call('ZREM', KEYS[1], unpack(expired))
+    redis.call('HDEL', KEYS[2], unpack(expired))
+end
+return #expired
+"""
+
+_async_client = None
+_prune_expired = None
+
+
+def get_async_redis():
+    """ Асинхронный клиент к той же базе Redis, что и redis_1 """
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.from_url(f'{REDIS_URL}/1')
+    return _async_client
+
+
+def get_prune_script():
+    global _prune_expired
+    if _prune_expired is None:
+        _prune_expired = get_async_redis().register_script(PRUNE_EXPIRED_SCRIPT)
+    return _prune_expired
+
+
+def get_presence_ttl():
+    return getattr(settings, 'CHAT_PRESENCE_TTL', 90)
+
+
+def get_heartbeat_interval():
+    return getattr(settings, 'CHAT_PRESENCE_HEARTBEAT', 30)
+
+
+def presence_key(group_name):
+    return f'chat:presence:{group_name}'
+
+
+def channels_key(group_name):
+    return f'chat:presence:{group_name}:channels'
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _parse_connections(channels, raw_values):
+    connections = {}
+    for channel, raw in zip(channels, raw_values):
+        if raw:
+            connections[_decode(channel)] = json.loads(raw)
+    return connections
+
+
+async def join(group_name, channel_name, user_id, language):
+    """ Регистрирует соединение в чате """
+    ttl = get_presence_ttl()
+    client = get_async_redis()
+    pipe = client.pipeline(transaction=True)
+    pipe.zadd(presence_key(group_name), {channel_name: time.time() + ttl})
+    pipe.hset(channels_key(group_name), channel_name, json.dumps({'user_id': user_id, 'language': language}))
+    pipe.expire(presence_key(group_name), ttl)
+    pipe.expire(channels_key(group_name), ttl)
+    await pipe.execute()
+
+
+async def heartbeat(group_name, channel_name, user_id, language):
+    """ Продлевает срок жизни соединения; запись, уже удаленная как просроченная, восстанавливается """
+    await join(group_name, channel_name, user_id, language)
+
+
+async def leave(group_name, channel_name):
+    """ Удаляет соединение из чата """
+    client = get_async_redis()
+    pipe = client.pipeline(transaction=True)
+    pipe.zrem(presence_key(group_name), channel_name)
+    pipe.hdel(channels_key(group_name), channel_name)
+    await pipe.execute()
+
+
+async def get_connections(group_name):
+    """ {имя канала: {'user_id', 'language'}} для живых соединений чата; просроченные удаляются """
+    client = get_async_redis()
+    now = time.time()
+    await get_prune_script()(keys=[presence_key(group_name), channels_key(group_name)], args=[now])
+
+    channels = await client.zrangebyscore(presence_key(group_name), now, '+inf')
+    if not channels:
+        return {}
+    return _parse_connections(channels, await client.hmget(channels_key(group_name), channels))
+
+
+async def online_user_ids(group_name):
+    connections = await get_connections(group_name)
+    return {connection['user_id'] for connection in connections.values()}
+
+
+async def offline_user_ids(group_name, user_ids):
+    """ Пользователи из user_ids, у которых нет ни одного живого соединения с чатом """
+    online = await online_user_ids(group_name)
+    return [user_id for user_id in user_ids if user_id not in online]
+
+
+async def channel_languages(group_name):
+    """ {имя канала: язык} для живых соединений чата """
+    connections = await get_connections(group_name)
+    return {channel: connection['language'] for channel, connection in connections.items()}
+
+
+async def user_languages(group_name):
+    """ {id пользователя: язык} — язык последнего по сроку соединения пользователя """
+    connections = await get_connections(group_name)
+    return {connection['user_id']: connection['language'] for connection in connections.values()}
+
+
+def get_online_user_ids(group_name):
+    """ Синхронный вариант online_user_ids (для задач и views) """
+    now = time.time()
+    channels = redis_1.zrangebyscore(presence_key(group_name), now, '+inf')
+    if not channels:
+        return set()
+    connections = _parse_connections(channels, redis_1.hmget(channels_key(group_name), channels))
+    return {connection['user_id'] for connection in connections.values()}
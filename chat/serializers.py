@@ -13,8 +13,8 @@ from influencer.utils import check_promocode
 from notification.models import Notification
 from payment.TinkoffClient import TinkoffAPI
 from payment.models import Payment
-from vehicle.models import RatingUpdateLog, Auto, Bike, Ship, Helicopter, SpecialTechnic, Availability
-from vehicle.utils import merge_periods
+from vehicle.models import RatingUpdateLog, Auto, Bike, Ship, Helicopter, SpecialTechnic
+from vehicle.reservations import release_period
 from .models import Trip, Chat, Message, RequestRent, TopicSupport, ChatSupport, MessageSupport, IssueSupport
 
 
@@ -129,35 +129,8 @@ class TripSerializer(serializers.ModelSerializer):
                     used_promo.used = False
                     used_promo.save()
 
-            # Возврат дат доступности
-            if not request_rent.on_request:
-                vehicle = instance.vehicle
-                trip_period = {
-                    'start_date': instance.start_date,
-                    'end_date': instance.end_date
-                }
-                # Получить текущие периоды доступности (не по запросу)
-                current_availabilities = Availability.objects.filter(vehicle=vehicle, on_request=False)
-                existing_periods = [
-                    {'start_date': a.start_date, 'end_date': a.end_date}
-                    for a in current_availabilities
-                ]
-
-                # Добавить отменённую поездку
-                existing_periods.append(trip_period)
-
-                # Объединение и пересоздание доступностей
-                merged = merge_periods(existing_periods)
-                current_availabilities.delete()
-
-                # Сохраняем новые
-                for period in merged:
-                    Availability.objects.create(
-                        vehicle=vehicle,
-                        start_date=period['start_date'],
-                        end_date=period['end_date'],
-                        on_request=False
-                    )
+            # Освобождение брони и возврат дат доступности (для транспорта «по запросу» только бронь)
+            release_period(instance.vehicle, instance.start_date, instance.end_date, request_rent=request_rent)
 
         instance = super().update(instance, validated_data)
 
@@ -168,41 +141,10 @@ class TripSerializer(serializers.ModelSerializer):
             if request.user != instance.organizer and request.user.role not in ['admin', 'manager'] and request.user != instance.vehicle.owner:
                 raise serializers.ValidationError({"detail": "Вы не можете завершить поездку."})
 
-            if now().date() < instance.end_date and not instance.chat.request_rent.on_request:
-                vehicle = instance.vehicle
-
-                remaining_period = {
-                    'start_date': now().date(),
-                    'end_date': instance.end_date
-                }
-
-                current_availabilities = Availability.objects.filter(vehicle=vehicle, on_request=False)
-                existing_periods = [
-                    {
-                        'start_date': a.start_date,
-                        'end_date': a.end_date
-                    }
-                    for a in current_availabilities
-                ]
-
-                existing_periods.append(remaining_period)
-
-                for p in existing_periods:
-                    if hasattr(p['start_date'], 'date'):
-                        p['start_date'] = p['start_date'].date()
-                    if hasattr(p['end_date'], 'date'):
-                        p['end_date'] = p['end_date'].date()
-
-                merged = merge_periods(existing_periods)
-                current_availabilities.delete()
-
-                for period in merged:
-                    Availability.objects.create(
-                        vehicle=vehicle,
-                        start_date=period['start_date'],
-                        end_date=period['end_date'],
-                        on_request=False
-                    )
+            if now().date() < instance.end_date:
+                # Оставшиеся дни поездки возвращаются в доступность, бронь сокращается
+                release_period(instance.vehicle, now().date(), instance.end_date,
+                               request_rent=instance.chat.request_rent)
 
             Notification.objects.create(
                 user=instance.organizer,
@@ -2,29 +2,38 @@ from celery import shared_task
 from django.core.mail import send_mail
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-from deep_translator import GoogleTranslator
 
 from RentalGuru import settings
 
 
 @shared_task
-def translate_message(message_id, content, dest_language, channel_name):
-    try:
-        translated_content = GoogleTranslator(source='auto', target=dest_language).translate(content)
-    except Exception as e:
-        print(f"Error during translation: {e}")
-        translated_content = content
+def translate_messages(messages, dest_language, channel_names):
+    """
+    Перевод пачки сообщений [[message_id, content], ...] на один язык и рассылка переводов в каналы channel_names.
+    Тексты, уже переведенные ранее, берутся из памяти переводов (chat/translation.py).
+    """
+    from .translation import translate_texts
+
+    translations = translate_texts([content for _, content in messages], dest_language)
 
     # отправка через channels
     channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.send)(
-        channel_name,
-        {
-            "type": "chat.message.translated",
-            "message_id": message_id,
-            "translated_content": translated_content
-        }
-    )
+    for channel_name in channel_names:
+        for message_id, content in messages:
+            async_to_sync(channel_layer.send)(
+                channel_name,
+                {
+                    "type": "chat.message.translated",
+                    "message_id": message_id,
+                    "translated_content": translations.get(content, content)
+                }
+            )
+
+
+@shared_task
+def translate_message(message_id, content, dest_language, channel_name):
+    """ Перевод одного сообщения (для задач, поставленных до появления translate_messages) """
+    translate_messages([[message_id, content]], dest_language, [channel_name])
 
 
 @shared_task
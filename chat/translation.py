@@ -0,0 +1,102 @@
+"""
+Перевод сообщений чатов с памятью переводов.
+
+Готовые переводы хранятся в MessageTranslation по (SHA-256 текста, язык) и отдаются сразу вместе со страницей
+истории. Отсутствующие переводы собираются в одну задачу translate_messages на язык: задача убирает повторы,
+переводит тексты пачками (несколько текстов за один запрос к GoogleTranslator) и сохраняет результат.
+"""
+import hashlib
+import logging
+import re
+
+from deep_translator import GoogleTranslator
+
+logger = logging.getLogger(__name__)
+
+# Ограничение GoogleTranslator — 5000 символов на запрос
+TRANSLATION_BATCH_CHARS = 4500
+BATCH_SEPARATOR = '\n§§\n'
+BATCH_SPLIT_PATTERN = re.compile(r'\s*§\s*§\s*')
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def get_cached_translations(contents, language):
+    """ {текст: перевод} для текстов, перевод которых уже есть в памяти переводов """
+    from chat.models import MessageTranslation
+
+    hashes = {content_hash(content): content for content in contents}
+    if not hashes:
+        return {}
+    rows = MessageTranslation.objects.filter(
+        language=language, content_hash__in=list(hashes)
+    ).values_list('content_hash', 'translated_content')
+    return {hashes[row_hash]: translated for row_hash, translated in rows}
+
+
+def save_translations(translations, language):
+    from chat.models import MessageTranslation
+
+    MessageTranslation.objects.bulk_create(
+        [
+            MessageTranslation(content_hash=content_hash(content), language=language, translated_content=translated)
+            for content, translated in translations.items()
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _batches(contents):
+    batch, size = [], 0
+    for content in contents:
+        if batch and size + len(content) + len(BATCH_SEPARATOR) > TRANSLATION_BATCH_CHARS:
+            yield batch
+            batch, size = [], 0
+        batch.append(content)
+        size += len(content) + len(BATCH_SEPARATOR)
+    if batch:
+        yield batch
+
+
+def _translate_one(translator, content):
+    """ Перевод одного текста; None при ошибке переводчика """
+    try:
+        return translator.translate(content) or content
+    except Exception as e:
+        logger.error(f"Error during translation: {e}")
+        return None
+
+
+def translate_texts(contents, language):
+    """
+    Переводит тексты, которых нет в памяти переводов, и сохраняет результат. Возвращает {текст: перевод} для всех
+    contents. Тексты пачки склеиваются разделителем; если переводчик его исказил, пачка переводится по одному тексту.
+    """
+    contents = list(dict.fromkeys(content for content in contents if content))
+    translations = get_cached_translations(contents, language)
+    missing = [content for content in contents if content not in translations]
+    if not missing:
+        return translations
+
+    translator = GoogleTranslator(source='auto', target=language)
+    translated = {}
+    for batch in _batches(missing):
+        if len(batch) == 1:
+            translated[batch[0]] = _translate_one(translator, batch[0])
+            continue
+        try:
+            parts = BATCH_SPLIT_PATTERN.split(translator.translate(BATCH_SEPARATOR.join(batch)) or '')
+        except Exception as e:
+            logger.error(f"Error during batch translation: {e}")
+            parts = []
+        if len(parts) != len(batch):
+            parts = [_translate_one(translator, content) for content in batch]
+        translated.update(zip(batch, parts))
+
+    # Неудачные переводы не сохраняются, чтобы их можно было повторить; клиенту уходит исходный текст
+    translated = {content: text for content, text in translated.items() if text is not None}
+    save_translations(translated, language)
+    translations.update(translated)
+    return {content: translations.get(content, content) for content in contents}
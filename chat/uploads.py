@@ -0,0 +1,143 @@
+"""
+Загрузка файлов в чат по частям.
+
+Клиент открывает загрузку текстовым сообщением upload_start и передает файл бинарными кадрами WebSocket размером
+не больше CHAT_UPLOAD_CHUNK_SIZE. Каждый кадр сразу дописывается во временный файл в CHAT_UPLOAD_TMP_DIR, поэтому в
+памяти воркера одновременно находится не больше одного кадра. Состояние загрузки (владелец, чат, имя, размер)
+хранится в Redis по upload_id; после обрыва соединения клиент повторяет upload_start с тем же upload_id и
+продолжает с позиции offset, равной размеру уже записанной части. Когда получены все байты, файл сохраняется
+в хранилище вместе с сообщением, а временный файл удаляется.
+"""
+import json
+import os
+import time
+import uuid
+
+from django.conf import settings
+
+from RentalGuru.settings import redis_1
+
+UPLOAD_CLEANUP_KEY = 'chat:upload:cleanup'
+
+
+class UploadError(Exception):
+    """ Загрузка не может быть начата или продолжена """
+
+
+def upload_key(upload_id):
+    return f'chat:upload:{upload_id}'
+
+
+def get_max_size():
+    return getattr(settings, 'CHAT_UPLOAD_MAX_SIZE', 50 * 1024 * 1024)
+
+
+def get_chunk_size():
+    return getattr(settings, 'CHAT_UPLOAD_CHUNK_SIZE', 256 * 1024)
+
+
+def get_upload_ttl():
+    return getattr(settings, 'CHAT_UPLOAD_TTL', 24 * 60 * 60)
+
+
+def get_tmp_dir():
+    return str(getattr(settings, 'CHAT_UPLOAD_TMP_DIR', os.path.join(settings.BASE_DIR, 'media', 'tmp', 'chat_uploads')))
+
+
+def _tmp_path(upload_id):
+    return os.path.join(get_tmp_dir(), f'{upload_id}.part')
+
+
+def _received(session):
+    try:
+        return os.path.getsize(session['path'])
+    except OSError:
+        return 0
+
+
+def _save_session(session):
+    redis_1.set(upload_key(session['upload_id']), json.dumps(session), ex=get_upload_ttl())
+
+
+def start_upload(user_id, chat_group_name, name, content_type, size, content='', upload_id=None):
+    """
+    Начинает новую загрузку или продолжает незавершенную (upload_id). Возвращает состояние загрузки
+    с offset — количеством уже полученных байт.
+    """
+    if upload_id:
+        raw = redis_1.get(upload_key(upload_id))
+        if not raw:
+            raise UploadError('Upload not found or expired')
+        session = json.loads(raw)
+        if session['user_id'] != user_id or session['chat'] != chat_group_name:
+            raise UploadError('Upload belongs to another user or chat')
+        session['offset'] = _received(session)
+        _save_session(session)
+        return session
+
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('Invalid file size')
+    if size <= 0 or size > get_max_size():
+        raise UploadError(f'File size must be between 1 and {get_max_size()} bytes')
+
+    cleanup_stale_uploads()
+    os.makedirs(get_tmp_dir(), exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    session = {
+        'upload_id': upload_id,
+        'user_id': user_id,
+        'chat': chat_group_name,
+        'name': os.path.basename(str(name or 'unnamed_file')) or 'unnamed_file',
+        'content_type': content_type or 'application/octet-stream',
+        'content': content or '',
+        'size': size,
+        'path': _tmp_path(upload_id),
+    }
+    open(session['path'], 'wb').close()
+    session['offset'] = 0
+    _save_session(session)
+    return session
+
+
+def append_chunk(session, data):
+    """ Дописывает кадр в конец временного файла, возвращает новый offset """
+    if len(data) > get_chunk_size():
+        raise UploadError(f'Chunk exceeds {get_chunk_size()} bytes')
+    offset = _received(session)
+    if offset + len(data) > session['size']:
+        raise UploadError('Upload exceeds declared file size')
+    with open(session['path'], 'ab') as file:
+        file.write(data)
+    redis_1.expire(upload_key(session['upload_id']), get_upload_ttl())
+    session['offset'] = offset + len(data)
+    return session['offset']
+
+
+def is_complete(session):
+    return session['offset'] >= session['size']
+
+
+def discard_upload(session):
+    redis_1.delete(upload_key(session['upload_id']))
+    try:
+        os.remove(session['path'])
+    except OSError:
+        pass
+
+
+def cleanup_stale_uploads():
+    """ Удаляет временные файлы брошенных загрузок; выполняется не чаще раза в час """
+    if not redis_1.set(UPLOAD_CLEANUP_KEY, 1, nx=True, ex=60 * 60):
+        return
+    tmp_dir = get_tmp_dir()
+    if not os.path.isdir(tmp_dir):
+        return
+    expired_before = time.time() - get_upload_ttl()
+    for entry in os.scandir(tmp_dir):
+        if entry.is_file() and entry.stat().st_mtime < expired_before:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
@@ -2,6 +2,7 @@ from datetime import datetime
 from decimal import Decimal
 
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from django.db.models import Q, Prefetch, OuterRef, Exists, Subquery, Max
 from django.db.models.functions import Coalesce
 from django_filters.rest_framework import DjangoFilterBackend
@@ -19,7 +20,9 @@ from app.models import Lessor, Renter
 from manager.permissions import ManagerObjectPermission, ChatsAccess
 from notification.models import Notification
 from payment.models import Payment
-from vehicle.models import Auto, Bike, Ship, Helicopter, SpecialTechnic, Availability, Vehicle
+from vehicle.models import Auto, Bike, Ship, Helicopter, SpecialTechnic, Vehicle
+from vehicle.pricing import get_price_table
+from vehicle.reservations import reserve_period, BookingConflict
 from .filters import MessageFilter, TripFilter, TripFilterBackend, RequestRentFilter
 from .models import Trip, Chat, Message, RequestRent, TopicSupport, ChatSupport, MessageSupport, IssueSupport
 from .permissions import IsAdminOrOwner, ChatsPermission, ForChatPermission
@@ -27,7 +30,7 @@ from .serializers import TripSerializer, ChatSerializer, MessageSerializer, Requ
     TopicSupportSerializer, ChatSupportSerializer, MessageSupportSerializer, IssueSupportSerializer, \
     ChatSupportRetrieveSerializer
 from rest_framework.exceptions import ValidationError as DRFValidationError, PermissionDenied
-from .utils import is_period_contained, subtract_periods
+from .utils import is_period_contained
 
 
 @extend_schema(summary="Поездка",
@@ -185,7 +188,12 @@ class TripViewSet(viewsets.ModelViewSet):
                                                                                 арендодателем. Чат доступен по адресу:\n 
                     wss://<host_name>/ws/chat/<chat_id>/?token=<JWT>&lang=<lang>\n
                     Пометить сообщение как прочитанное: {"type": "mark_as_read", "message_id": 82}
-                    Получение предыдущих сообщений: {"type": "load_previous_messages", "offset": 20, "limit": 10}
+                    Получение предыдущих сообщений: {"type": "load_previous_messages", "before": 120, "limit": 20} (before - id самого старого загруженного сообщения; в ответе has_more и before для следующей страницы)
+                    Загрузка файла по частям: {"type": "upload_start", "name": "photo.jpg", "content_type": "image/jpeg", "size": 20971520, "content": "Hello!"}
+                        -> {"type": "upload_ready", "upload_id": "...", "offset": 0, "chunk_size": 262144}, затем файл передается бинарными кадрами
+                        не больше chunk_size, на каждый кадр приходит {"type": "upload_progress", "offset": ...}; после последнего кадра
+                        сообщение с файлом рассылается в чат и приходит {"type": "upload_complete"}. Продолжение после обрыва:
+                        {"type": "upload_start", "upload_id": "..."} и отправка с полученного offset
                     Отправка сообщения: {"type": "send_message", "message": "hello"}
                     Обновление сообщения: {"type": "update_message", "update": 74, "content": "Hello" }
                     Удаление сообщения: {"type": "delete_message", "delete": 74}
@@ -522,11 +530,12 @@ class RequestRentViewSet(viewsets.ModelViewSet):
                 total_hours = (end_dt - start_dt).total_seconds() / 3600
                 
                 # Если >= 8 часов и есть дневной тариф - считаем как дневную аренду
-                if total_hours >= 8 and vehicle_instance.rent_prices.filter(name='day').exists():
+                rent_prices = (get_price_table(vehicle_instance.pk) or {}).get('prices', {})
+                if total_hours >= 8 and 'day' in rent_prices:
                     # Это дневная аренда, не почасовая - не блокируем проверкой min_days
                     is_hourly_rental = True  # Пропускаем проверку дней
                 # Если < 8 часов или нет дневного тарифа, нужен почасовой
-                elif vehicle_instance.rent_prices.filter(name='hour').exists():
+                elif 'hour' in rent_prices:
                     is_hourly_rental = True
                 else:
                     # Нет ни дневного ни почасового - ошибка будет в calculate_rent_price
@@ -592,34 +601,14 @@ class RequestRentViewSet(viewsets.ModelViewSet):
                 except model.DoesNotExist:
                     raise DRFValidationError(f"Транспорт с ID {object_id} не найден.")
 
-                availabilities = list(vehicle_instance.availabilities.values('start_date', 'end_date'))
-                if not availabilities:
-                    raise DRFValidationError(
-                        "Данных о наличии свободных периодов аренды для этого транспорта не найдено.")
-
-                # Преобразование дат в строки
-                for availability in availabilities:
-                    availability['start_date'] = availability['start_date'].strftime('%Y-%m-%d')
-                    availability['end_date'] = availability['end_date'].strftime('%Y-%m-%d')
-
-                sub_period = {'start_date': instance.start_date.strftime('%Y-%m-%d'),
-                              'end_date': instance.end_date.strftime('%Y-%m-%d')}
-                new_availabilities = subtract_periods(availabilities, sub_period)
-
-                if isinstance(new_availabilities, str):
-                    raise DRFValidationError(new_availabilities)
-
-                # Обновление или создание новых объектов Availability
-                vehicle_instance.availabilities.all().delete()
-                for availability in new_availabilities:
-                    Availability.objects.create(
-                        vehicle=vehicle_instance,
-                        start_date=availability['start_date'],
-                        end_date=availability['end_date']
-                    )
-
-                # Здесь Trip будет создан в модели RequestRent
-                serializer.save(user=self.request.user)
+                # Бронь и изменение доступности выполняются под блокировкой транспорта вместе с принятием заявки
+                try:
+                    with transaction.atomic():
+                        reserve_period(vehicle_instance, instance.start_date, instance.end_date, request_rent=instance)
+                        # Здесь Trip будет создан в модели RequestRent
+                        serializer.save(user=self.request.user)
+                except BookingConflict as e:
+                    raise DRFValidationError(str(e))
 
                 url = f'{settings.HOST_URL}/chat/request_rents/{instance.id}'
                 content = f'Заявка на аренду {vehicle_instance} одобрена. Дата начала {instance.start_date}'
@@ -673,7 +662,12 @@ class ChatSupportPagination(LimitOffsetPagination):
                description="""\nЧат с техподдержкой. Доступен по адресу:\n
                     wss://<host_name>/ws/support_chat/<chat_id>/?token=<JWT>&lang=<lang>\n
                     Чат создается при создании обращения\n
-                    Получение предыдущих сообщений: {"type": "load_previous_messages", "offset": 20, "limit": 10}
+                    Получение предыдущих сообщений: {"type": "load_previous_messages", "before": 120, "limit": 20} (before - id самого старого загруженного сообщения; в ответе has_more и before для следующей страницы)
+                    Загрузка файла по частям: {"type": "upload_start", "name": "photo.jpg", "content_type": "image/jpeg", "size": 20971520, "content": "Hello!"}
+                        -> {"type": "upload_ready", "upload_id": "...", "offset": 0, "chunk_size": 262144}, затем файл передается бинарными кадрами
+                        не больше chunk_size, на каждый кадр приходит {"type": "upload_progress", "offset": ...}; после последнего кадра
+                        сообщение с файлом рассылается в чат и приходит {"type": "upload_complete"}. Продолжение после обрыва:
+                        {"type": "upload_start", "upload_id": "..."} и отправка с полученного offset
                     Отправка сообщения: {"type": "send_message", "message": "hello"}
                     Обновление сообщения: {"type": "update_message", "update": 74, "content": "Hello" }
                     Удаление сообщения: {"type": "delete_message", "delete": 74}
@@ -719,7 +713,12 @@ class ChatSupportListView(APIView):
 
 @extend_schema(summary="Детальное отображение чата", description="""\nЧат с техподдержкой. Доступен по адресу:\n
                     wss://<host_name>/ws/support_chat/<chat_id>/?token=<JWT>&lang=<lang>\n
-                    Получение предыдущих сообщений: {"type": "load_previous_messages", "offset": 20, "limit": 10}
+                    Получение предыдущих сообщений: {"type": "load_previous_messages", "before": 120, "limit": 20} (before - id самого старого загруженного сообщения; в ответе has_more и before для следующей страницы)
+                    Загрузка файла по частям: {"type": "upload_start", "name": "photo.jpg", "content_type": "image/jpeg", "size": 20971520, "content": "Hello!"}
+                        -> {"type": "upload_ready", "upload_id": "...", "offset": 0, "chunk_size": 262144}, затем файл передается бинарными кадрами
+                        не больше chunk_size, на каждый кадр приходит {"type": "upload_progress", "offset": ...}; после последнего кадра
+                        сообщение с файлом рассылается в чат и приходит {"type": "upload_complete"}. Продолжение после обрыва:
+                        {"type": "upload_start", "upload_id": "..."} и отправка с полученного offset
                     Отправка сообщения: {"type": "send_message", "message": "hello"}
                     Обновление сообщения: {"type": "update_message", "update": 74, "content": "Hello" }
                     Удаление сообщения: {"type": "delete_message", "delete": 74}
@@ -748,7 +747,12 @@ class ChatSupportRetrieveView(APIView):
 
 @extend_schema(summary="Обращение в техподдержку", description="""\nЧат с техподдержкой. Доступен по адресу:\n
                     wss://<host_name>/ws/support_chat/<chat_id>/?token=<JWT>&lang=<lang>\n
-                    Получение предыдущих сообщений: {"type": "load_previous_messages", "offset": 20, "limit": 10}
+                    Получение предыдущих сообщений: {"type": "load_previous_messages", "before": 120, "limit": 20} (before - id самого старого загруженного сообщения; в ответе has_more и before для следующей страницы)
+                    Загрузка файла по частям: {"type": "upload_start", "name": "photo.jpg", "content_type": "image/jpeg", "size": 20971520, "content": "Hello!"}
+                        -> {"type": "upload_ready", "upload_id": "...", "offset": 0, "chunk_size": 262144}, затем файл передается бинарными кадрами
+                        не больше chunk_size, на каждый кадр приходит {"type": "upload_progress", "offset": ...}; после последнего кадра
+                        сообщение с файлом рассылается в чат и приходит {"type": "upload_complete"}. Продолжение после обрыва:
+                        {"type": "upload_start", "upload_id": "..."} и отправка с полученного offset
                     Отправка сообщения: {"type": "send_message", "message": "hello"}
                     Обновление сообщения: {"type": "update_message", "update": 74, "content": "Hello" }
                     Удаление сообщения: {"type": "delete_message", "delete": 74}
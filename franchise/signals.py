@@ -1,5 +1,10 @@
 from django.db.models.signals import post_save, post_delete
+from django.db import transaction
 from django.dispatch import receiver
+
+from app.cache import bump_cache_version
+from chat.models import Trip
+from franchise.models import City
 from vehicle.models import Vehicle
 
 
@@ -14,3 +19,10 @@ def update_franchise_total_vehicles(sender, instance, **kwargs):
 
         if franchise:
             franchise.save_total_vehicles()
+
+
+@receiver([post_save, post_delete], sender=City)
+@receiver([post_save, post_delete], sender=Trip)
+def invalidate_city_cache(sender, instance, **kwargs):
+    """ Список городов содержит количество завершенных поездок, поэтому зависит и от Trip """
+    transaction.on_commit(lambda: bump_cache_version(City))
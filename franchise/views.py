@@ -16,6 +16,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from app.cache import CachedListMixin
 from app.models import Lessor
 from chat.models import Trip, Chat, RequestRent
 from manager.permissions import IsDirector
@@ -460,7 +461,7 @@ class CityOrderingEnum(str, Enum):
                    )
                 ]
             )
-class CityView(generics.ListAPIView):
+class CityView(CachedListMixin, generics.ListAPIView):
     serializer_class = CitySerializer
     queryset = City.objects.annotate(
         finished_trips_count=RawSQL("""
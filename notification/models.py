@@ -1,11 +1,12 @@
 import json
+import logging
 import os
 from datetime import timedelta
 
 import requests
 from celery import shared_task
 from django.apps import apps
-from django.core.mail import send_mail
+from django.core.mail import send_mail, send_mass_mail
 from django.utils import timezone
 from google.auth.transport.requests import Request
 from google.oauth2 import service_account
@@ -15,6 +16,8 @@ from django.db import models
 from RentalGuru import settings
 from RentalGuru.settings import DEFAULT_FROM_EMAIL, AUTH_USER_MODEL, HOST_URL
 
+logger = logging.getLogger(__name__)
+
 
 class Notification(models.Model):
     user = models.ForeignKey(AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name='Пользователь')
@@ -78,6 +81,91 @@ def send_email_notification(notification_id):
     return "Email notifications sent"
 
 
+def get_fcm_access_token():
+    """ access_token FCM через сервисный аккаунт """
+    credentials = service_account.Credentials.from_service_account_file(
+        os.getenv("SERVICE_ACCOUNT_FILE"),
+        scopes=["https://www.googleapis.com/auth/firebase.messaging"],
+    )
+    credentials.refresh(Request())
+    return credentials.token
+
+
+def get_fcm_url():
+    project_id = os.getenv('PROJECT_ID', 'rental-guru-465d7')
+    return f"https://fcm.googleapis.com/v1/projects/{project_id}/messages:send"
+
+
+def build_fcm_message(token, notification_body, notification_url=None):
+    return {
+        "message": {
+            "token": token,
+            "notification": {
+                "title": "Rental-Guru",
+                "body": notification_body
+            },
+            "webpush": {
+                "headers": {
+                    "Urgency": "high",
+                    "TTL": "86400"  # 24 часа
+                },
+                "notification": {
+                    "title": "Rental-Guru",
+                    "body": notification_body,
+                    "icon": "https://rentalguru.ru/static/firebase-logo.png",
+                    "badge": "https://rentalguru.ru/static/firebase-logo.png",
+                    "click_action": notification_url or "https://rentalguru.ru",
+                    "requireInteraction": True,
+                    "actions": [
+                        {
+                            "action": "open",
+                            "title": "Открыть"
+                        }
+                    ]
+                },
+                "data": {
+                    "url": notification_url or "https://rentalguru.ru"
+                }
+            }
+        }
+    }
+
+
+def send_fcm_message(session, fcm_url, headers, token, notification_body, notification_url=None):
+    """ Отправка push на один токен; недействительные токены удаляются. Возвращает True при успехе """
+    message = build_fcm_message(token, notification_body, notification_url)
+    try:
+        response = session.post(fcm_url, headers=headers, json=message, timeout=30)
+
+        if response.status_code == 200:
+            return True
+        elif response.status_code == 404:
+            # Токен не найден - удаляем его
+            FCMToken.objects.filter(token=token).delete()
+            print(f"Deleted invalid token: {token[:20]}...")
+            return None
+        elif response.status_code == 400:
+            response_data = response.json()
+            error_code = response_data.get('error', {}).get('details', [{}])[0].get('errorCode', '')
+
+            if error_code in ['UNREGISTERED', 'INVALID_ARGUMENT']:
+                # Токен недействителен - удаляем его
+                FCMToken.objects.filter(token=token).delete()
+                print(f"Deleted unregistered token: {token[:20]}...")
+                return None
+            print(f"Failed to send to token {token[:20]}...: {response.text}")
+        else:
+            print(f"Failed to send notification to {token[:20]}...: {response.status_code} {response.text}")
+
+    except requests.exceptions.Timeout:
+        print(f"Timeout sending to token {token[:20]}...")
+    except requests.exceptions.RequestException as e:
+        print(f"Request error sending to token {token[:20]}...: {str(e)}")
+    except Exception as e:
+        print(f"Unexpected error sending to token {token[:20]}...: {str(e)}")
+    return False
+
+
 @shared_task
 def send_web_push_notification(user_id, notification_body, notification_url=None):
     User = apps.get_model(settings.AUTH_USER_MODEL)
@@ -93,12 +181,7 @@ def send_web_push_notification(user_id, notification_body, notification_url=None
 
     # Получаем access_token через сервисный аккаунт
     try:
-        credentials = service_account.Credentials.from_service_account_file(
-            os.getenv("SERVICE_ACCOUNT_FILE"),
-            scopes=["https://www.googleapis.com/auth/firebase.messaging"],
-        )
-        credentials.refresh(Request())
-        access_token = credentials.token
+        access_token = get_fcm_access_token()
     except Exception as e:
         return f"Failed to get access token: {str(e)}"
 
@@ -106,84 +189,79 @@ def send_web_push_notification(user_id, notification_body, notification_url=None
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json; charset=UTF-8",
     }
-
-    project_id = os.getenv('PROJECT_ID', 'rental-guru-465d7')
-    fcm_url = f"https://fcm.googleapis.com/v1/projects/{project_id}/messages:send"
+    fcm_url = get_fcm_url()
 
     successful_sends = 0
     failed_sends = 0
 
-    for token in tokens:
-        message = {
-            "message": {
-                "token": token,
-                "notification": {
-                    "title": "Rental-Guru",
-                    "body": notification_body
-                },
-                "webpush": {
-                    "headers": {
-                        "Urgency": "high",
-                        "TTL": "86400"  # 24 часа
-                    },
-                    "notification": {
-                        "title": "Rental-Guru",
-                        "body": notification_body,
-                        "icon": "https://rentalguru.ru/static/firebase-logo.png",
-                        "badge": "https://rentalguru.ru/static/firebase-logo.png",
-                        "click_action": notification_url or "https://rentalguru.ru",
-                        "requireInteraction": True,
-                        "actions": [
-                            {
-                                "action": "open",
-                                "title": "Открыть"
-                            }
-                        ]
-                    },
-                    "data": {
-                        "url": notification_url or "https://rentalguru.ru"
-                    }
-                }
-            }
-        }
+    with requests.Session() as session:
+        for token in tokens:
+            result = send_fcm_message(session, fcm_url, headers, token, notification_body, notification_url)
+            if result:
+                successful_sends += 1
+            elif result is False:
+                failed_sends += 1
+
+    return f"Push notifications sent: {successful_sends} successful, {failed_sends} failed"
+
 
+@shared_task
+def send_notifications_batch(notification_ids):
+    """
+    Рассылка пачки уведомлений одной задачей: письма уходят через одно SMTP-соединение (send_mass_mail),
+    push — с одним access_token FCM и одной HTTP-сессией на все токены получателей.
+    """
+    notifications = list(
+        Notification.objects.filter(id__in=notification_ids).select_related('user')
+    )
+    if not notifications:
+        return "No notifications to send"
+
+    emails = [
+        ('Rental-Guru', f'{notification.content}\n{notification.url}' if notification.url else notification.content,
+         DEFAULT_FROM_EMAIL, [notification.user.email])
+        for notification in notifications
+        if notification.user.email_notification and notification.user.email
+    ]
+    # Ошибка отправки писем не должна отменять push для всей пачки
+    emails_sent = 0
+    if emails:
         try:
-            response = requests.post(fcm_url, headers=headers, json=message, timeout=30)
+            emails_sent = send_mass_mail(emails, fail_silently=False)
+        except Exception:
+            logger.exception("Failed to send notification emails for batch")
 
-            if response.status_code == 200:
-                successful_sends += 1
-            elif response.status_code == 404:
-                # Токен не найден - удаляем его
-                from notification.models import FCMToken
-                FCMToken.objects.filter(token=token).delete()
-                print(f"Deleted invalid token: {token[:20]}...")
-            elif response.status_code == 400:
-                response_data = response.json()
-                error_code = response_data.get('error', {}).get('details', [{}])[0].get('errorCode', '')
-
-                if error_code in ['UNREGISTERED', 'INVALID_ARGUMENT']:
-                    # Токен недействителен - удаляем его
-                    from notification.models import FCMToken
-                    FCMToken.objects.filter(token=token).delete()
-                    print(f"Deleted unregistered token: {token[:20]}...")
-                else:
-                    failed_sends += 1
-                    print(f"Failed to send to token {token[:20]}...: {response.text}")
-            else:
-                failed_sends += 1
-                print(f"Failed to send notification to {token[:20]}...: {response.status_code} {response.text}")
-
-        except requests.exceptions.Timeout:
-            failed_sends += 1
-            print(f"Timeout sending to token {token[:20]}...")
-        except requests.exceptions.RequestException as e:
-            failed_sends += 1
-            print(f"Request error sending to token {token[:20]}...: {str(e)}")
+    push_notifications = [notification for notification in notifications if notification.user.push_notification]
+    tokens = {}
+    for user_id, token in FCMToken.objects.filter(
+            user_id__in={notification.user_id for notification in push_notifications}
+    ).values_list('user_id', 'token'):
+        tokens.setdefault(user_id, []).append(token)
+
+    successful_sends = 0
+    failed_sends = 0
+    if tokens:
+        try:
+            access_token = get_fcm_access_token()
         except Exception as e:
-            failed_sends += 1
-            print(f"Unexpected error sending to token {token[:20]}...: {str(e)}")
+            return f"Emails sent: {emails_sent}; failed to get access token: {str(e)}"
 
-    return f"Push notifications sent: {successful_sends} successful, {failed_sends} failed"
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json; charset=UTF-8",
+        }
+        fcm_url = get_fcm_url()
+        with requests.Session() as session:
+            for notification in push_notifications:
+                body = f'{notification.content}\n{notification.get_absolute_url()}'
+                for token in tokens.get(notification.user_id, []):
+                    result = send_fcm_message(session, fcm_url, headers, token, body, notification.url)
+                    if result:
+                        successful_sends += 1
+                    elif result is False:
+                        failed_sends += 1
+
+    return f"Emails sent: {emails_sent}; push notifications sent: {successful_sends} successful, {failed_sends} failed"
 
 
 @shared_task
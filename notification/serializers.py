@@ -10,6 +10,5 @@ class NotificationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         request = self.context.get('request')
-        notification = Notification.objects.create(user=request.user, **validated_data)
-        notification.send_notification()
-        return notification
+        # Notification.save уже ставит отправку письма и push
+        return Notification.objects.create(user=request.user, **validated_data)
@@ -3,6 +3,7 @@ from django.contrib.contenttypes.admin import GenericStackedInline
 
 from feedback.models import Feedback
 from .models import *
+from .utils import apply_availability_periods
 
 
 class BaseFeatures(admin.ModelAdmin):
@@ -207,16 +208,7 @@ class BaseVehicleAdmin(admin.ModelAdmin):
         super().save_related(request, form, formsets, change)
 
         availabilities = list(form.instance.availabilities.values('start_date', 'end_date', 'on_request'))
-
-        if any(avail['on_request'] for avail in availabilities):
-            form.instance.availabilities.exclude(on_request=True).delete()
-        else:
-            if availabilities:
-                merged_availabilities = merge_periods(availabilities)
-                form.instance.availabilities.all().delete()
-
-                for availability in merged_availabilities:
-                    Availability.objects.create(vehicle=form.instance, **availability)
+        apply_availability_periods(form.instance, availabilities)
 
     def get_inline_instances(self, request, obj=None):
         inline_instances = super().get_inline_instances(request, obj)
@@ -0,0 +1,149 @@
+"""
+Автодополнение марок и моделей из индекса в памяти процесса.
+
+Индекс — отсортированный массив ключей (названия марок, "марка модель", названия моделей и их транслитерация),
+префиксный поиск выполняется бинарным поиском без обращения к базе. Актуальность определяется версией в кэше
+(Redis), которую сигналы увеличивают при изменении VehicleBrand/VehicleModel; версия проверяется не чаще
+одного раза в AUTOCOMPLETE_VERSION_CHECK_INTERVAL секунд.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from django.core.cache import cache
+from transliterate import translit
+
+from vehicle.models import VehicleBrand, VehicleModel
+
+AUTOCOMPLETE_VERSION_KEY = 'vehicle:autocomplete:version'
+AUTOCOMPLETE_VERSION_CHECK_INTERVAL = 5
+
+
+def normalize(text):
+    return ' '.join(text.lower().replace('ё', 'е').split())
+
+
+def name_variants(name):
+    """ Название и его транслитерация в обе стороны """
+    variants = {normalize(name)}
+    for reversed_ in (False, True):
+        try:
+            variants.add(normalize(translit(name, 'ru', reversed=reversed_)))
+        except Exception:
+            continue
+    return variants
+
+
+def bounded_levenshtein(a, b, max_distance):
+    """ Расстояние Левенштейна или max_distance + 1, если оно больше порога """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class AutocompleteIndex:
+    def __init__(self, brands, models):
+        """
+        brands — [(id, name)], models — [(brand_id, name)]
+        """
+        brand_names = dict(brands)
+        self.brand_models = {}
+        self.brand_keys = {}
+        entries = set()
+
+        for brand_id, brand_name in brands:
+            for key in name_variants(brand_name):
+                entries.add((key, brand_name))
+                self.brand_keys[key] = brand_id
+
+        for brand_id, model_name in models:
+            brand_name = brand_names.get(brand_id)
+            if brand_name is None:
+                continue
+            suggestion = f"{brand_name} {model_name}"
+            self.brand_models.setdefault(brand_id, []).append(suggestion)
+            for key in name_variants(suggestion) | name_variants(model_name):
+                entries.add((key, suggestion))
+
+        self.entries = sorted(entries)
+        self.keys = [key for key, _ in self.entries]
+        self.brand_names = brand_names
+
+    def prefix_search(self, prefix, limit):
+        suggestions = []
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and self.keys[position].startswith(prefix) and len(suggestions) < limit:
+            suggestion = self.entries[position][1]
+            if suggestion not in suggestions:
+                suggestions.append(suggestion)
+            position += 1
+        return suggestions
+
+    def fuzzy_search(self, query, limit):
+        """ Поиск марок с опечаткой: сравнивается начало названия той же длины, что и запрос """
+        max_distance = 1 if len(query) <= 4 else 2
+        scored = []
+        for key, brand_id in self.brand_keys.items():
+            distance = bounded_levenshtein(query, key[:len(query)], max_distance)
+            if distance <= max_distance:
+                scored.append((distance, key, self.brand_names[brand_id]))
+        suggestions = []
+        for _, _, brand_name in sorted(scored):
+            if brand_name not in suggestions:
+                suggestions.append(brand_name)
+        return suggestions[:limit]
+
+    def suggest(self, query, limit=10):
+        query = normalize(query)
+        if not query:
+            return []
+
+        brand_id = self.brand_keys.get(query)
+        if brand_id is not None:
+            return list(self.brand_models.get(brand_id, []))
+
+        return self.prefix_search(query, limit) or self.fuzzy_search(query, limit)
+
+
+_index = None
+_index_version = None
+_checked_at = 0
+_lock = threading.Lock()
+
+
+def bump_autocomplete_version():
+    cache.set(AUTOCOMPLETE_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def build_autocomplete_index():
+    brands = list(VehicleBrand.objects.values_list('id', 'name'))
+    models = list(VehicleModel.objects.values_list('brand_id', 'name'))
+    return AutocompleteIndex(brands, models)
+
+
+def get_autocomplete_index():
+    """ Индекс процесса; пересобирается, если версия в кэше изменилась """
+    global _index, _index_version, _checked_at
+
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < AUTOCOMPLETE_VERSION_CHECK_INTERVAL:
+        return _index
+
+    with _lock:
+        version = cache.get(AUTOCOMPLETE_VERSION_KEY)
+        if version is None:
+            bump_autocomplete_version()
+            version = cache.get(AUTOCOMPLETE_VERSION_KEY)
+        if _index is None or version != _index_version:
+            _index = build_autocomplete_index()
+            _index_version = version
+        _checked_at = now
+    return _index
@@ -0,0 +1,117 @@
+"""
+Календарь доступности транспорта по месяцам.
+
+Сетка месяца строится из периодов Availability, принятых заявок RequestRent и активных поездок Trip и кэшируется
+по ключу (транспорт, месяц, версия). Версия транспорта увеличивается сигналами при изменении доступности,
+заявок и поездок, поэтому все закэшированные месяцы транспорта устаревают одной записью в кэш.
+"""
+import calendar
+import time
+from datetime import date, timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Q
+
+CALENDAR_CACHE_TIMEOUT = 60 * 60 * 24
+ACTIVE_TRIP_STATUSES = ('current', 'started')
+
+FREE = 'free'
+BOOKED = 'booked'
+ON_REQUEST = 'on_request'
+UNAVAILABLE = 'unavailable'
+
+
+def calendar_version_key(vehicle_id):
+    return f'vehicle:calendar:version:{vehicle_id}'
+
+
+def bump_calendar_version(vehicle_id):
+    cache.set(calendar_version_key(vehicle_id), time.time_ns(), timeout=None)
+
+
+def calendar_month_key(vehicle_id, year, month, version):
+    return f'vehicle:calendar:{vehicle_id}:{year}-{month:02d}:{version}'
+
+
+def month_bounds(year, month):
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def iter_months(year, month, count):
+    for _ in range(count):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _mark(statuses, first_day, last_day, start, end, status):
+    start, end = max(start, first_day), min(end, last_day)
+    day = start
+    while day <= end:
+        statuses[day] = status
+        day += timedelta(days=1)
+
+
+def build_calendar_month(vehicle_id, year, month):
+    """ [{'date', 'status'}] на каждый день месяца """
+    from chat.models import RequestRent, Trip
+    from vehicle.models import Vehicle, Availability
+
+    first_day, last_day = month_bounds(year, month)
+    statuses = {first_day + timedelta(days=i): UNAVAILABLE for i in range((last_day - first_day).days + 1)}
+
+    availabilities = Availability.objects.filter(vehicle_id=vehicle_id).filter(
+        Q(on_request=True) | Q(start_date__lte=last_day, end_date__gte=first_day)
+    )
+    on_request = False
+    for start_date, end_date, is_on_request in availabilities.values_list('start_date', 'end_date', 'on_request'):
+        if is_on_request:
+            on_request = True
+        elif start_date and end_date:
+            _mark(statuses, first_day, last_day, start_date, end_date, FREE)
+
+    if on_request:
+        # Транспорт сдается по запросу: свободные даты уточняются у арендодателя
+        statuses = {day: ON_REQUEST for day in statuses}
+
+    polymorphic_ctype_id = Vehicle.objects.non_polymorphic().filter(id=vehicle_id).values_list(
+        'polymorphic_ctype_id', flat=True).first()
+    if polymorphic_ctype_id is not None:
+        content_type = ContentType.objects.get_for_id(polymorphic_ctype_id)
+        booking_filter = dict(content_type=content_type, object_id=vehicle_id,
+                              start_date__lte=last_day, end_date__gte=first_day)
+        bookings = list(RequestRent.objects.filter(status='accept', is_deleted=False, **booking_filter)
+                        .values_list('start_date', 'end_date'))
+        bookings += list(Trip.objects.filter(status__in=ACTIVE_TRIP_STATUSES, **booking_filter)
+                         .values_list('start_date', 'end_date'))
+        for start_date, end_date in bookings:
+            _mark(statuses, first_day, last_day, start_date, end_date, BOOKED)
+
+    return [{'date': day.isoformat(), 'status': status} for day, status in sorted(statuses.items())]
+
+
+def get_calendar(vehicle_id, year, month, months=1):
+    """ Календарь на months месяцев начиная с year-month; закэшированные месяцы читаются одним get_many """
+    version_key = calendar_version_key(vehicle_id)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, time.time_ns(), timeout=None)
+        version = cache.get(version_key)
+
+    keys = {
+        (y, m): calendar_month_key(vehicle_id, y, m, version)
+        for y, m in iter_months(year, month, months)
+    }
+    cached = cache.get_many(list(keys.values()))
+
+    result, missing = [], {}
+    for (y, m), key in keys.items():
+        days = cached.get(key)
+        if days is None:
+            days = build_calendar_month(vehicle_id, y, m)
+            missing[key] = days
+        result.append({'month': f'{y}-{m:02d}', 'days': days})
+
+    if missing:
+        cache.set_many(missing, timeout=CALENDAR_CACHE_TIMEOUT)
+    return result
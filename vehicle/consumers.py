@@ -1,12 +1,31 @@
+import asyncio
 import json
-from channels.generic.websocket import AsyncWebsocketConsumer
+import time
+
 from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from .geo import haversine_m
+from .gps import abuffer_position, aget_live_position
 
 
 class GPSTrackingConsumer(AsyncWebsocketConsumer):
+    """
+    Трансляция координат транспорта.
+    Каждая корректная точка от трекера сразу попадает в буфер координат и трек (vehicle/gps.py), в том числе
+    точки стоящего транспорта. Рассылка подписчикам прореживается: за окно GPS_COALESCE_WINDOW остается только
+    последняя точка, рассылка идет не чаще GPS_MAX_UPDATES_PER_SECOND раз в секунду, а смещения меньше
+    GPS_MIN_DISTANCE_METERS не рассылаются.
+    """
+
     async def connect(self):
         self.vehicle_id = self.scope['url_route']['kwargs']['vehicle_id']
         self.room_group_name = f'gps_tracking_{self.vehicle_id}'
+        self.pending = None
+        self.last_sent = None
+        self.last_sent_at = 0
+        self.flush_task = None
 
         # Присоединиться к группе
         await self.channel_layer.group_add(
@@ -16,7 +35,16 @@ class GPSTrackingConsumer(AsyncWebsocketConsumer):
 
         await self.accept()
 
+        # Сразу отправить последнюю известную позицию
+        position = await self.get_last_position()
+        if position:
+            await self.send(text_data=json.dumps(position))
+
     async def disconnect(self, close_code):
+        if self.flush_task:
+            self.flush_task.cancel()
+            await self.flush_pending()
+
         # Покинуть группу
         await self.channel_layer.group_discard(
             self.room_group_name,
@@ -25,23 +53,71 @@ class GPSTrackingConsumer(AsyncWebsocketConsumer):
 
     # Получение сообщения от WebSocket
     async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        latitude = text_data_json['latitude']
-        longitude = text_data_json['longitude']
+        try:
+            text_data_json = json.loads(text_data)
+            speed = text_data_json.get('speed')
+            point = {
+                'latitude': float(text_data_json['latitude']),
+                'longitude': float(text_data_json['longitude']),
+                'speed': float(speed) if speed is not None else None,
+            }
+        except (ValueError, KeyError, TypeError):
+            return
+
+        # Трек хранит все точки: прореживание ниже касается только рассылки
+        await abuffer_position(self.vehicle_id, point['latitude'], point['longitude'], speed=point['speed'])
+        self.pending = point
+
+        # Точки внутри окна объединяются: отправится последняя
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self.flush_later())
 
-        # Обновить координаты в базе данных
-        await self.update_vehicle_location(latitude, longitude)
+    async def flush_later(self):
+        min_interval = 1 / settings.GPS_MAX_UPDATES_PER_SECOND
+        delay = max(settings.GPS_COALESCE_WINDOW, self.last_sent_at + min_interval - time.monotonic())
+        await asyncio.sleep(delay)
+        await self.flush_pending()
+
+    async def flush_pending(self):
+        position, self.pending = self.pending, None
+        if position is None or self.is_duplicate(position):
+            return
+
+        self.last_sent = position
+        self.last_sent_at = time.monotonic()
 
         # Отправить сообщение в группу
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'gps_update',
-                'latitude': latitude,
-                'longitude': longitude
+                'latitude': position['latitude'],
+                'longitude': position['longitude']
             }
         )
 
+    def is_duplicate(self, position):
+        if self.last_sent is None:
+            return False
+        distance = haversine_m(self.last_sent['latitude'], self.last_sent['longitude'],
+                               position['latitude'], position['longitude'])
+        return distance < settings.GPS_MIN_DISTANCE_METERS
+
+    async def get_last_position(self):
+        position = await aget_live_position(self.vehicle_id)
+        if position:
+            return {'latitude': position['latitude'], 'longitude': position['longitude']}
+        return await self.get_vehicle_position()
+
+    @database_sync_to_async
+    def get_vehicle_position(self):
+        from .models import Vehicle
+        if not str(self.vehicle_id).isdigit():
+            return None
+        return Vehicle.objects.non_polymorphic().filter(
+            id=self.vehicle_id, latitude__isnull=False, longitude__isnull=False
+        ).values('latitude', 'longitude').first()
+
     # Получение сообщения из группы
     async def gps_update(self, event):
         latitude = event['latitude']
@@ -52,8 +128,3 @@ class GPSTrackingConsumer(AsyncWebsocketConsumer):
             'latitude': latitude,
             'longitude': longitude
         }))
-
-    @database_sync_to_async
-    def update_vehicle_location(self, latitude, longitude):
-        from .models import Vehicle
-        Vehicle.objects.filter(id=self.vehicle_id).update(latitude=latitude, longitude=longitude)
\ No newline at end of file
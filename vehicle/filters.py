@@ -1,15 +1,192 @@
-import math
+from datetime import datetime
 
-from django.db.models import Q
+from django.db.models import Q, Exists, OuterRef
+from django.db.backends.postgresql.psycopg_any import DateRange
 from django_filters import rest_framework as filters
-from haversine import haversine, Unit
+from rest_framework.filters import OrderingFilter
 
+from RentalGuru import settings
 from vehicle.models import AutoFeaturesAdditionally, Auto, Bike, Ship, Helicopter, SpecialTechnic, VehicleModel, \
     BikeFeaturesAdditionally, ShipFeaturesAdditionally, FeaturesForChildren, \
-    FeaturesEquipment, VehicleBrand, AutoFeaturesFunctions, BikeFeaturesFunctions, ShipFeaturesFunctions
+    FeaturesEquipment, VehicleBrand, AutoFeaturesFunctions, BikeFeaturesFunctions, ShipFeaturesFunctions, \
+    VehicleSearchIndex, Availability
+from vehicle.geo import within_radius, distance_km
 
 
-class BaseFilter(filters.FilterSet):
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def rental_period_condition(value):
+    """
+    Условие "период доступности целиком содержит запрошенные даты" (daterange @>) для Availability.
+    value — slice из DateFromToRangeFilter, None если даты не переданы.
+    """
+    start, stop = _as_date(value.start), _as_date(value.stop)
+    if start and stop:
+        return Q(period__contains=DateRange(start, stop, '[]'))
+    if start or stop:
+        return Q(period__contains=start or stop)
+    return None
+
+
+class LocationFilterMixin:
+    def get_location(self):
+        """ Точка и радиус поиска из параметров запроса или None """
+        lat = self.data.get('lat')
+        lon = self.data.get('lon')
+        radius = self.data.get('radius') or 5  # Радиус по умолчанию 5 км
+        if not lat or not lon:
+            return None
+        try:
+            return float(lat), float(lon), float(radius)
+        except (ValueError, TypeError):
+            return None
+
+    def annotate_distance(self, queryset):
+        """ Аннотация distance (км) для сортировки ordering=distance """
+        location = self.get_location()
+        if location is None or 'distance' in queryset.query.annotations:
+            return queryset
+        lat, lon, radius = location
+        return queryset.annotate(distance=distance_km(lat, lon))
+
+    def filter_by_lat_lon(self, queryset, name, value):
+        """
+        Фильтрация транспортных средств в заданном радиусе от указанной точки.
+        Куб earth_box отбирается по GiST-индексу, затем расстояние уточняется earth_distance.
+        Метод привязан к lat, lon и radius, поэтому повторные вызовы ничего не меняют.
+        """
+        location = self.get_location()
+        if location is None or 'distance' in queryset.query.annotations:
+            return queryset
+        lat, lon, radius = location
+        return (queryset.filter(within_radius(lat, lon, radius))
+                .annotate(distance=distance_km(lat, lon))
+                .filter(distance__lte=radius))
+
+
+class VehicleOrderingFilter(OrderingFilter):
+    """ Сортировка каталога: ordering=distance допустима только при поиске по координатам (lat, lon) """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and 'distance' not in queryset.query.annotations:
+            ordering = [term for term in ordering if term.lstrip('-') != 'distance'] or self.get_default_ordering(view)
+        return ordering
+
+
+class BaseIndexFilter(LocationFilterMixin, filters.FilterSet):
+    """
+    Фильтрация каталога по денормализованной таблице VehicleSearchIndex без join-ов и DISTINCT.
+    Параметры совпадают с BaseFilter.
+    """
+    super_host = filters.BooleanFilter(field_name='super_host', label='Суперхост')
+    day_price = filters.RangeFilter(field_name='day_price', label='Дневная цена')
+    verified_only = filters.BooleanFilter(field_name='drivers_only_verified',
+                                          label='Сдается только верифицированным пользователям')
+    brand = filters.CharFilter(method='filter_by_brand', label='Марка')
+    year = filters.RangeFilter(field_name='year', label='Год выпуска')
+    rental_date = filters.DateFromToRangeFilter(method='filter_by_rental_date', label='Выбор даты аренды')
+    city = filters.NumberFilter(field_name='city_id', label='Город')
+
+    lat = filters.NumberFilter(method='filter_by_lat_lon', label='Широта')
+    lon = filters.NumberFilter(method='filter_by_lat_lon', label='Долгота')
+    radius = filters.NumberFilter(method='filter_by_lat_lon', label='Радиус в км', required=False)
+
+    delivery = filters.BooleanFilter(field_name='delivery')
+    ensurance = filters.CharFilter(field_name='ensurance')
+    long_distance = filters.BooleanFilter(field_name='long_distance')
+    average_rating = filters.RangeFilter(field_name='average_rating', label='Средняя оценка')
+    verified = filters.BooleanFilter(field_name='verified', label='Верифицированный транспорт')
+
+    class Meta:
+        model = VehicleSearchIndex
+        fields = []
+
+    def filter_by_rental_date(self, queryset, name, value):
+        """ Транспорт, доступный весь выбранный период, или сдающийся по запросу """
+        condition = rental_period_condition(value)
+        if condition is None:
+            return queryset
+        periods = Availability.objects.filter(condition, vehicle_id=OuterRef('vehicle_id'), on_request=False)
+        return queryset.filter(Q(on_request=True) | Exists(periods))
+
+    def filter_by_brand(self, queryset, name, value):
+        brand_names = value.split(",")
+        return queryset.filter(brand_name__in=brand_names)
+
+    def filter_by_features(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(**{f'{name}__overlap': [feature.id for feature in value]})
+
+
+class AutoIndexFilter(BaseIndexFilter):
+    mileage_per_day = filters.RangeFilter(field_name='acceptable_mileage', label='Допустимый пробег/день')
+    vehicle_class = filters.CharFilter(field_name='vehicle_class_slug', label='Класс транспорта')
+    fuel_type = filters.CharFilter(field_name='fuel_type_slug', label='Тип топлива')
+    seat_count = filters.RangeFilter(field_name='seats', label='Количество мест')
+    transmission = filters.CharFilter(field_name='transmission_slug', label='Трансмиссия')
+    body_type = filters.CharFilter(field_name='body_type_slug', label='Тип кузова')
+    features_additionally = filters.ModelMultipleChoiceFilter(
+        queryset=AutoFeaturesAdditionally.objects.all(), method='filter_by_features', label='Выбор особенностей'
+    )
+    features_for_children = filters.ModelMultipleChoiceFilter(
+        queryset=FeaturesForChildren.objects.all(), method='filter_by_features', label='Для детей'
+    )
+    features_functions = filters.ModelMultipleChoiceFilter(
+        queryset=AutoFeaturesFunctions.objects.all(), method='filter_by_features', label='Функции'
+    )
+
+
+class BikeIndexFilter(BaseIndexFilter):
+    mileage_per_day = filters.RangeFilter(field_name='acceptable_mileage', label='Допустимый пробег/день')
+    vehicle_class = filters.CharFilter(field_name='vehicle_class_slug', label='Класс транспорта')
+    engine_capacity = filters.RangeFilter(field_name='engine_capacity', label='Объем двигателя')
+    seat_count = filters.RangeFilter(field_name='seats', label='Количество мест')
+    transmission = filters.CharFilter(field_name='transmission_slug', label='Трансмиссия')
+    body_type = filters.NumberFilter(field_name='body_type_id', label='Тип мотоцикла')
+    features_additionally = filters.ModelMultipleChoiceFilter(
+        queryset=BikeFeaturesAdditionally.objects.all(), method='filter_by_features', label='Выбор особенностей'
+    )
+    features_functions = filters.ModelMultipleChoiceFilter(
+        queryset=BikeFeaturesFunctions.objects.all(), method='filter_by_features', label='Функции'
+    )
+
+
+class ShipIndexFilter(BaseIndexFilter):
+    mileage_per_day = filters.RangeFilter(field_name='acceptable_mileage', label='Допустимый пробег/день')
+    vehicle_class = filters.CharFilter(field_name='vehicle_class_slug', label='Класс транспорта')
+    engine_capacity = filters.RangeFilter(field_name='engine_capacity', label='Объем двигателя')
+    grot = filters.CharFilter(field_name='grot', label='Грот')
+    type_ship = filters.NumberFilter(field_name='type_ship_id', label='Тип судна')
+    features_additionally = filters.ModelMultipleChoiceFilter(
+        queryset=ShipFeaturesAdditionally.objects.all(), method='filter_by_features', label='Выбор особенностей'
+    )
+    features_functions = filters.ModelMultipleChoiceFilter(
+        queryset=ShipFeaturesFunctions.objects.all(), method='filter_by_features', label='Функции'
+    )
+    features_equipment = filters.ModelMultipleChoiceFilter(
+        queryset=FeaturesEquipment.objects.all(), method='filter_by_features', label='Оборудование'
+    )
+
+
+class HelicopterIndexFilter(BaseIndexFilter):
+    mileage_per_day = filters.RangeFilter(field_name='acceptable_mileage', label='Допустимый пробег/день')
+    vehicle_class = filters.CharFilter(field_name='vehicle_class_slug', label='Класс транспорта')
+    engine_capacity = filters.RangeFilter(field_name='engine_capacity', label='Объем двигателя')
+    max_speed = filters.RangeFilter(field_name='max_speed', label='Максимальная скорость, км/ч')
+    full_take_weight = filters.RangeFilter(field_name='full_take_weight', label='Полный взлетный вес, кг')
+
+
+class SpecialTechnicIndexFilter(BaseIndexFilter):
+    engine_power = filters.RangeFilter(field_name='engine_power', label='Мощность двигателя, л.с.')
+    operating_weight = filters.RangeFilter(field_name='operating_weight', label='Эксплутационная масса, кг')
+    type_technic = filters.NumberFilter(field_name='type_technic_id', label='Тип судна')
+
+
+class BaseFilter(LocationFilterMixin, filters.FilterSet):
     super_host = filters.BooleanFilter(field_name='owner__lessor__super_host', label='Суперхост')
     day_price = filters.RangeFilter(field_name='rent_prices__total', label='Дневная цена')
     verified_only = filters.BooleanFilter(field_name='drivers_only_verified',
@@ -29,94 +206,43 @@ class BaseFilter(filters.FilterSet):
     average_rating = filters.RangeFilter(field_name='average_rating', label='Средняя оценка')
     verified = filters.BooleanFilter(field_name='verified', label='Верифицированный транспорт')
 
+    index_filterset_class = BaseIndexFilter
+
     class Meta:
         abstract = True
 
+    @property
+    def use_search_index(self):
+        return settings.VEHICLE_SEARCH_INDEX_ENABLED
+
+    def filter_queryset(self, queryset):
+        """ При VEHICLE_SEARCH_INDEX_ENABLED фильтры применяются к таблице VehicleSearchIndex """
+        if not self.use_search_index:
+            return super().filter_queryset(queryset)
+        index_filterset = self.index_filterset_class(
+            self.data, queryset=VehicleSearchIndex.objects.all(), request=self.request
+        )
+        queryset = queryset.filter(pk__in=index_filterset.qs.values('vehicle_id'))
+        return self.annotate_distance(queryset)
+
     def filter_by_rental_date(self, queryset, name, value):
         """
         Фильтрация по диапазону дат аренды, с добавлением объектов, у которых on_request=True.
+        Проверка через EXISTS по GiST-индексу (vehicle, period), без join-а и DISTINCT.
         """
-        if value.start and value.stop:
-            queryset = queryset.filter(
-                Q(availabilities__start_date__lte=value.start, availabilities__end_date__gte=value.stop) |
-                Q(availabilities__on_request=True)
-            )
-        elif value.start:
-            queryset = queryset.filter(
-                Q(availabilities__start_date__lte=value.start) | Q(availabilities__on_request=True)
-            )
-        elif value.stop:
-            queryset = queryset.filter(
-                Q(availabilities__end_date__gte=value.stop) | Q(availabilities__on_request=True)
-            )
-        return queryset.distinct()
+        condition = rental_period_condition(value)
+        if condition is None:
+            return queryset
+        periods = Availability.objects.filter(Q(on_request=True) | condition, vehicle_id=OuterRef('pk'))
+        return queryset.filter(Exists(periods))
 
     def filter_by_brand(self, queryset, name, value):
         brand_names = value.split(",")
         return queryset.filter(brand__name__in=brand_names)
 
-    def filter_by_lat_lon(self, queryset, name, value):
-        """ Фильтрация транспортных средств в заданном радиусе от указанной точки. """
-        lat = self.data.get('lat')
-        lon = self.data.get('lon')
-        radius = self.data.get('radius', 5)  # Радиус по умолчанию 5 км
-
-        if lat and lon:
-            try:
-                lat = float(lat)
-                lon = float(lon)
-                radius = float(radius)
-
-                km_per_degree_lat = 111.0
-                # Один градус долготы зависит от широты (сужается к полюсам)
-                km_per_degree_lon = 111.0 * math.cos(math.radians(lat))
-
-                # Вычисляем границы координат для предварительной фильтрации
-                lat_delta = radius / km_per_degree_lat
-                lon_delta = radius / km_per_degree_lon
-
-                lat_min = lat - lat_delta
-                lat_max = lat + lat_delta
-                lon_min = lon - lon_delta
-                lon_max = lon + lon_delta
-
-                # Предварительная фильтрация по ограничивающему прямоугольнику
-                filtered_qs = queryset.filter(
-                    latitude__isnull=False,
-                    longitude__isnull=False,
-                    latitude__gte=lat_min,
-                    latitude__lte=lat_max,
-                    longitude__gte=lon_min,
-                    longitude__lte=lon_max
-                )
-
-                # Точная фильтрация по формуле гаверсинуса с использованием базы данных
-                earth_radius = 6371
-
-                from django.db.models.expressions import RawSQL
-                distance_sql = f"""
-                {earth_radius} * 2 * ASIN(
-                    SQRT(
-                        POWER(SIN(RADIANS(%s - latitude) / 2), 2) +
-                        COS(RADIANS(%s)) * COS(RADIANS(latitude)) *
-                        POWER(SIN(RADIANS(%s - longitude) / 2), 2)
-                    )
-                )
-                """
-
-                filtered_qs = filtered_qs.annotate(
-                    distance=RawSQL(distance_sql, [lat, lat, lon])
-                ).filter(distance__lte=radius)
-
-                return filtered_qs
-
-            except (ValueError, TypeError):
-                return queryset
-
-        return queryset
-
 
 class AutoFilter(BaseFilter):
+    index_filterset_class = AutoIndexFilter
 
     mileage_per_day = filters.RangeFilter(field_name='acceptable_mileage', label='Допустимый пробег/день')
     vehicle_class = filters.CharFilter(field_name='vehicle_class__slug', label='Класс транспорта')
@@ -153,6 +279,8 @@ class AutoFilter(BaseFilter):
 
 
 class BikeFilter(BaseFilter):
+    index_filterset_class = BikeIndexFilter
+
     mileage_per_day = filters.RangeFilter(field_name='acceptable_mileage', label='Допустимый пробег/день')
     vehicle_class = filters.CharFilter(field_name='vehicle_class__slug', label='Класс транспорта')
     engine_capacity = filters.RangeFilter(field_name='engine_capacity', label='Объем двигателя')
@@ -182,10 +310,12 @@ class BikeFilter(BaseFilter):
 
     def filter_queryset(self, queryset):
         queryset = super().filter_queryset(queryset)
-        return queryset.distinct()
+        return queryset if self.use_search_index else queryset.distinct()
 
 
 class ShipFilter(BaseFilter):
+    index_filterset_class = ShipIndexFilter
+
     mileage_per_day = filters.RangeFilter(field_name='acceptable_mileage', label='Допустимый пробег/день')
     vehicle_class = filters.CharFilter(field_name='vehicle_class__slug', label='Класс транспорта')
     engine_capacity = filters.RangeFilter(field_name='engine_capacity', label='Объем двигателя')
@@ -218,6 +348,8 @@ class ShipFilter(BaseFilter):
 
 
 class HelicopterFilter(BaseFilter):
+    index_filterset_class = HelicopterIndexFilter
+
     mileage_per_day = filters.RangeFilter(field_name='acceptable_mileage', label='Допустимый пробег/день')
     vehicle_class = filters.CharFilter(field_name='vehicle_class__slug', label='Класс транспорта')
     engine_capacity = filters.RangeFilter(field_name='engine_capacity', label='Объем двигателя')
@@ -232,6 +364,8 @@ class HelicopterFilter(BaseFilter):
 
 
 class SpecialTechnicFilter(BaseFilter):
+    index_filterset_class = SpecialTechnicIndexFilter
+
     engine_power = filters.RangeFilter(field_name='engine_power', label='Мощность двигателя, л.с.')
     operating_weight = filters.RangeFilter(field_name='operating_weight', label='Эксплутационная масса, кг')
     type_technic = filters.NumberFilter(field_name='type_technic__id', label='Тип судна')
@@ -0,0 +1,70 @@
+"""
+Выражения для геопоиска на расширениях Postgres cube + earthdistance.
+
+ll_to_earth(latitude, longitude) индексируется GiST-индексом (см. Vehicle.Meta.indexes), поэтому проверка
+попадания в earth_box и сортировка по оператору <-> (ближайшие N) выполняются по индексу.
+"""
+import math
+
+from django.db import models
+from django.db.models import Func, Value
+
+EARTH_RADIUS_M = 6371000
+
+
+class LLToEarth(Func):
+    function = 'll_to_earth'
+    output_field = models.Field()
+
+
+class EarthBox(Func):
+    function = 'earth_box'
+    output_field = models.Field()
+
+
+class CubeContains(Func):
+    """ cube @> cube """
+    arg_joiner = ' @> '
+    template = '%(expressions)s'
+    output_field = models.BooleanField()
+
+
+class CubeDistance(Func):
+    """ Евклидово расстояние между точками earth (оператор KNN <->), монотонно расстоянию по поверхности """
+    arg_joiner = ' <-> '
+    template = '(%(expressions)s)'
+    output_field = models.FloatField()
+
+
+class EarthDistance(Func):
+    """ Расстояние по поверхности Земли в метрах """
+    function = 'earth_distance'
+    output_field = models.FloatField()
+
+
+def earth_point(lat, lon):
+    return LLToEarth(Value(float(lat)), Value(float(lon)))
+
+
+def vehicle_point():
+    return LLToEarth('latitude', 'longitude')
+
+
+def within_radius(lat, lon, radius_km):
+    """ Условие попадания в куб вокруг точки, проверяется по GiST-индексу """
+    return CubeContains(EarthBox(earth_point(lat, lon), Value(float(radius_km) * 1000)), vehicle_point())
+
+
+def distance_km(lat, lon):
+    return EarthDistance(earth_point(lat, lon), vehicle_point()) / 1000
+
+
+def nearest_ordering(lat, lon):
+    return CubeDistance(vehicle_point(), earth_point(lat, lon))
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """ Расстояние между точками по поверхности Земли в метрах (без обращения к базе) """
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
@@ -0,0 +1,182 @@
+"""
+Буфер GPS-координат в Redis.
+
+Каждая точка трекера записывается не в таблицу Vehicle, а в Redis: последняя позиция транспорта хранится в хэше
+GPS_POSITIONS_KEY, id транспорта с непереданными в базу позициями — в множестве GPS_DIRTY_KEY. Задача
+flush_gps_positions раз в GPS_FLUSH_INTERVAL секунд переносит накопленные позиции в базу одним bulk_update.
+Актуальную позицию (в том числе еще не записанную в базу) отдает get_live_position.
+
+Все точки дополнительно складываются в список GPS_TRACK_KEY и при сбросе дописываются в историю
+VehiclePosition (см. vehicle/tracks.py).
+"""
+import json
+import logging
+import time
+
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.db import transaction
+
+from RentalGuru.settings import redis_1, REDIS_URL
+
+GPS_POSITIONS_KEY = 'gps:positions'
+GPS_DIRTY_KEY = 'gps:dirty'
+GPS_FLUSH_SCHEDULED_KEY = 'gps:flush_scheduled'
+GPS_TRACK_KEY = 'gps:track'
+GPS_TRACK_BATCH_SIZE = 5000
+
+logger = logging.getLogger(__name__)
+
+_async_client = None
+
+
+def get_flush_interval():
+    return getattr(settings, 'GPS_FLUSH_INTERVAL', 10)
+
+
+def get_async_redis():
+    """ Асинхронный клиент к той же базе Redis, что и redis_1 (для consumers) """
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.from_url(f'{REDIS_URL}/1')
+    return _async_client
+
+
+def _position(latitude, longitude, timestamp=None, speed=None):
+    return {
+        'latitude': float(latitude),
+        'longitude': float(longitude),
+        'timestamp': timestamp or time.time(),
+        'speed': float(speed) if speed is not None else None,
+    }
+
+
+def _track_payload(vehicle_id, position):
+    return json.dumps({'vehicle_id': int(vehicle_id), **position})
+
+
+def _parse_position(raw):
+    return json.loads(raw) if raw else None
+
+
+def schedule_flush():
+    """ Ставит задачу сброса буфера, если она еще не запланирована """
+    interval = get_flush_interval()
+    if redis_1.set(GPS_FLUSH_SCHEDULED_KEY, 1, nx=True, ex=interval * 2):
+        from vehicle.tasks import flush_gps_positions
+        flush_gps_positions.apply_async(countdown=interval)
+
+
+def buffer_position(vehicle_id, latitude, longitude, timestamp=None, speed=None):
+    """ Запоминает последнюю позицию транспорта в буфере и добавляет точку в трек """
+    position = _position(latitude, longitude, timestamp, speed)
+    pipe = redis_1.pipeline(transaction=False)
+    pipe.hset(GPS_POSITIONS_KEY, vehicle_id, json.dumps(position))
+    pipe.sadd(GPS_DIRTY_KEY, vehicle_id)
+    pipe.rpush(GPS_TRACK_KEY, _track_payload(vehicle_id, position))
+    pipe.execute()
+    schedule_flush()
+
+
+async def abuffer_position(vehicle_id, latitude, longitude, timestamp=None, speed=None):
+    """ Асинхронный вариант buffer_position для consumers """
+    position = _position(latitude, longitude, timestamp, speed)
+    client = get_async_redis()
+    pipe = client.pipeline(transaction=False)
+    pipe.hset(GPS_POSITIONS_KEY, vehicle_id, json.dumps(position))
+    pipe.sadd(GPS_DIRTY_KEY, vehicle_id)
+    pipe.rpush(GPS_TRACK_KEY, _track_payload(vehicle_id, position))
+    pipe.set(GPS_FLUSH_SCHEDULED_KEY, 1, nx=True, ex=get_flush_interval() * 2)
+    *_, scheduled = await pipe.execute()
+    if scheduled:
+        from vehicle.tasks import flush_gps_positions
+        flush_gps_positions.apply_async(countdown=get_flush_interval())
+
+
+def get_live_position(vehicle_id):
+    """ Последняя позиция из буфера: {'latitude', 'longitude', 'timestamp'} или None """
+    return _parse_position(redis_1.hget(GPS_POSITIONS_KEY, vehicle_id))
+
+
+async def aget_live_position(vehicle_id):
+    return _parse_position(await get_async_redis().hget(GPS_POSITIONS_KEY, vehicle_id))
+
+
+def pop_dirty_positions():
+    """ Забирает из буфера позиции, еще не записанные в базу: {vehicle_id: position} """
+    pipe = redis_1.pipeline(transaction=True)
+    pipe.smembers(GPS_DIRTY_KEY)
+    pipe.delete(GPS_DIRTY_KEY)
+    vehicle_ids, _ = pipe.execute()
+    if not vehicle_ids:
+        return {}
+
+    vehicle_ids = sorted(int(vehicle_id) for vehicle_id in vehicle_ids if vehicle_id.isdigit())
+    raw_positions = redis_1.hmget(GPS_POSITIONS_KEY, vehicle_ids)
+    return {
+        vehicle_id: _parse_position(raw)
+        for vehicle_id, raw in zip(vehicle_ids, raw_positions) if raw
+    }
+
+
+def flush_positions():
+    """
+    Записывает накопленные позиции в Vehicle и VehicleSearchIndex, а точки трека — в VehiclePosition.
+    Возвращает количество транспорта с обновленной позицией. Ошибка записи трека не блокирует обновление
+    позиций: точки остаются в буфере до следующего сброса.
+    """
+    try:
+        flush_track()
+    except Exception:
+        logger.exception("Failed to flush GPS track points")
+
+    positions = pop_dirty_positions()
+    if not positions:
+        return 0
+
+    try:
+        return _save_positions(positions)
+    except Exception:
+        # Позиции остаются в хэше, возвращаем их в очередь на следующий сброс
+        redis_1.sadd(GPS_DIRTY_KEY, *positions)
+        raise
+
+
+def flush_track():
+    """ Дописывает точки трека из буфера в историю пачками по GPS_TRACK_BATCH_SIZE """
+    from vehicle.tracks import save_track_points
+
+    saved = 0
+    while True:
+        pipe = redis_1.pipeline(transaction=True)
+        pipe.lrange(GPS_TRACK_KEY, 0, GPS_TRACK_BATCH_SIZE - 1)
+        pipe.ltrim(GPS_TRACK_KEY, GPS_TRACK_BATCH_SIZE, -1)
+        raw_points, _ = pipe.execute()
+        if not raw_points:
+            return saved
+
+        try:
+            save_track_points([json.loads(raw) for raw in raw_points])
+        except Exception:
+            # Возвращаем пачку в начало списка, чтобы не потерять точки
+            redis_1.lpush(GPS_TRACK_KEY, *reversed(raw_points))
+            raise
+        saved += len(raw_points)
+
+
+def _save_positions(positions):
+    from vehicle.models import Vehicle, VehicleSearchIndex
+
+    existing_ids = set(Vehicle.objects.non_polymorphic().filter(id__in=positions).values_list('id', flat=True))
+    vehicles = [
+        Vehicle(id=vehicle_id, latitude=position['latitude'], longitude=position['longitude'])
+        for vehicle_id, position in positions.items() if vehicle_id in existing_ids
+    ]
+    with transaction.atomic():
+        Vehicle.objects.non_polymorphic().bulk_update(vehicles, ['latitude', 'longitude'], batch_size=500)
+        index_rows = [
+            VehicleSearchIndex(vehicle_id=vehicle.id, latitude=vehicle.latitude, longitude=vehicle.longitude)
+            for vehicle in vehicles
+        ]
+        VehicleSearchIndex.objects.bulk_update(index_rows, ['latitude', 'longitude'], batch_size=500)
+    return len(vehicles)
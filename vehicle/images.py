@@ -0,0 +1,81 @@
+"""
+Генерация вариантов фото транспорта.
+
+Оригинал загрузки не отдается в списках: задача process_vehicle_photo поворачивает изображение по EXIF, удаляет
+метаданные и сохраняет рядом с оригиналом WebP-варианты фиксированных размеров (PHOTO_VARIANTS). Пути вариантов
+хранятся в VehiclePhoto.photo_card / photo_gallery / photo_full.
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+# Вариант: (максимальная ширина, максимальная высота, качество WebP)
+PHOTO_VARIANTS = {
+    'card': (480, 360, 75),
+    'gallery': (1280, 960, 80),
+    'full': (2048, 2048, 85),
+}
+
+
+def variant_name(original_name, variant):
+    base, _ = os.path.splitext(original_name)
+    return f'{base}_{variant}.webp'
+
+
+def render_variant(image, max_width, max_height, quality):
+    variant = image.copy()
+    variant.thumbnail((max_width, max_height), Image.LANCZOS)
+    buffer = BytesIO()
+    # exif не передается, поэтому метаданные (в том числе геотеги) в вариант не попадают
+    variant.save(buffer, format='WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def generate_photo_variants(photo):
+    """ Создает все варианты для VehiclePhoto и возвращает {поле: имя файла} """
+    with photo.photo.open('rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    names = {}
+    for variant, (max_width, max_height, quality) in PHOTO_VARIANTS.items():
+        name = variant_name(photo.photo.name, variant)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        names[f'photo_{variant}'] = default_storage.save(
+            name, ContentFile(render_variant(image, max_width, max_height, quality))
+        )
+    return names
+
+
+def needs_processing(photo):
+    """ Варианты отсутствуют или сгенерированы для другого оригинала """
+    if not photo.photo:
+        return False
+    expected = os.path.splitext(photo.photo.name)[0]
+    return any(
+        not getattr(photo, f'photo_{variant}') or
+        not getattr(photo, f'photo_{variant}').name.startswith(expected)
+        for variant in PHOTO_VARIANTS
+    )
+
+
+def delete_photo_variants(photo):
+    for variant in PHOTO_VARIANTS:
+        file = getattr(photo, f'photo_{variant}')
+        if file and default_storage.exists(file.name):
+            default_storage.delete(file.name)
+
+
+def enqueue_photo_processing(photo_ids):
+    """ Ставит генерацию вариантов в очередь после коммита транзакции """
+    from vehicle.tasks import process_vehicle_photo
+
+    photo_ids = [photo_id for photo_id in photo_ids if photo_id]
+    if photo_ids:
+        transaction.on_commit(lambda: [process_vehicle_photo.delay(photo_id) for photo_id in photo_ids])
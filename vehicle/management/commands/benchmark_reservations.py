@@ -0,0 +1,98 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from vehicle.models import Vehicle, Availability, VehicleBooking
+from vehicle.reservations import reserve_period, BookingConflict
+from vehicle.utils import apply_availability_periods
+
+
+class Command(BaseCommand):
+    help = 'Параллельное подтверждение бронирований одного транспорта: проверка отсутствия двойных броней и замер времени'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vehicle-id', type=int, required=True, help='Транспорт с датами в доступности')
+        parser.add_argument('--threads', type=int, default=8, help='Количество параллельных подтверждений')
+        parser.add_argument('--days', type=int, default=3, help='Длительность каждой брони в днях')
+        parser.add_argument('--stride', type=int, default=0,
+                            help='Сдвиг начала брони между потоками в днях (0 - все потоки бронируют один период)')
+        parser.add_argument('--repeat', type=int, default=3, help='Количество повторов')
+
+    def handle(self, *args, **options):
+        vehicle = Vehicle.objects.non_polymorphic().filter(id=options['vehicle_id']).first()
+        if vehicle is None:
+            raise CommandError(f"Транспорт ID={options['vehicle_id']} не найден")
+
+        original = list(Availability.objects.filter(vehicle=vehicle).values('start_date', 'end_date', 'on_request'))
+        free = [period for period in original if not period['on_request'] and period['start_date']]
+        if not free:
+            raise CommandError("У транспорта нет свободных периодов с датами")
+        first = min(free, key=lambda period: period['start_date'])
+
+        try:
+            for attempt in range(1, options['repeat'] + 1):
+                self.run_attempt(vehicle, first['start_date'], options, attempt)
+                VehicleBooking.objects.filter(vehicle=vehicle, request_rent__isnull=True).delete()
+                apply_availability_periods(vehicle, original)
+        finally:
+            VehicleBooking.objects.filter(vehicle=vehicle, request_rent__isnull=True).delete()
+            apply_availability_periods(vehicle, original)
+
+    def run_attempt(self, vehicle, start_date, options, attempt):
+        threads_count = options['threads']
+        barrier = threading.Barrier(threads_count)
+        results = [None] * threads_count
+
+        def worker(index):
+            begin = start_date + timedelta(days=index * options['stride'])
+            end = begin + timedelta(days=options['days'] - 1)
+            try:
+                barrier.wait()
+                reserve_period(vehicle, begin, end)
+                results[index] = 'ok'
+            except BookingConflict:
+                results[index] = 'conflict'
+            except Exception as e:
+                results[index] = f'error: {e}'
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(threads_count)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        errors = [result for result in results if result.startswith('error')]
+        self.stdout.write(
+            f"Попытка {attempt}: {threads_count} потоков за {elapsed_ms:.1f} мс, "
+            f"успешно {results.count('ok')}, конфликтов {results.count('conflict')}, ошибок {len(errors)}"
+        )
+        for error in errors:
+            self.stderr.write(error)
+
+        bookings = sorted(
+            (booking.lower, booking.upper) for booking in VehicleBooking.objects.filter(
+                vehicle=vehicle, request_rent__isnull=True).values_list('period', flat=True)
+        )
+        overlaps = sum(1 for previous, current in zip(bookings, bookings[1:]) if current[0] < previous[1])
+        booked_days = {
+            booking[0] + timedelta(days=offset)
+            for booking in bookings for offset in range((booking[1] - booking[0]).days)
+        }
+        periods = list(Availability.objects.filter(vehicle=vehicle, on_request=False).values_list('start_date', 'end_date'))
+        leaked = sum(1 for day in booked_days for start, end in periods if start <= day <= end)
+
+        if overlaps or leaked or errors:
+            self.stdout.write(self.style.ERROR(
+                f"Пересечений броней: {overlaps}, забронированных дней в доступности: {leaked}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Броней: {len(bookings)}, пересечений нет, доступность согласована"
+            ))
@@ -0,0 +1,53 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from vehicle.models import Vehicle
+from vehicle.serializers.cards import build_vehicle_cards
+from vehicle.views import hydrate_vehicles, serialize_vehicles
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает BaseVehicleListSerializer и быструю сборку карточек build_vehicle_cards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000], help='Размеры страниц')
+        parser.add_argument('--repeat', type=int, default=5, help='Количество повторов для каждого размера')
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                data = func()
+                body = JSONRenderer().render(data)
+                timings.append(time.perf_counter() - started)
+        return min(timings) * 1000, len(queries), body
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            rows = list(Vehicle.objects.non_polymorphic().order_by('id').values('id', 'polymorphic_ctype_id')[:size])
+            if len(rows) < size:
+                self.stdout.write(self.style.WARNING(f"В базе только {len(rows)} транспортных средств из {size}"))
+
+            serializer_ms, serializer_queries, serializer_body = self.measure(
+                lambda: serialize_vehicles(hydrate_vehicles(rows)), options['repeat']
+            )
+            cards_ms, cards_queries, cards_body = self.measure(
+                lambda: build_vehicle_cards(row['id'] for row in rows), options['repeat']
+            )
+
+            same = json.loads(serializer_body) == json.loads(cards_body)
+            self.stdout.write(
+                f"{len(rows)} карточек: сериализатор {serializer_ms:.1f} мс ({serializer_queries} запросов), "
+                f"build_vehicle_cards {cards_ms:.1f} мс ({cards_queries} запросов), "
+                f"ускорение x{serializer_ms / cards_ms if cards_ms else 0:.1f}"
+            )
+            if same:
+                self.stdout.write(self.style.SUCCESS("Ответы совпадают"))
+            else:
+                self.stdout.write(self.style.ERROR("Ответы различаются"))
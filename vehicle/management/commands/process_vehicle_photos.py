@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from vehicle.images import generate_photo_variants, needs_processing
+from vehicle.models import VehiclePhoto
+from vehicle.tasks import process_vehicle_photo
+
+
+class Command(BaseCommand):
+    help = 'Генерирует варианты (card, gallery, full) для уже загруженных фото транспорта'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Пересоздать варианты для всех фото')
+        parser.add_argument('--sync', action='store_true', help='Обрабатывать в текущем процессе, без Celery')
+
+    def handle(self, *args, **options):
+        queryset = VehiclePhoto.objects.exclude(photo='').order_by('id')
+        if not options['all']:
+            queryset = queryset.filter(photo_card='')
+
+        processed = 0
+        failed = 0
+        for photo in queryset.iterator(chunk_size=500):
+            if not options['all'] and not needs_processing(photo):
+                continue
+            if not options['sync']:
+                process_vehicle_photo.delay(photo.id)
+                processed += 1
+                continue
+            try:
+                VehiclePhoto.objects.filter(id=photo.id).update(**generate_photo_variants(photo))
+                processed += 1
+            except Exception as e:
+                self.stderr.write(f"Ошибка при обработке фото ID={photo.id}: {e}")
+                failed += 1
+
+            if processed and processed % 100 == 0:
+                self.stdout.write(f"Обработано {processed}...")
+
+        action = 'Обработано' if options['sync'] else 'Поставлено в очередь'
+        self.stdout.write(self.style.SUCCESS(f"Готово! {action}: {processed}, ошибок: {failed}"))
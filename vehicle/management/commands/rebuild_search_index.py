@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from vehicle.models import VehicleSearchIndex
+from vehicle.search_index import VEHICLE_TYPES, FEATURE_FIELDS, build_search_index_row, save_search_index_rows
+
+
+class Command(BaseCommand):
+    help = 'Полностью пересобирает таблицу VehicleSearchIndex'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Количество строк в одной пачке')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+
+        for model_cls in VEHICLE_TYPES:
+            prefetch = ['rent_prices', 'availabilities'] + [f for f in FEATURE_FIELDS if hasattr(model_cls, f)]
+            select = ['owner__lessor', 'brand'] + [
+                f for f in ('vehicle_class', 'fuel_type', 'transmission', 'body_type') if hasattr(model_cls, f)
+            ]
+            queryset = model_cls.objects.select_related(*select).prefetch_related(*prefetch).order_by('pk')
+
+            rows = []
+            for vehicle in queryset.iterator(chunk_size=batch_size):
+                rows.append(build_search_index_row(vehicle))
+                if len(rows) >= batch_size:
+                    save_search_index_rows(rows)
+                    total += len(rows)
+                    rows = []
+            save_search_index_rows(rows)
+            total += len(rows)
+            self.stdout.write(f"{model_cls._meta.verbose_name_plural}: обработано, всего строк {total}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово! Строк в индексе: {VehicleSearchIndex.objects.count()}"
+        ))
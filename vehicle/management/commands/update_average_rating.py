@@ -1,29 +1,88 @@
+import time
+
 from django.core.management.base import BaseCommand
-from vehicle.models import Vehicle
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from vehicle.models import Vehicle, VehicleSearchIndex
+from vehicle.ratings import average_rating_sql
 
 
 class Command(BaseCommand):
     help = 'Пересчитывает поле average_rating на основе JSON-поля ratings'
 
-    def handle(self, *args, **kwargs):
-        updated = 0
-        skipped = 0
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Размер диапазона id, обрабатываемого одним запросом')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать транспорт с устаревшим средним рейтингом, без записи')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        bounds = Vehicle.objects.non_polymorphic().aggregate(min_id=Min('id'), max_id=Max('id'))
+        if bounds['min_id'] is None:
+            self.stdout.write("Транспорт не найден")
+            return
+
+        vehicle_table = Vehicle._meta.db_table
+        index_table = VehicleSearchIndex._meta.db_table
+        computed = f"""
+            SELECT id, {average_rating_sql('ratings')} AS average_rating
+            FROM {vehicle_table}
+            WHERE id >= %s AND id < %s
+        """
+        count_sql = f"""
+            SELECT count(*)
+            FROM ({computed}) AS computed
+            JOIN {vehicle_table} AS vehicle ON vehicle.id = computed.id
+            WHERE vehicle.average_rating IS DISTINCT FROM computed.average_rating
+        """
+        update_sql = f"""
+            UPDATE {vehicle_table} AS vehicle
+            SET average_rating = computed.average_rating
+            FROM ({computed}) AS computed
+            WHERE vehicle.id = computed.id
+              AND vehicle.average_rating IS DISTINCT FROM computed.average_rating
+            RETURNING vehicle.id
+        """
+        index_sql = f"""
+            UPDATE {index_table} AS search_index
+            SET average_rating = vehicle.average_rating
+            FROM {vehicle_table} AS vehicle
+            WHERE search_index.vehicle_id = vehicle.id
+              AND search_index.vehicle_id = ANY(%s)
+        """
 
-        vehicles = Vehicle.objects.all()
-        total = vehicles.count()
+        total_range = bounds['max_id'] - bounds['min_id'] + 1
+        self.stdout.write(
+            f"Пересчет рейтингов для id {bounds['min_id']}..{bounds['max_id']}"
+            f"{' (dry-run)' if dry_run else ''}..."
+        )
 
-        self.stdout.write(f"Обновление рейтингов для {total} транспортных средств...")
+        started = time.monotonic()
+        changed = 0
+        for start in range(bounds['min_id'], bounds['max_id'] + 1, batch_size):
+            end = start + batch_size
+            with transaction.atomic(), connection.cursor() as cursor:
+                if dry_run:
+                    cursor.execute(count_sql, [start, end])
+                    changed += cursor.fetchone()[0]
+                else:
+                    cursor.execute(update_sql, [start, end])
+                    updated_ids = [row[0] for row in cursor.fetchall()]
+                    if updated_ids:
+                        cursor.execute(index_sql, [updated_ids])
+                    changed += len(updated_ids)
 
-        for vehicle in vehicles:
-            try:
-                avg = vehicle.get_average_rating().get('rating', 0) or 0
-                vehicle.average_rating = avg
-                vehicle.save(update_fields=['average_rating'])
-                updated += 1
-            except Exception as e:
-                self.stderr.write(f"Ошибка при обработке ID={vehicle.id}: {e}")
-                skipped += 1
+            done = min(end, bounds['max_id'] + 1) - bounds['min_id']
+            self.stdout.write(
+                f"  {done * 100 // total_range}% (id < {end}): изменено {changed}, "
+                f"{time.monotonic() - started:.1f} с"
+            )
 
+        action = 'Требуют обновления' if dry_run else 'Обновлено'
         self.stdout.write(self.style.SUCCESS(
-            f"Готово! Обновлено: {updated}, Пропущено из-за ошибок: {skipped}"
+            f"Готово! {action}: {changed} за {time.monotonic() - started:.1f} с"
         ))
@@ -1,59 +1,32 @@
 from django.core.management.base import BaseCommand
-from django.contrib.postgres.search import SearchVector
-from django.db import models
+from django.db import connection, transaction
+
 from vehicle.models import VehicleModel, VehicleBrand
-from transliterate import translit
 
 
 class Command(BaseCommand):
     help = 'Updates search vectors for vehicle brands and models'
 
     def handle(self, *args, **kwargs):
-        """ Обновление вектороов поиска """
+        """
+        Пересчет векторов поиска для всех марок и моделей.
+        При обычных изменениях векторы поддерживают триггеры базы (миграция 0035), команда нужна для массового
+        пересчета, например после изменения функции vehicle_search_document.
+        """
         self.stdout.write('Updating search vectors...')
 
-        for model in VehicleModel.objects.select_related('brand').iterator():
-            combined_text = f"{model.name} {model.brand.name}"
-            VehicleModel.objects.filter(pk=model.pk).update(search_vector=SearchVector(
-                    models.Value(combined_text), config='russian'
-                )
-            )
-        model_count = VehicleModel.objects.count()
-
-        for brand in VehicleBrand.objects.all().iterator():
-            text = brand.name
-            VehicleBrand.objects.filter(pk=brand.pk).update(search_vector=SearchVector(
-                    models.Value(text), config='russian'
-                )
-            )
+        brand_table = VehicleBrand._meta.db_table
+        model_table = VehicleModel._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"UPDATE {brand_table} SET search_vector = vehicle_search_document(NULL, name)")
+            brand_count = cursor.rowcount
+            cursor.execute(f"""
+                UPDATE {model_table} AS model
+                SET search_vector = vehicle_search_document(model.name, brand.name)
+                FROM {brand_table} AS brand
+                WHERE brand.id = model.brand_id
+            """)
+            model_count = cursor.rowcount
 
-        self.stdout.write(f'Updated {model_count} models')
+        self.stdout.write(f'Updated {brand_count} brands, {model_count} models')
         self.stdout.write(self.style.SUCCESS('Successfully updated all search vectors'))
-
-    # def handle(self, *args, **kwargs):
-    #     """ Обновление векторов поиска с поддержкой русского языка """
-    #     self.stdout.write('Updating search vectors...')
-    #
-    #     for brand in VehicleBrand.objects.all().iterator():
-    #         brand_en = f"{brand.name}"
-    #         brand_ru = translit(brand_en, language_code='ru')
-    #         VehicleBrand.objects.filter(pk=brand.pk).update(
-    #             search_vector=(
-    #                     SearchVector(models.Value(brand_en), config='english') +
-    #                     SearchVector(models.Value(brand_ru), config='russian')
-    #             )
-    #         )
-    #
-    #     for model in VehicleModel.objects.select_related('brand').iterator():
-    #         combined_text_en = f"{model.name} {model.brand.name}"
-    #         combined_text_ru_translit = translit(combined_text_en, language_code='ru')
-    #
-    #         VehicleModel.objects.filter(pk=model.pk).update(
-    #             search_vector=(
-    #                     SearchVector(models.Value(combined_text_en), config='english') +
-    #                     SearchVector(models.Value(combined_text_ru_translit), config='russian')
-    #                 )
-    #         )
-    #     model_count = VehicleModel.objects.count()
-    #     self.stdout.write(f'Updated {model_count} models')
-    #     self.stdout.write(self.style.SUCCESS('Successfully updated all search vectors'))
@@ -5,13 +5,27 @@ from django.db import models
 
 class RentPriceManager(models.Manager):
     def bulk_create(self, objs, *args, **kwargs):
+        from vehicle.models import Vehicle
+
+        objs = list(objs)
+        # Комиссия арендодателя загружается одним запросом на все транспортные средства пачки
+        commissions = dict(
+            Vehicle.objects.non_polymorphic().filter(id__in={obj.vehicle_id for obj in objs})
+            .values_list('id', 'owner__lessor__commission')
+        )
         for obj in objs:
-            commission = (
-                obj.vehicle.owner.lessor.commission
-                if obj.vehicle.owner and hasattr(obj.vehicle.owner, 'lessor')
-                else 20.0
-            )
+            commission = commissions.get(obj.vehicle_id)
+            if commission is None:
+                commission = Decimal('20.0')
             obj.total = ((Decimal(obj.price) / (100 - commission) * commission + Decimal(obj.price))*
                         (100 - Decimal(obj.discount)) / 100
             )
-        return super().bulk_create(objs, *args, **kwargs)
+        created = super().bulk_create(objs, *args, **kwargs)
+
+        # bulk_create не отправляет post_save, поэтому цены в поисковом индексе обновляются явно
+        from vehicle.pricing import invalidate_price_table
+        from vehicle.search_index import refresh_search_index_prices
+        for vehicle_id in {obj.vehicle_id for obj in objs}:
+            refresh_search_index_prices(vehicle_id)
+            invalidate_price_table(vehicle_id)
+        return created
@@ -0,0 +1,77 @@
+# Generated by Django 5.0.6 on 2026-10-17 10:00
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('franchise', '0010_franchisedocuments'),
+        ('vehicle', '0031_vehicle_created_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleSearchIndex',
+            fields=[
+                ('vehicle', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_index', serialize=False, to='vehicle.vehicle', verbose_name='Транспорт')),
+                ('vehicle_type', models.CharField(max_length=20, verbose_name='Тип транспорта')),
+                ('lessor_id', models.IntegerField(blank=True, null=True, verbose_name='ID арендодателя')),
+                ('super_host', models.BooleanField(default=False, verbose_name='Суперхост')),
+                ('brand_name', models.CharField(max_length=50, verbose_name='Название марки')),
+                ('year', models.IntegerField(blank=True, null=True, verbose_name='Год выпуска')),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Минимальная стоимость аренды')),
+                ('day_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Дневная цена (итого)')),
+                ('average_rating', models.FloatField(default=0, verbose_name='Средний рейтинг')),
+                ('count_trip', models.IntegerField(default=0, verbose_name='Количество поездок')),
+                ('created_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата создания')),
+                ('verified', models.BooleanField(default=False, verbose_name='Верифицирован')),
+                ('drivers_only_verified', models.BooleanField(default=True, verbose_name='Сдавать только верифицированным пользователям')),
+                ('delivery', models.BooleanField(default=False, verbose_name='Доставка')),
+                ('long_distance', models.BooleanField(default=False, verbose_name='Междугородние поездки')),
+                ('ensurance', models.CharField(blank=True, max_length=255, verbose_name='Страховка')),
+                ('on_request', models.BooleanField(default=False, verbose_name='Аренда по запросу')),
+                ('latitude', models.FloatField(blank=True, null=True, verbose_name='Широта')),
+                ('longitude', models.FloatField(blank=True, null=True, verbose_name='Долгота')),
+                ('acceptable_mileage', models.IntegerField(blank=True, null=True, verbose_name='Допустимый пробег, день')),
+                ('seats', models.PositiveIntegerField(blank=True, null=True, verbose_name='Количество мест')),
+                ('engine_capacity', models.IntegerField(blank=True, null=True, verbose_name='Объем двигателя')),
+                ('vehicle_class_slug', models.CharField(blank=True, max_length=50, verbose_name='Класс')),
+                ('fuel_type_slug', models.CharField(blank=True, max_length=50, verbose_name='Вид топлива')),
+                ('transmission_slug', models.CharField(blank=True, max_length=50, verbose_name='Коробка передач')),
+                ('body_type_slug', models.CharField(blank=True, max_length=50, verbose_name='Тип кузова')),
+                ('body_type_id', models.IntegerField(blank=True, null=True, verbose_name='ID типа кузова')),
+                ('type_ship_id', models.IntegerField(blank=True, null=True, verbose_name='ID типа судна')),
+                ('grot', models.CharField(blank=True, max_length=255, verbose_name='Грот')),
+                ('max_speed', models.IntegerField(blank=True, null=True, verbose_name='Максимальная скорость, км/ч')),
+                ('full_take_weight', models.IntegerField(blank=True, null=True, verbose_name='Полный взлетный вес, кг')),
+                ('engine_power', models.IntegerField(blank=True, null=True, verbose_name='Мощность двигателя, л.с.')),
+                ('operating_weight', models.IntegerField(blank=True, null=True, verbose_name='Эксплутационная масса, кг')),
+                ('type_technic_id', models.IntegerField(blank=True, null=True, verbose_name='ID типа спецтехники')),
+                ('features_additionally', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None, verbose_name='Дополнительно')),
+                ('features_functions', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None, verbose_name='Функции')),
+                ('features_for_children', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None, verbose_name='Для детей')),
+                ('features_equipment', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None, verbose_name='Оборудование')),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='vehicle.vehiclebrand', verbose_name='Марка')),
+                ('city', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='franchise.city', verbose_name='Город')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+            ],
+            options={
+                'verbose_name': 'Поисковый индекс транспорта',
+                'verbose_name_plural': 'Поисковый индекс транспорта',
+                'indexes': [
+                    models.Index(fields=['vehicle_type', 'verified', '-average_rating'], name='vsi_type_rating_idx'),
+                    models.Index(fields=['city', 'vehicle_type'], name='vsi_city_type_idx'),
+                    models.Index(fields=['owner'], name='vsi_owner_idx'),
+                    models.Index(fields=['price'], name='vsi_price_idx'),
+                    models.Index(fields=['day_price'], name='vsi_day_price_idx'),
+                    django.contrib.postgres.indexes.GinIndex(fields=['features_additionally', 'features_functions'], name='vsi_features_gin'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:00
+
+import django.contrib.postgres.indexes
+import django.db.models.expressions
+from django.contrib.postgres.operations import CreateExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle', '0032_vehiclesearchindex'),
+    ]
+
+    operations = [
+        CreateExtension('cube'),
+        CreateExtension('earthdistance'),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=django.contrib.postgres.indexes.GistIndex(django.db.models.expressions.Func(django.db.models.expressions.F('latitude'), django.db.models.expressions.F('longitude'), function='ll_to_earth'), name='vehicle_location_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiclesearchindex',
+            index=django.contrib.postgres.indexes.GistIndex(django.db.models.expressions.Func(django.db.models.expressions.F('latitude'), django.db.models.expressions.F('longitude'), function='ll_to_earth'), name='vsi_location_gist'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-17 12:00
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+import django.db.models.expressions
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle', '0033_earthdistance_location_index'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        # daterange() падает на периоде с start_date > end_date, и вычисление хранимого столбца для такой строки
+        # прервало бы миграцию. Старые пути записи доступности не проверяли порядок дат: перевернутые периоды
+        # исправляются перестановкой границ
+        migrations.RunSQL(
+            sql="""
+                UPDATE vehicle_availability
+                SET start_date = end_date, end_date = start_date
+                WHERE start_date > end_date;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddField(
+            model_name='availability',
+            name='period',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.Func(django.db.models.expressions.F('start_date'), django.db.models.expressions.F('end_date'), models.Value('[]'), function='daterange', output_field=django.contrib.postgres.fields.ranges.DateRangeField()), output_field=django.contrib.postgres.fields.ranges.DateRangeField(), verbose_name='Период'),
+        ),
+        migrations.AddIndex(
+            model_name='availability',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['vehicle', 'period'], name='avail_vehicle_period_gist'),
+        ),
+    ]
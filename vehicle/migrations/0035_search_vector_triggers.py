@@ -0,0 +1,106 @@
+# Generated by Django 5.0.6 on 2026-10-17 12:00
+
+from django.db import migrations
+
+FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION vehicle_translit_ru(value text) RETURNS text AS $$
+    SELECT translate(
+        replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(
+            lower(coalesce(value, '')),
+            'shch', 'щ'), 'yo', 'ё'), 'zh', 'ж'), 'kh', 'х'), 'ts', 'ц'), 'ch', 'ч'), 'sh', 'ш'),
+            'yu', 'ю'), 'ya', 'я'), 'x', 'кс'), 'ph', 'ф'),
+        'abcdefghijklmnopqrstuvwyz',
+        'абцдефгхийклмнопкрстуввыз'
+    )
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION vehicle_translit_lat(value text) RETURNS text AS $$
+    SELECT translate(
+        replace(replace(replace(replace(replace(replace(replace(replace(replace(
+            lower(coalesce(value, '')),
+            'щ', 'shch'), 'ё', 'yo'), 'ж', 'zh'), 'х', 'kh'), 'ц', 'ts'), 'ч', 'ch'), 'ш', 'sh'),
+            'ю', 'yu'), 'я', 'ya'),
+        'абвгдезийклмнопрстуфыэьъ',
+        'abvgdeziyklmnoprstufye'
+    )
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION vehicle_search_document(model_name text, brand_name text) RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('english', concat_ws(' ', model_name, brand_name)), 'A')
+        || setweight(to_tsvector('russian', concat_ws(' ', model_name, brand_name)), 'A')
+        || setweight(to_tsvector('russian', concat_ws(' ', vehicle_translit_ru(model_name),
+                                                      vehicle_translit_ru(brand_name))), 'B')
+        || setweight(to_tsvector('english', concat_ws(' ', vehicle_translit_lat(model_name),
+                                                      vehicle_translit_lat(brand_name))), 'B')
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION vehicle_brand_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := vehicle_search_document(NULL, NEW.name);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION vehicle_model_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := vehicle_search_document(
+        NEW.name, (SELECT name FROM vehicle_vehiclebrand WHERE id = NEW.brand_id)
+    );
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION vehicle_brand_models_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    UPDATE vehicle_vehiclemodel
+    SET search_vector = vehicle_search_document(name, NEW.name)
+    WHERE brand_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER vehicle_brand_search_vector
+    BEFORE INSERT OR UPDATE ON vehicle_vehiclebrand
+    FOR EACH ROW EXECUTE FUNCTION vehicle_brand_search_vector_trigger();
+
+CREATE TRIGGER vehicle_model_search_vector
+    BEFORE INSERT OR UPDATE ON vehicle_vehiclemodel
+    FOR EACH ROW EXECUTE FUNCTION vehicle_model_search_vector_trigger();
+
+CREATE TRIGGER vehicle_brand_models_search_vector
+    AFTER UPDATE OF name ON vehicle_vehiclebrand
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION vehicle_brand_models_search_vector_trigger();
+"""
+
+BACKFILL_SQL = """
+UPDATE vehicle_vehiclebrand SET search_vector = vehicle_search_document(NULL, name);
+UPDATE vehicle_vehiclemodel AS model
+SET search_vector = vehicle_search_document(model.name, brand.name)
+FROM vehicle_vehiclebrand AS brand
+WHERE brand.id = model.brand_id;
+"""
+
+DROP_SQL = """
+DROP TRIGGER IF EXISTS vehicle_brand_models_search_vector ON vehicle_vehiclebrand;
+DROP TRIGGER IF EXISTS vehicle_model_search_vector ON vehicle_vehiclemodel;
+DROP TRIGGER IF EXISTS vehicle_brand_search_vector ON vehicle_vehiclebrand;
+DROP FUNCTION IF EXISTS vehicle_brand_models_search_vector_trigger();
+DROP FUNCTION IF EXISTS vehicle_model_search_vector_trigger();
+DROP FUNCTION IF EXISTS vehicle_brand_search_vector_trigger();
+DROP FUNCTION IF EXISTS vehicle_search_document(text, text);
+DROP FUNCTION IF EXISTS vehicle_translit_lat(text);
+DROP FUNCTION IF EXISTS vehicle_translit_ru(text);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle', '0034_availability_period'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FUNCTIONS_SQL, reverse_sql=DROP_SQL),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.0.6 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+CREATE_SQL = """
+CREATE TABLE vehicle_vehicleposition (
+    id bigserial,
+    vehicle_id integer NOT NULL,
+    ts timestamp with time zone NOT NULL,
+    latitude double precision NOT NULL,
+    longitude double precision NOT NULL,
+    speed double precision NULL,
+    PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
+
+CREATE INDEX vehicle_position_vehicle_ts ON vehicle_vehicleposition (vehicle_id, ts);
+
+CREATE OR REPLACE FUNCTION vehicle_position_ensure_partition(month date) RETURNS void AS $$
+DECLARE
+    start_month date := date_trunc('month', month)::date;
+    partition_name text := 'vehicle_vehicleposition_' || to_char(start_month, 'YYYY_MM');
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF vehicle_vehicleposition FOR VALUES FROM (%L) TO (%L)',
+        partition_name, start_month, (start_month + interval '1 month')::date
+    );
+END
+$$ LANGUAGE plpgsql;
+
+SELECT vehicle_position_ensure_partition(current_date);
+SELECT vehicle_position_ensure_partition((current_date + interval '1 month')::date);
+"""
+
+DROP_SQL = """
+DROP TABLE IF EXISTS vehicle_vehicleposition CASCADE;
+DROP FUNCTION IF EXISTS vehicle_position_ensure_partition(date);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle', '0035_search_vector_triggers'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, reverse_sql=DROP_SQL),
+        migrations.CreateModel(
+            name='VehiclePosition',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('vehicle_id', models.IntegerField(verbose_name='ID транспорта')),
+                ('ts', models.DateTimeField(verbose_name='Время')),
+                ('latitude', models.FloatField(verbose_name='Широта')),
+                ('longitude', models.FloatField(verbose_name='Долгота')),
+                ('speed', models.FloatField(blank=True, null=True, verbose_name='Скорость, км/ч')),
+            ],
+            options={
+                'verbose_name': 'GPS-позиция транспорта',
+                'verbose_name_plural': 'История GPS-позиций транспорта',
+                'db_table': 'vehicle_vehicleposition',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle', '0036_vehicleposition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehiclephoto',
+            name='photo_card',
+            field=models.ImageField(blank=True, editable=False, max_length=255, upload_to='', verbose_name='Фото для карточки'),
+        ),
+        migrations.AddField(
+            model_name='vehiclephoto',
+            name='photo_gallery',
+            field=models.ImageField(blank=True, editable=False, max_length=255, upload_to='', verbose_name='Фото для галереи'),
+        ),
+        migrations.AddField(
+            model_name='vehiclephoto',
+            name='photo_full',
+            field=models.ImageField(blank=True, editable=False, max_length=255, upload_to='', verbose_name='Фото в полном размере'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-17 12:00
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0029_alter_requestrent_promocode'),
+        ('vehicle', '0037_vehiclephoto_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', django.contrib.postgres.fields.ranges.DateRangeField(verbose_name='Период')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('request_rent', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='booking', to='chat.requestrent', verbose_name='Заявка на аренду')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='vehicle.vehicle', verbose_name='Транспорт')),
+            ],
+            options={
+                'verbose_name': 'Бронь транспорта',
+                'verbose_name_plural': 'Брони транспорта',
+                'constraints': [django.contrib.postgres.constraints.ExclusionConstraint(expressions=[('vehicle', '='), ('period', '&&')], name='vehicle_booking_no_overlap')],
+            },
+        ),
+    ]
@@ -1,11 +1,14 @@
 import uuid
 from decimal import Decimal
 
-from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import ArrayField, DateRangeField, RangeOperators
+from django.contrib.postgres.indexes import GinIndex, GistIndex
 from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.db.models import F, Func, Value
 from django.utils import timezone
 from django.utils.text import slugify
 from polymorphic.models import PolymorphicModel
@@ -17,7 +20,6 @@ from chat.models import RequestRent, Trip
 from franchise.models import VehiclePark, City
 from notification.models import Notification
 from vehicle.manager import RentPriceManager
-from vehicle.utils import merge_periods
 
 
 class VehicleBrand(models.Model):
@@ -290,27 +292,15 @@ class Vehicle(PolymorphicModel):
                 url=vehicle_url
             )
 
-        # Логика обработки периодов доступности
-        on_request_availability = self.availabilities.filter(on_request=True).first()
-
-        availabilities = list(self.availabilities.values('start_date', 'end_date'))
-        if availabilities:
-            merged_availabilities = merge_periods(availabilities)
-            self.availabilities.all().delete()
-
-            if on_request_availability:
-                on_request_availability.pk = None
-                on_request_availability.save()
-
-            for availability in merged_availabilities:
-                Availability.objects.create(vehicle=self, **availability)
-
     def __str__(self):
         return f'Vehicle id-{self.pk}'
 
     class Meta:
         verbose_name = 'Транспорт'
         verbose_name_plural = 'Транспорт'
+        indexes = [
+            GistIndex(Func(F('latitude'), F('longitude'), function='ll_to_earth'), name='vehicle_location_gist'),
+        ]
 
 
 class RentPrice(models.Model):
@@ -330,9 +320,9 @@ class RentPrice(models.Model):
     objects = RentPriceManager()
 
     def save(self, *args, **kwargs):
-        commission = 20.0
-        if self.vehicle.owner and hasattr(self.vehicle.owner, 'lessor'):
-            commission = float(self.vehicle.owner.lessor.commission)
+        commission = Vehicle.objects.non_polymorphic().filter(id=self.vehicle_id).values_list(
+            'owner__lessor__commission', flat=True).first()
+        commission = 20.0 if commission is None else float(commission)
 
         self.total = float(self.price)/(100 - commission) * commission + float(self.price)
         # self.total = (float(self.price) + (float(self.price) * commission / 100)) * (100 - float(self.discount)) / 100
@@ -352,6 +342,13 @@ class Availability(models.Model):
     start_date = models.DateField(verbose_name='Начало', null=True, blank=True)
     end_date = models.DateField(verbose_name='Конец', null=True, blank=True)
     on_request = models.BooleanField(default=False, verbose_name='По запросу')
+    period = models.GeneratedField(
+        expression=Func(F('start_date'), F('end_date'), Value('[]'), function='daterange',
+                        output_field=DateRangeField()),
+        output_field=DateRangeField(),
+        db_persist=True,
+        verbose_name='Период',
+    )
 
     def __str__(self):
         if self.on_request:
@@ -383,6 +380,9 @@ class Availability(models.Model):
     class Meta:
         verbose_name = 'Дата аренды'
         verbose_name_plural = 'Даты аренды'
+        indexes = [
+            GistIndex(fields=['vehicle', 'period'], name='avail_vehicle_period_gist'),
+        ]
 
 
 def vehicle_documents_upload_to(instance, filename):
@@ -415,6 +415,10 @@ class VehiclePhoto(models.Model):
     vehicle = models.ForeignKey('Vehicle', related_name='photos', on_delete=models.CASCADE)
     photo = models.ImageField(upload_to=vehicle_photo_upload_to, verbose_name='Фото', max_length=255)
     order = models.PositiveIntegerField(default=0, verbose_name='Порядок')
+    # Варианты заполняются задачей process_vehicle_photo (vehicle/images.py)
+    photo_card = models.ImageField(blank=True, editable=False, max_length=255, verbose_name='Фото для карточки')
+    photo_gallery = models.ImageField(blank=True, editable=False, max_length=255, verbose_name='Фото для галереи')
+    photo_full = models.ImageField(blank=True, editable=False, max_length=255, verbose_name='Фото в полном размере')
 
     class Meta:
         ordering = ['order']
@@ -428,6 +432,11 @@ class VehiclePhoto(models.Model):
 
         super().save(*args, **kwargs)
 
+    def variant(self, name):
+        """ Файл варианта (card, gallery, full), пока он не сгенерирован — оригинал """
+        file = getattr(self, f'photo_{name}')
+        return file if file else self.photo
+
     def __str__(self):
         return f'Photo for vehicle id-{self.vehicle.pk}'
 
@@ -710,3 +719,125 @@ class RatingUpdateLog(models.Model):
         unique_together = ('user', 'content_type', 'object_id')
         verbose_name = 'Лог обновления рейтинга транспорта'
         verbose_name_plural = 'Логи обновления рейтингов транспорта'
+
+
+class VehicleBooking(models.Model):
+    """
+    Забронированный период транспорта. Пересечение броней одного транспорта запрещено ограничением
+    исключения в базе, поэтому двойное бронирование невозможно даже при параллельных подтверждениях заявок.
+    Создается и освобождается через vehicle/reservations.py.
+    """
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name='bookings', verbose_name='Транспорт')
+    request_rent = models.OneToOneField(RequestRent, on_delete=models.CASCADE, null=True, blank=True,
+                                        related_name='booking', verbose_name='Заявка на аренду')
+    period = DateRangeField(verbose_name='Период')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+
+    def __str__(self):
+        return f'Booking {self.period} for vehicle id-{self.vehicle_id}'
+
+    class Meta:
+        verbose_name = 'Бронь транспорта'
+        verbose_name_plural = 'Брони транспорта'
+        constraints = [
+            ExclusionConstraint(
+                name='vehicle_booking_no_overlap',
+                expressions=[('vehicle', RangeOperators.EQUAL), ('period', RangeOperators.OVERLAPS)],
+            ),
+        ]
+
+
+class VehicleSearchIndex(models.Model):
+    """
+    Денормализованная строка каталога: одна запись на транспорт с полями, по которым фильтруется и сортируется выдача.
+    Поддерживается сигналами (vehicle/signals.py), полностью пересобирается командой rebuild_search_index.
+    """
+    vehicle = models.OneToOneField(Vehicle, on_delete=models.CASCADE, primary_key=True, related_name='search_index',
+                                   verbose_name='Транспорт')
+    vehicle_type = models.CharField(max_length=20, verbose_name='Тип транспорта')
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+',
+                              verbose_name='Владелец')
+    lessor_id = models.IntegerField(null=True, blank=True, verbose_name='ID арендодателя')
+    super_host = models.BooleanField(default=False, verbose_name='Суперхост')
+    city = models.ForeignKey(City, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+                             verbose_name='Город')
+    brand = models.ForeignKey(VehicleBrand, on_delete=models.CASCADE, related_name='+', verbose_name='Марка')
+    brand_name = models.CharField(max_length=50, verbose_name='Название марки')
+    year = models.IntegerField(null=True, blank=True, verbose_name='Год выпуска')
+
+    price = models.DecimalField(decimal_places=2, max_digits=10, null=True, blank=True,
+                                verbose_name='Минимальная стоимость аренды')
+    day_price = models.DecimalField(decimal_places=2, max_digits=10, null=True, blank=True,
+                                    verbose_name='Дневная цена (итого)')
+    average_rating = models.FloatField(default=0, verbose_name='Средний рейтинг')
+    count_trip = models.IntegerField(default=0, verbose_name='Количество поездок')
+    created_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата создания')
+
+    verified = models.BooleanField(default=False, verbose_name='Верифицирован')
+    drivers_only_verified = models.BooleanField(default=True,
+                                                verbose_name='Сдавать только верифицированным пользователям')
+    delivery = models.BooleanField(default=False, verbose_name='Доставка')
+    long_distance = models.BooleanField(default=False, verbose_name='Междугородние поездки')
+    ensurance = models.CharField(max_length=255, blank=True, verbose_name='Страховка')
+    on_request = models.BooleanField(default=False, verbose_name='Аренда по запросу')
+    latitude = models.FloatField(null=True, blank=True, verbose_name='Широта')
+    longitude = models.FloatField(null=True, blank=True, verbose_name='Долгота')
+
+    # Поля отдельных типов транспорта
+    acceptable_mileage = models.IntegerField(null=True, blank=True, verbose_name='Допустимый пробег, день')
+    seats = models.PositiveIntegerField(null=True, blank=True, verbose_name='Количество мест')
+    engine_capacity = models.IntegerField(null=True, blank=True, verbose_name='Объем двигателя')
+    vehicle_class_slug = models.CharField(max_length=50, blank=True, verbose_name='Класс')
+    fuel_type_slug = models.CharField(max_length=50, blank=True, verbose_name='Вид топлива')
+    transmission_slug = models.CharField(max_length=50, blank=True, verbose_name='Коробка передач')
+    body_type_slug = models.CharField(max_length=50, blank=True, verbose_name='Тип кузова')
+    body_type_id = models.IntegerField(null=True, blank=True, verbose_name='ID типа кузова')
+    type_ship_id = models.IntegerField(null=True, blank=True, verbose_name='ID типа судна')
+    grot = models.CharField(max_length=255, blank=True, verbose_name='Грот')
+    max_speed = models.IntegerField(null=True, blank=True, verbose_name='Максимальная скорость, км/ч')
+    full_take_weight = models.IntegerField(null=True, blank=True, verbose_name='Полный взлетный вес, кг')
+    engine_power = models.IntegerField(null=True, blank=True, verbose_name='Мощность двигателя, л.с.')
+    operating_weight = models.IntegerField(null=True, blank=True, verbose_name='Эксплутационная масса, кг')
+    type_technic_id = models.IntegerField(null=True, blank=True, verbose_name='ID типа спецтехники')
+    features_additionally = ArrayField(models.IntegerField(), default=list, blank=True, verbose_name='Дополнительно')
+    features_functions = ArrayField(models.IntegerField(), default=list, blank=True, verbose_name='Функции')
+    features_for_children = ArrayField(models.IntegerField(), default=list, blank=True, verbose_name='Для детей')
+    features_equipment = ArrayField(models.IntegerField(), default=list, blank=True, verbose_name='Оборудование')
+
+    def __str__(self):
+        return f'Search index for vehicle id-{self.vehicle_id}'
+
+    class Meta:
+        verbose_name = 'Поисковый индекс транспорта'
+        verbose_name_plural = 'Поисковый индекс транспорта'
+        indexes = [
+            models.Index(fields=['vehicle_type', 'verified', '-average_rating'], name='vsi_type_rating_idx'),
+            models.Index(fields=['city', 'vehicle_type'], name='vsi_city_type_idx'),
+            models.Index(fields=['owner'], name='vsi_owner_idx'),
+            models.Index(fields=['price'], name='vsi_price_idx'),
+            models.Index(fields=['day_price'], name='vsi_day_price_idx'),
+            GinIndex(fields=['features_additionally', 'features_functions'], name='vsi_features_gin'),
+            GistIndex(Func(F('latitude'), F('longitude'), function='ll_to_earth'), name='vsi_location_gist'),
+        ]
+
+
+class VehiclePosition(models.Model):
+    """
+    История GPS-координат транспорта. Таблица секционирована по месяцам (PARTITION BY RANGE (ts)) и создается
+    миграцией 0036 вручную, поэтому модель неуправляемая. Пишется только пачками из буфера (vehicle/gps.py).
+    """
+    id = models.BigAutoField(primary_key=True)
+    vehicle_id = models.IntegerField(verbose_name='ID транспорта')
+    ts = models.DateTimeField(verbose_name='Время')
+    latitude = models.FloatField(verbose_name='Широта')
+    longitude = models.FloatField(verbose_name='Долгота')
+    speed = models.FloatField(null=True, blank=True, verbose_name='Скорость, км/ч')
+
+    def __str__(self):
+        return f'Position of vehicle id-{self.vehicle_id} at {self.ts}'
+
+    class Meta:
+        managed = False
+        db_table = 'vehicle_vehicleposition'
+        verbose_name = 'GPS-позиция транспорта'
+        verbose_name_plural = 'История GPS-позиций транспорта'
@@ -0,0 +1,136 @@
+"""
+Расчет стоимости аренды по кэшированной таблице цен транспорта.
+
+Таблица цен (итоговые цены по периодам и стоимость доставки) загружается одним запросом и хранится в кэше по
+vehicle_id; сигналы RentPrice/Vehicle и RentPriceManager.bulk_create сбрасывают ее. Сам расчет выполняется в памяти
+и повторяет правила RequestRent: почасовой тариф для аренды в пределах дня (от 8 часов — дневной, если есть),
+иначе самый длинный подходящий период из year/month/week/day.
+"""
+from datetime import datetime
+
+from django.core.cache import cache
+
+PRICE_TABLE_TIMEOUT = 60 * 60 * 24
+HOURLY_DAY_THRESHOLD = 8
+
+PERIOD_DAYS = [
+    ('year', 365),
+    ('month', 30),
+    ('week', 7),
+    ('day', 1),
+]
+
+
+def price_table_key(vehicle_id):
+    return f'vehicle:price_table:{vehicle_id}'
+
+
+def invalidate_price_table(vehicle_id):
+    cache.delete(price_table_key(vehicle_id))
+
+
+def load_price_table(vehicle_id):
+    from vehicle.models import Vehicle, RentPrice
+
+    price_delivery = Vehicle.objects.non_polymorphic().filter(id=vehicle_id).values_list('price_delivery', flat=True)
+    price_delivery = price_delivery.first()
+    if price_delivery is None:
+        return None
+    prices = {
+        name: {'price': float(price), 'discount': discount, 'total': float(total)}
+        for name, price, discount, total in RentPrice.objects.filter(vehicle_id=vehicle_id)
+        .values_list('name', 'price', 'discount', 'total')
+    }
+    return {'prices': prices, 'price_delivery': float(price_delivery)}
+
+
+def get_price_table(vehicle_id):
+    """ {'prices': {период: {'price', 'discount', 'total'}}, 'price_delivery'} или None, если транспорта нет """
+    key = price_table_key(vehicle_id)
+    table = cache.get(key)
+    if table is None:
+        table = load_price_table(vehicle_id)
+        if table is not None:
+            cache.set(key, table, timeout=PRICE_TABLE_TIMEOUT)
+    return table
+
+
+def rental_hours(start_date, end_date, start_time, end_time):
+    """ Длительность аренды в часах, если это аренда с указанием времени в пределах одного дня, иначе None """
+    if start_time and end_time and start_date and end_date and start_date == end_date:
+        return (datetime.combine(end_date, end_time) - datetime.combine(start_date, start_time)).total_seconds() / 3600
+    return None
+
+
+def rental_days(start_date, end_date):
+    """ Количество календарных дней, как RequestRent.rental_days для посуточной аренды """
+    if start_date and end_date:
+        calendar_days = (end_date - start_date).days
+        return max(1, calendar_days if calendar_days > 0 else 1)
+    return 0
+
+
+def quote_rent(table, start_date, end_date, start_time=None, end_time=None, delivery=False, price_delivery=None):
+    """
+    Стоимость аренды по таблице цен.
+    Возвращает {'period', 'units', 'rent_cost', 'delivery_cost', 'total_cost'}; при невозможности расчета —
+    ValueError с тем же текстом, что и RequestRent.calculate_rent_price.
+    """
+    prices = table['prices']
+    hours = rental_hours(start_date, end_date, start_time, end_time)
+
+    if hours is not None:
+        if hours <= 0:
+            raise ValueError("Время окончания должно быть больше времени начала.")
+        if hours >= HOURLY_DAY_THRESHOLD and 'day' in prices:
+            # Есть дневной тариф - используем его (выгоднее для клиента)
+            period, units = 'day', 1
+        elif 'hour' in prices:
+            period, units = 'hour', hours
+        elif hours >= HOURLY_DAY_THRESHOLD:
+            raise ValueError("Для аренды >= 8 часов требуется дневной или почасовой тариф.")
+        else:
+            raise ValueError("Для почасовой аренды (< 8 часов) требуется почасовой тариф.")
+    else:
+        days = rental_days(start_date, end_date)
+        if days <= 0:
+            raise ValueError("Количество дней аренды должно быть положительным.")
+
+        suitable_periods = [(period, period_days) for period, period_days in PERIOD_DAYS if days >= period_days]
+        if not suitable_periods:
+            raise ValueError("Не найден подходящий период аренды для текущего количества дней.")
+
+        for period, period_days in suitable_periods:
+            if period in prices:
+                units = days / period_days
+                break
+        else:
+            raise ValueError("Не найдена цена аренды для указанного транспортного средства.")
+
+    rent_cost = units * prices[period]['total']
+    if price_delivery is None:
+        price_delivery = table['price_delivery']
+    delivery_cost = float(price_delivery) if delivery else 0.0
+
+    return {
+        'period': period,
+        'units': units,
+        'rent_cost': rent_cost,
+        'delivery_cost': delivery_cost,
+        'total_cost': rent_cost + delivery_cost,
+    }
+
+
+def quote_options(table, start_date, end_date, start_time=None, end_time=None):
+    """ Стоимость аренды по каждому тарифу транспорта (для сравнения на фронтенде) """
+    hours = rental_hours(start_date, end_date, start_time, end_time)
+    if hours is None:
+        hours = rental_days(start_date, end_date) * 24
+    options = []
+    for period, period_days in [('hour', 1 / 24)] + PERIOD_DAYS:
+        price = table['prices'].get(period)
+        if price is None:
+            continue
+        units = hours / 24 / period_days
+        options.append({'period': period, 'units': units, 'price': price['total'], 'cost': units * price['total']})
+    return options
@@ -0,0 +1,62 @@
+"""
+Атомарное обновление рейтинга транспорта.
+
+Счетчики звезд хранятся в Vehicle.ratings (JSON вида {"Cleanliness": {"5_stars": 3, ...}, ...}). Оценка
+применяется одним UPDATE: каждый счетчик увеличивается через jsonb_set от текущего значения строки, и в том же
+выражении пересчитывается average_rating. Vehicle.save() не вызывается, поэтому параллельные отзывы не теряют
+обновлений: при конфликте Postgres перечитывает строку и вычисляет выражения от новой версии.
+"""
+from django.db import connection
+
+from vehicle.models import Vehicle
+
+RATING_FIELDS = ['Cleanliness', 'Maintenance', 'Communication', 'Convenience', 'Accuracy']
+
+
+def average_rating_sql(ratings_sql):
+    """ SQL-выражение средней оценки по JSON рейтинга, как Vehicle.get_average_rating()['rating'] """
+    return f"""(
+                SELECT COALESCE(
+                    SUM(split_part(stars.key, '_', 1)::int * stars.value::int)::float
+                    / NULLIF(SUM(stars.value::int), 0), 0)
+                FROM jsonb_each({ratings_sql}) AS category,
+                     jsonb_each_text(category.value) AS stars
+            )"""
+
+
+def _ratings_expression(scores):
+    """ SQL-выражение нового значения ratings и его параметры """
+    sql, params = 'ratings', []
+    for category, stars in scores.items():
+        star_key = f'{int(stars)}_stars'
+        sql = (
+            f"jsonb_set({sql}, ARRAY[%s], "
+            f"COALESCE(ratings -> %s, '{{}}'::jsonb) || "
+            f"jsonb_build_object(%s, COALESCE((ratings -> %s ->> %s)::int, 0) + 1))"
+        )
+        params += [category, category, star_key, category, star_key]
+    return sql, params
+
+
+def add_vehicle_rating(vehicle_id, scores):
+    """
+    Добавляет оценки {категория: звезды} к рейтингу транспорта одним запросом.
+    Возвращает (ratings, average_rating) после обновления или None, если транспорт не найден.
+    """
+    scores = {category: stars for category, stars in scores.items()
+              if category in RATING_FIELDS and stars is not None}
+    if not scores:
+        return None
+
+    ratings_sql, ratings_params = _ratings_expression(scores)
+    query = f"""
+        UPDATE {Vehicle._meta.db_table}
+        SET ratings = {ratings_sql},
+            average_rating = {average_rating_sql(ratings_sql)}
+        WHERE id = %s
+        RETURNING ratings, average_rating
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(query, ratings_params + ratings_params + [vehicle_id])
+        row = cursor.fetchone()
+    return row
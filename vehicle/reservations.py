@@ -0,0 +1,105 @@
+"""
+Бронирование периодов транспорта.
+
+Подтверждение заявки и возврат дат выполняются в одной транзакции под блокировкой строки транспорта
+(select_for_update), поэтому параллельные подтверждения одного транспорта выполняются по очереди. Бронь
+записывается в VehicleBooking, где пересечения периодов запрещены ограничением исключения: даже запись в обход
+блокировки не приведет к двойному бронированию. Периоды доступности меняются минимальным диффом
+(apply_availability_periods), без удаления и пересоздания всех строк.
+"""
+from datetime import timedelta
+
+from django.db import transaction, IntegrityError
+from django.db.backends.postgresql.psycopg_any import DateRange
+
+from vehicle.models import Vehicle, Availability, VehicleBooking
+from vehicle.utils import apply_availability_periods, merge_periods
+
+
+class BookingConflict(Exception):
+    """ Запрошенный период недоступен или уже забронирован """
+
+
+def subtract_period(periods, start_date, end_date):
+    """
+    Вычитает [start_date, end_date] из периодов доступности.
+    Период должен целиком входить в один из периодов, иначе BookingConflict.
+    """
+    if not any(period['start_date'] <= start_date and end_date <= period['end_date'] for period in periods):
+        raise BookingConflict("Запрашиваемый период недоступен для данного транспортного средства.")
+
+    result = []
+    for period in periods:
+        if end_date < period['start_date'] or start_date > period['end_date']:
+            result.append(period)
+            continue
+        if period['start_date'] < start_date:
+            result.append({'start_date': period['start_date'], 'end_date': start_date - timedelta(days=1)})
+        if end_date < period['end_date']:
+            result.append({'start_date': end_date + timedelta(days=1), 'end_date': period['end_date']})
+    return result
+
+
+def _lock_vehicle(vehicle_id):
+    """ Блокировка строки транспорта: все операции бронирования одного транспорта идут последовательно """
+    Vehicle.objects.non_polymorphic().select_for_update().filter(pk=vehicle_id).values_list('pk').first()
+
+
+def _date_periods(vehicle_id):
+    return list(
+        Availability.objects.filter(vehicle_id=vehicle_id, on_request=False, start_date__isnull=False)
+        .values('start_date', 'end_date')
+    )
+
+
+def reserve_period(vehicle, start_date, end_date, request_rent=None):
+    """
+    Бронирует период: создает VehicleBooking и вычитает период из доступности.
+    Для транспорта «по запросу» доступность не меняется, но бронь все равно проверяется на пересечения.
+    """
+    with transaction.atomic():
+        _lock_vehicle(vehicle.pk)
+
+        on_request = Availability.objects.filter(vehicle_id=vehicle.pk, on_request=True).exists()
+        periods = _date_periods(vehicle.pk)
+        if not on_request and not periods:
+            raise BookingConflict("Данных о наличии свободных периодов аренды для этого транспорта не найдено.")
+        new_periods = None if on_request else subtract_period(periods, start_date, end_date)
+
+        try:
+            with transaction.atomic():
+                booking = VehicleBooking.objects.create(
+                    vehicle_id=vehicle.pk, request_rent=request_rent, period=DateRange(start_date, end_date, '[]')
+                )
+        except IntegrityError:
+            raise BookingConflict("Транспорт уже забронирован на эти даты.")
+
+        if new_periods is not None:
+            apply_availability_periods(vehicle, new_periods)
+    return booking
+
+
+def release_period(vehicle, start_date, end_date, request_rent=None):
+    """
+    Возвращает [start_date, end_date] в доступность и освобождает бронь: полностью, если освобождается
+    весь период брони, иначе бронь сокращается до start_date.
+    """
+    if start_date > end_date:
+        return
+    with transaction.atomic():
+        _lock_vehicle(vehicle.pk)
+
+        if request_rent is not None:
+            booking = VehicleBooking.objects.filter(request_rent=request_rent).first()
+            if booking is not None:
+                if booking.period.lower is None or booking.period.lower >= start_date:
+                    booking.delete()
+                else:
+                    booking.period = DateRange(booking.period.lower, start_date, '[)')
+                    booking.save(update_fields=['period'])
+
+        if Availability.objects.filter(vehicle_id=vehicle.pk, on_request=True).exists():
+            return
+        periods = _date_periods(vehicle.pk)
+        periods.append({'start_date': start_date, 'end_date': end_date})
+        apply_availability_periods(vehicle, merge_periods(periods))
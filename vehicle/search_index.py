@@ -0,0 +1,126 @@
+"""
+Поддержка денормализованной таблицы VehicleSearchIndex.
+
+Полная пересборка строки выполняется при сохранении транспорта, изменения цен, периодов доступности и
+статуса суперхоста обновляют только соответствующие колонки.
+"""
+from django.db.models import Min, Exists, OuterRef, Subquery
+
+from vehicle.models import Vehicle, VehicleSearchIndex, RentPrice, Availability, Auto, Bike, Ship, Helicopter, \
+    SpecialTechnic
+
+VEHICLE_TYPES = {
+    Auto: 'auto',
+    Bike: 'bike',
+    Ship: 'ship',
+    Helicopter: 'helicopter',
+    SpecialTechnic: 'specialtechnic',
+}
+
+INDEX_UPDATE_FIELDS = [
+    field.name for field in VehicleSearchIndex._meta.concrete_fields if not field.primary_key
+]
+
+FEATURE_FIELDS = ['features_additionally', 'features_functions', 'features_for_children', 'features_equipment']
+
+
+def _related_slug(vehicle, field_name):
+    related = getattr(vehicle, field_name, None)
+    return related.slug if related is not None else ''
+
+
+def build_search_index_row(vehicle):
+    """ Формирует строку индекса по объекту конкретного типа транспорта """
+    prices = list(vehicle.rent_prices.all())
+    day_price = next((price.total for price in prices if price.name == 'day'), None)
+    lessor = getattr(vehicle.owner, 'lessor', None)
+
+    row = VehicleSearchIndex(
+        vehicle_id=vehicle.pk,
+        vehicle_type=VEHICLE_TYPES.get(type(vehicle), ''),
+        owner_id=vehicle.owner_id,
+        lessor_id=lessor.id if lessor else None,
+        super_host=lessor.super_host if lessor else False,
+        city_id=vehicle.city_id,
+        brand_id=vehicle.brand_id,
+        brand_name=vehicle.brand.name,
+        year=vehicle.year,
+        price=min((price.price for price in prices), default=None),
+        day_price=day_price,
+        average_rating=vehicle.average_rating,
+        count_trip=vehicle.count_trip,
+        created_at=vehicle.created_at,
+        verified=vehicle.verified,
+        drivers_only_verified=vehicle.drivers_only_verified,
+        delivery=vehicle.delivery,
+        long_distance=vehicle.long_distance,
+        ensurance=vehicle.ensurance or '',
+        on_request=any(availability.on_request for availability in vehicle.availabilities.all()),
+        latitude=vehicle.latitude,
+        longitude=vehicle.longitude,
+        acceptable_mileage=getattr(vehicle, 'acceptable_mileage', None),
+        seats=getattr(vehicle, 'seats', None),
+        engine_capacity=getattr(vehicle, 'engine_capacity', None),
+        vehicle_class_slug=_related_slug(vehicle, 'vehicle_class'),
+        fuel_type_slug=_related_slug(vehicle, 'fuel_type'),
+        transmission_slug=_related_slug(vehicle, 'transmission'),
+        body_type_slug=_related_slug(vehicle, 'body_type'),
+        body_type_id=getattr(vehicle, 'body_type_id', None),
+        type_ship_id=getattr(vehicle, 'type_ship_id', None),
+        grot=getattr(vehicle, 'grot', None) or '',
+        max_speed=getattr(vehicle, 'max_speed', None),
+        full_take_weight=getattr(vehicle, 'full_take_weight', None),
+        engine_power=getattr(vehicle, 'engine_power', None),
+        operating_weight=getattr(vehicle, 'operating_weight', None),
+        type_technic_id=getattr(vehicle, 'type_technic_id', None),
+    )
+    for field_name in FEATURE_FIELDS:
+        if hasattr(vehicle, field_name):
+            setattr(row, field_name, [feature.id for feature in getattr(vehicle, field_name).all()])
+    return row
+
+
+def save_search_index_rows(rows):
+    """ Upsert строк индекса одним запросом """
+    if rows:
+        VehicleSearchIndex.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['vehicle'], update_fields=INDEX_UPDATE_FIELDS
+        )
+
+
+def refresh_search_index(vehicle_ids):
+    """ Полная пересборка строк индекса для переданных id транспорта """
+    rows = [build_search_index_row(vehicle) for vehicle in Vehicle.objects.filter(pk__in=vehicle_ids)]
+    save_search_index_rows(rows)
+
+
+def refresh_search_index_prices(vehicle_id):
+    """ Обновление минимальной и дневной цены в индексе """
+    VehicleSearchIndex.objects.filter(vehicle_id=vehicle_id).update(
+        price=Subquery(
+            RentPrice.objects.filter(vehicle_id=OuterRef('vehicle_id'))
+            .values('vehicle_id').annotate(min_price=Min('price')).values('min_price')[:1]
+        ),
+        day_price=Subquery(
+            RentPrice.objects.filter(vehicle_id=OuterRef('vehicle_id'), name='day').values('total')[:1]
+        ),
+    )
+
+
+def refresh_search_index_availability(vehicle_id):
+    """ Обновление признака аренды по запросу в индексе """
+    VehicleSearchIndex.objects.filter(vehicle_id=vehicle_id).update(
+        on_request=Exists(Availability.objects.filter(vehicle_id=OuterRef('vehicle_id'), on_request=True))
+    )
+
+
+def refresh_search_index_super_host(lessor):
+    """ Обновление статуса суперхоста во всех строках арендодателя """
+    VehicleSearchIndex.objects.filter(owner_id=lessor.user_id).update(
+        super_host=lessor.super_host, lessor_id=lessor.id
+    )
+
+
+def refresh_search_index_brand(brand):
+    """ Обновление названия марки во всех строках ее транспорта """
+    VehicleSearchIndex.objects.filter(brand_id=brand.id).exclude(brand_name=brand.name).update(brand_name=brand.name)
@@ -10,7 +10,8 @@ from RentalGuru.settings import HOST_URL
 from app.models import Lessor
 from vehicle.models import VehicleDocument, Availability, RentPrice, VehiclePhoto, PaymentMethod, VehicleModel, \
     VehicleBrand, VehicleClass, Auto, Bike, Ship, Helicopter, SpecialTechnic, Vehicle
-from vehicle.utils import merge_periods
+from vehicle.images import enqueue_photo_processing
+from vehicle.utils import apply_availability_periods
 
 
 class AvailabilitySerializer(serializers.ModelSerializer):
@@ -223,11 +224,7 @@ class BaseVehicleUpdateSerializer(BaseVehicleSerializer):
             ])
 
         if availabilities_data is not None:
-            instance.availabilities.all().delete()
-            Availability.objects.bulk_create([
-                Availability(vehicle=instance, **availability_data)
-                for availability_data in availabilities_data
-            ])
+            apply_availability_periods(instance, availabilities_data)
 
         if photos_data is not None:
             existing_max_order = VehiclePhoto.objects.filter(vehicle=instance).aggregate(Max('order'))['order__max'] or 0
@@ -237,6 +234,8 @@ class BaseVehicleUpdateSerializer(BaseVehicleSerializer):
                     photo_data['order'] = existing_max_order + i + 1
                 new_photos.append(VehiclePhoto(vehicle=instance, **photo_data))
             VehiclePhoto.objects.bulk_create(new_photos)
+            # bulk_create не отправляет post_save, варианты ставим в очередь явно
+            enqueue_photo_processing(photo.pk for photo in new_photos)
 
         return instance
 
@@ -315,13 +314,9 @@ class BaseVehicleCreateSerializer(BaseVehicleSerializer):
                     "min_rent_day и max_rent_day должны быть числами"
                 )
 
-        if any(not availability.get('on_request', True) for availability in availabilities_data):
-            availabilities_data = merge_periods(availabilities_data)
-
         vehicle = super().create(validated_data)
 
-        for availability_data in availabilities_data:
-            Availability.objects.create(vehicle=vehicle, **availability_data)
+        apply_availability_periods(vehicle, availabilities_data)
 
         # for document_data in documents_data:
         #     VehicleDocument.objects.create(vehicle=vehicle, **document_data)
@@ -372,7 +367,8 @@ class BaseVehicleGetSerializer(serializers.ModelSerializer):
     @extend_schema_field(serializers.ListField(child=serializers.DictField()))
     def get_photos(self, obj):
         return [
-            {"id": i.id, "url": f"{HOST_URL}/{i.photo.url}", "order": i.order}
+            {"id": i.id, "url": f"{HOST_URL}/{i.variant('full').url}",
+             "gallery_url": f"{HOST_URL}/{i.variant('gallery').url}", "order": i.order}
             for i in obj.photos.all()
         ]
 
@@ -403,7 +399,7 @@ class BaseVehicleListSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.ListField(child=serializers.CharField()))
     def get_photos(self, obj):
-        return [f"{HOST_URL}/{i.photo.url}" for i in obj.photos.all()]
+        return [f"{HOST_URL}/{i.variant('card').url}" for i in obj.photos.all()]
 
     @extend_schema_field(serializers.CharField())
     def get_vehicle_type(self, obj):
@@ -0,0 +1,130 @@
+"""
+Быстрое построение карточек списка транспорта.
+
+Результат совпадает с BaseVehicleListSerializer, но собирается из values()-запросов обычными словарями:
+один запрос на сами карточки (с марками, моделями, городами и владельцами) и по одному на фото, цены и
+периоды доступности всей страницы, без экземпляров моделей и вложенных сериализаторов.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.storage import default_storage
+
+from RentalGuru.settings import HOST_URL
+from vehicle.models import Vehicle, VehiclePhoto, RentPrice, Availability
+
+VEHICLE_TYPE_NAMES = {
+    'auto': 'auto',
+    'bike': 'bike',
+    'ship': 'ship',
+    'helicopter': 'helicopter',
+    'specialtechnic': 'special_technic',
+}
+
+CARD_VALUES = (
+    'id', 'polymorphic_ctype_id', 'average_rating', 'latitude', 'longitude', 'verified', 'delivery',
+    'price_delivery', 'price_deposit',
+    'brand_id', 'brand__name', 'brand__logo',
+    'model_id', 'model__name', 'model__brand_id', 'model__vehicle_type',
+    'city__title',
+    'owner_id', 'owner__first_name', 'owner__last_name', 'owner__telephone', 'owner__avatar',
+    'owner__lessor__id', 'owner__lessor__super_host',
+)
+
+TWO_PLACES = Decimal('0.01')
+
+
+def _decimal(value):
+    """ Представление DecimalField(decimal_places=2) как в DRF """
+    return None if value is None else f'{Decimal(value).quantize(TWO_PLACES):f}'
+
+
+def _vehicle_type(ctype_id):
+    model_name = ContentType.objects.get_for_id(ctype_id).model
+    return VEHICLE_TYPE_NAMES.get(model_name, 'unknown')
+
+
+def _photo_url(name):
+    return f"{HOST_URL}/{default_storage.url(name)}"
+
+
+def _availability(vehicle_id, start_date, end_date, on_request):
+    if on_request:
+        return {'vehicle': vehicle_id, 'on_request': on_request}
+    return {
+        'vehicle': vehicle_id,
+        'start_date': start_date.isoformat() if start_date else None,
+        'end_date': end_date.isoformat() if end_date else None,
+        'on_request': on_request,
+    }
+
+
+def build_vehicle_cards(vehicle_ids):
+    """ Карточки в формате BaseVehicleListSerializer в порядке vehicle_ids """
+    vehicle_ids = list(vehicle_ids)
+    if not vehicle_ids:
+        return []
+
+    rows = {row['id']: row for row in
+            Vehicle.objects.non_polymorphic().filter(id__in=vehicle_ids).values(*CARD_VALUES)}
+
+    photos = defaultdict(list)
+    for vehicle_id, photo, photo_card in (VehiclePhoto.objects.filter(vehicle_id__in=vehicle_ids)
+                                          .order_by('order').values_list('vehicle_id', 'photo', 'photo_card')):
+        photos[vehicle_id].append(_photo_url(photo_card or photo))
+
+    prices = defaultdict(list)
+    for vehicle_id, name, price, discount, total in (RentPrice.objects.filter(vehicle_id__in=vehicle_ids)
+                                                     .order_by('id')
+                                                     .values_list('vehicle_id', 'name', 'price', 'discount', 'total')):
+        prices[vehicle_id].append({'name': name, 'price': _decimal(price), 'discount': discount,
+                                   'total': _decimal(total)})
+
+    availabilities = defaultdict(list)
+    for vehicle_id, start_date, end_date, on_request in (Availability.objects.filter(vehicle_id__in=vehicle_ids)
+                                                         .order_by('id')
+                                                         .values_list('vehicle_id', 'start_date', 'end_date',
+                                                                      'on_request')):
+        availabilities[vehicle_id].append(_availability(vehicle_id, start_date, end_date, on_request))
+
+    cards = []
+    for vehicle_id in vehicle_ids:
+        row = rows.get(vehicle_id)
+        if row is None:
+            continue
+        cards.append({
+            'id': row['id'],
+            'brand': {
+                'id': row['brand_id'],
+                'name': row['brand__name'],
+                'logo_url': default_storage.url(row['brand__logo']) if row['brand__logo'] else None,
+            },
+            'model': {
+                'id': row['model_id'],
+                'name': row['model__name'],
+                'brand': row['model__brand_id'],
+                'vehicle_type': row['model__vehicle_type'],
+            },
+            'average_rating': float(row['average_rating']),
+            'rent_prices': prices[vehicle_id],
+            'availabilities': availabilities[vehicle_id],
+            'is_super_host': row['owner__lessor__super_host'],
+            'photos': photos[vehicle_id],
+            'vehicle_type': _vehicle_type(row['polymorphic_ctype_id']),
+            'free_delivery': row['delivery'] and row['price_delivery'] == 0,
+            'free_deposit': row['price_deposit'] == 0,
+            'latitude': row['latitude'],
+            'longitude': row['longitude'],
+            'city': row['city__title'],
+            'verified': row['verified'],
+            'lessor': {
+                'id': row['owner__lessor__id'],
+                'user_id': row['owner_id'],
+                'first_name': row['owner__first_name'],
+                'last_name': row['owner__last_name'],
+                'telephone': row['owner__telephone'] if row['owner__telephone'] else None,
+                'avatar': default_storage.url(row['owner__avatar']) if row['owner__avatar'] else None,
+            },
+        })
+    return cards
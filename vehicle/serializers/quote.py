@@ -0,0 +1,14 @@
+from rest_framework import serializers
+
+
+class RentQuoteRequestSerializer(serializers.Serializer):
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    start_time = serializers.TimeField(required=False, allow_null=True, default=None)
+    end_time = serializers.TimeField(required=False, allow_null=True, default=None)
+    delivery = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, data):
+        if data['end_date'] < data['start_date']:
+            raise serializers.ValidationError("Дата окончания не может быть раньше даты начала.")
+        return data
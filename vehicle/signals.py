@@ -1,67 +1,127 @@
-from django.db import models, transaction
-from django.db.models import F
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from django.contrib.postgres.search import SearchVector
-from transliterate import translit
-
-from vehicle.models import VehicleBrand, VehicleModel
-
-
-# @receiver(post_save, sender=VehicleBrand)
-# def update_brand_search_vector(sender, instance, **kwargs):
-#     name_translit = translit(instance.name, language_code='ru')
-#
-#     instance.search_vector = (
-#             SearchVector(models.Value(instance.name), config='english') +
-#             SearchVector(models.Value(name_translit), config='russian')
-#     )
-#     instance.save(update_fields=['search_vector'])
-#
-#
-# @receiver(post_save, sender=VehicleModel)
-# def update_model_search_vector(sender, instance, **kwargs):
-#     model_name_translit = translit(instance.name, language_code='ru')
-#     brand_name_translit = translit(instance.brand.name, language_code='ru')
-#
-#     instance.search_vector = (
-#             SearchVector(models.Value(instance.name), config='english') +
-#             SearchVector(models.Value(instance.brand.name), config='english') +
-#             SearchVector(models.Value(model_name_translit), config='russian') +
-#             SearchVector(models.Value(brand_name_translit), config='russian')
-#     )
-#     instance.save(update_fields=['search_vector'])
-
-_is_updating_search_vector = False
+
+from app.cache import bump_cache_version
+from app.models import Lessor
+from chat.models import RequestRent, Trip
+from vehicle.models import VehicleBrand, VehicleModel, Vehicle, RentPrice, Availability, AutoFeaturesFunctions, \
+    BikeFeaturesFunctions, ShipFeaturesFunctions, AutoFeaturesAdditionally, BikeFeaturesAdditionally, \
+    ShipFeaturesAdditionally, FeaturesForChildren, FeaturesEquipment, PaymentMethod, AutoFuelType, AutoTransmission, \
+    AutoBodyType, BikeBodyType, ShipType, TechnicType, BikeTransmission, VehicleClass, VehiclePhoto
+from vehicle.autocomplete import bump_autocomplete_version
+from vehicle.availability_calendar import bump_calendar_version
+from vehicle.pricing import invalidate_price_table
+from vehicle.images import needs_processing, enqueue_photo_processing, delete_photo_variants
+from vehicle.search_index import refresh_search_index, refresh_search_index_prices, \
+    refresh_search_index_availability, refresh_search_index_super_host, refresh_search_index_brand, FEATURE_FIELDS, \
+    VEHICLE_TYPES
+
+
+@receiver([post_save, post_delete], sender=VehicleBrand)
+@receiver([post_save, post_delete], sender=VehicleModel)
+def invalidate_autocomplete_index(sender, instance, **kwargs):
+    transaction.on_commit(bump_autocomplete_version)
+
+
+# Поддержка VehicleSearchIndex
+
+@receiver(post_save)
+def update_vehicle_search_index(sender, instance, **kwargs):
+    """ post_save приходит от конкретного класса (Auto, Bike, ...), поэтому отправитель проверяется здесь """
+    if isinstance(instance, Vehicle):
+        vehicle_id = instance.pk
+        transaction.on_commit(lambda: refresh_search_index([vehicle_id]))
+
+
+@receiver([post_save, post_delete], sender=RentPrice)
+def update_search_index_prices(sender, instance, **kwargs):
+    vehicle_id = instance.vehicle_id
+    transaction.on_commit(lambda: refresh_search_index_prices(vehicle_id))
+
+
+# Кэш таблицы цен (vehicle/pricing.py)
+
+@receiver([post_save, post_delete], sender=RentPrice)
+def invalidate_rent_price_table(sender, instance, **kwargs):
+    vehicle_id = instance.vehicle_id
+    transaction.on_commit(lambda: invalidate_price_table(vehicle_id))
+
+
+@receiver(post_save)
+def invalidate_vehicle_price_table(sender, instance, **kwargs):
+    if isinstance(instance, Vehicle):
+        vehicle_id = instance.pk
+        transaction.on_commit(lambda: invalidate_price_table(vehicle_id))
+
+
+@receiver([post_save, post_delete], sender=Availability)
+def update_search_index_availability(sender, instance, **kwargs):
+    vehicle_id = instance.vehicle_id
+    transaction.on_commit(lambda: refresh_search_index_availability(vehicle_id))
 
 
 @receiver(post_save, sender=VehicleBrand)
-def update_brand_search_vector(sender, instance, **kwargs):
-    global _is_updating_search_vector
-    if _is_updating_search_vector:
-        return
-    _is_updating_search_vector = True
-    try:
-        instance.search_vector = SearchVector('name', config='english')
-        instance.save()
-    finally:
-        _is_updating_search_vector = False
-
-
-processed_objects = set()
-
-
-@receiver(post_save, sender=VehicleModel)
-def update_model_search_vector(sender, instance, **kwargs):
-    if instance.pk in processed_objects:
-        return
-    processed_objects.add(instance.pk)
-    model_instance = VehicleModel.objects.annotate(
-        combined_search=SearchVector('name', config='english') +
-                        SearchVector('brand__name', config='english')
-    ).get(pk=instance.pk)
-
-    model_instance.search_vector = model_instance.combined_search
-    model_instance.save()
-
-    transaction.on_commit(lambda: processed_objects.discard(instance.pk))
\ No newline at end of file
+def update_search_index_brand(sender, instance, **kwargs):
+    transaction.on_commit(lambda: refresh_search_index_brand(instance))
+
+
+@receiver(post_save, sender=Lessor)
+def update_search_index_super_host(sender, instance, **kwargs):
+    transaction.on_commit(lambda: refresh_search_index_super_host(instance))
+
+
+def update_search_index_features(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Vehicle):
+        vehicle_id = instance.pk
+        transaction.on_commit(lambda: refresh_search_index([vehicle_id]))
+
+
+for vehicle_model in VEHICLE_TYPES:
+    for field_name in FEATURE_FIELDS:
+        if hasattr(vehicle_model, field_name):
+            m2m_changed.connect(update_search_index_features, sender=getattr(vehicle_model, field_name).through)
+
+
+# Версии кэша справочников (app.cache.CachedListMixin)
+
+DICTIONARY_MODELS = [
+    AutoFeaturesFunctions, BikeFeaturesFunctions, ShipFeaturesFunctions, AutoFeaturesAdditionally,
+    BikeFeaturesAdditionally, ShipFeaturesAdditionally, FeaturesForChildren, FeaturesEquipment, PaymentMethod,
+    AutoFuelType, AutoTransmission, AutoBodyType, BikeBodyType, ShipType, TechnicType, BikeTransmission, VehicleClass,
+]
+
+
+def invalidate_dictionary_cache(sender, **kwargs):
+    transaction.on_commit(lambda: bump_cache_version(sender))
+
+
+for dictionary_model in DICTIONARY_MODELS:
+    post_save.connect(invalidate_dictionary_cache, sender=dictionary_model)
+    post_delete.connect(invalidate_dictionary_cache, sender=dictionary_model)
+
+
+@receiver(post_save, sender=VehiclePhoto)
+def process_vehicle_photo_variants(sender, instance, **kwargs):
+    if needs_processing(instance):
+        enqueue_photo_processing([instance.pk])
+
+
+@receiver(post_delete, sender=VehiclePhoto)
+def delete_vehicle_photo_variants(sender, instance, **kwargs):
+    transaction.on_commit(lambda: delete_photo_variants(instance))
+
+
+# Версия календаря доступности (vehicle/availability_calendar.py)
+
+@receiver([post_save, post_delete], sender=Availability)
+def invalidate_availability_calendar(sender, instance, **kwargs):
+    vehicle_id = instance.vehicle_id
+    transaction.on_commit(lambda: bump_calendar_version(vehicle_id))
+
+
+@receiver([post_save, post_delete], sender=RequestRent)
+@receiver([post_save, post_delete], sender=Trip)
+def invalidate_booking_calendar(sender, instance, **kwargs):
+    vehicle_id = instance.object_id
+    transaction.on_commit(lambda: bump_calendar_version(vehicle_id))
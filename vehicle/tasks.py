@@ -0,0 +1,33 @@
+from celery import shared_task
+
+from RentalGuru.settings import redis_1
+from vehicle.gps import GPS_FLUSH_SCHEDULED_KEY, GPS_DIRTY_KEY, flush_positions, schedule_flush
+from vehicle.images import generate_photo_variants
+
+
+@shared_task
+def flush_gps_positions():
+    """ Сброс буфера GPS-координат в базу """
+    # Снимаем флаг до сброса: точки, пришедшие во время записи, запланируют следующий запуск
+    redis_1.delete(GPS_FLUSH_SCHEDULED_KEY)
+    try:
+        flushed = flush_positions()
+    finally:
+        if redis_1.scard(GPS_DIRTY_KEY):
+            schedule_flush()
+    return f"Flushed {flushed} vehicle positions"
+
+
+@shared_task
+def process_vehicle_photo(photo_id):
+    """ Генерация вариантов фото транспорта """
+    from vehicle.models import VehiclePhoto
+
+    photo = VehiclePhoto.objects.filter(id=photo_id).first()
+    if photo is None or not photo.photo:
+        return f"Photo with id {photo_id} does not exist"
+
+    names = generate_photo_variants(photo)
+    # Условие по оригиналу: если фото успели заменить, варианты запишет следующий запуск
+    VehiclePhoto.objects.filter(id=photo_id, photo=photo.photo.name).update(**names)
+    return f"Variants generated for photo {photo_id}"
@@ -0,0 +1,76 @@
+"""
+История GPS-координат (VehiclePosition) и выдача трека с прореживанием.
+
+Таблица секционирована по месяцам; секции создаются SQL-функцией vehicle_position_ensure_partition перед
+записью пачки. Трек за интервал отдается с прореживанием по фиксированным интервалам времени: окно делится на
+max_points корзин, из каждой берется последняя точка, так что объем ответа не зависит от частоты трекера.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection
+
+from vehicle.models import VehiclePosition
+
+TRACK_DEFAULT_POINTS = 500
+TRACK_MAX_POINTS = 5000
+
+_ensured_months = set()
+
+
+def ensure_position_partitions(months):
+    """ Создает недостающие месячные секции для переданных первых чисел месяцев """
+    missing = sorted(set(months) - _ensured_months)
+    if not missing:
+        return
+    with connection.cursor() as cursor:
+        for month in missing:
+            cursor.execute('SELECT vehicle_position_ensure_partition(%s)', [month])
+    _ensured_months.update(missing)
+
+
+def save_track_points(points):
+    """ Запись пачки точек {'vehicle_id', 'timestamp', 'latitude', 'longitude', 'speed'} одним INSERT """
+    rows = [
+        VehiclePosition(
+            vehicle_id=point['vehicle_id'],
+            ts=datetime.fromtimestamp(point['timestamp'], tz=dt_timezone.utc),
+            latitude=point['latitude'],
+            longitude=point['longitude'],
+            speed=point.get('speed'),
+        )
+        for point in points
+    ]
+    if not rows:
+        return
+    ensure_position_partitions(row.ts.date().replace(day=1) for row in rows)
+    VehiclePosition.objects.bulk_create(rows, batch_size=1000)
+
+
+def get_track(vehicle_id, start, end, max_points=TRACK_DEFAULT_POINTS):
+    """
+    Трек транспорта за [start, end), не больше max_points точек.
+    Возвращает список {'ts', 'latitude', 'longitude', 'speed'} в порядке времени.
+    """
+    max_points = max(1, min(int(max_points), TRACK_MAX_POINTS))
+    bucket_seconds = max((end - start).total_seconds() / max_points, 1)
+
+    query = f"""
+        SELECT ts, latitude, longitude, speed
+        FROM (
+            SELECT DISTINCT ON (bucket) ts, latitude, longitude, speed
+            FROM (
+                SELECT ts, latitude, longitude, speed,
+                       floor(extract(epoch FROM ts - %s) / %s) AS bucket
+                FROM {VehiclePosition._meta.db_table}
+                WHERE vehicle_id = %s AND ts >= %s AND ts < %s
+            ) AS points
+            ORDER BY bucket, ts DESC
+        ) AS sampled
+        ORDER BY ts
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(query, [start, bucket_seconds, vehicle_id, start, end])
+        return [
+            {'ts': ts.isoformat(), 'latitude': latitude, 'longitude': longitude, 'speed': speed}
+            for ts, latitude, longitude, speed in cursor.fetchall()
+        ]
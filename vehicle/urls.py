@@ -5,9 +5,10 @@ from .views import VehicleBrandViewSet, VehicleModelViewSet, AutoViewSet, BikeVi
     AutoFeaturesAdditionallyListView, BikeFeaturesAdditionallyListView, ShipFeaturesAdditionallyListView, \
     FeaturesForChildrenListView, FeaturesEquipmentListView, PaymentMethodListView, BikeTransmissionListView, \
     AutoTransmissionListView, AutoFuelTypeListView, AutoBodyTypeListView, VehicleClassListView, AllVehiclesListView, \
-    VehiclePhotoDeleteView, VehicleSearchViewSet, DeleteVehicleDocumentView, UpdatePhotoOrderView, \
+    NearestVehiclesView, VehiclePhotoDeleteView, VehicleSearchViewSet, DeleteVehicleDocumentView, UpdatePhotoOrderView, \
     AutoFeaturesFunctionsListView, BikeFeaturesFunctionsListView, ShipFeaturesFunctionsListView, ShipTypeListView, \
-    TechnicTypeListView, BikeBodyTypeListView, UnverifiedVehicleCountView
+    TechnicTypeListView, BikeBodyTypeListView, UnverifiedVehicleCountView, TripTrackView, \
+    RentQuoteView, VehicleCalendarView
 
 router = DefaultRouter()
 router.register(r'brands', VehicleBrandViewSet)
@@ -42,7 +43,11 @@ urlpatterns = [
     path('vehicle_class/', VehicleClassListView.as_view(), name='vehicle_class'),
 
     path('all_vehicles/', AllVehiclesListView.as_view(), name='all_vehicles'),
+    path('nearest/', NearestVehiclesView.as_view(), name='nearest_vehicles'),
     path('ws/gps_tracking/<int:vehicle_id>/', gps_tracking_view, name='gps_tracking'),
+    path('trips/<int:trip_id>/track/', TripTrackView.as_view(), name='trip_track'),
+    path('<int:vehicle_id>/quote/', RentQuoteView.as_view(), name='rent_quote'),
+    path('<int:vehicle_id>/calendar/', VehicleCalendarView.as_view(), name='vehicle_calendar'),
     path('photos/<int:photo_id>/delete/', VehiclePhotoDeleteView.as_view(), name='delete_vehicle_photo'),
     path('photos/update_order/', UpdatePhotoOrderView.as_view(), name='update_order_photo'),
     path('documents/delete/<int:document_id>/', DeleteVehicleDocumentView.as_view(), name='delete-vehicle-document'),
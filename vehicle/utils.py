@@ -1,4 +1,4 @@
-from datetime import timedelta
+from datetime import timedelta, date
 from django.db import transaction
 from django.db.models import F, Max
 
@@ -43,6 +43,72 @@ def merge_periods(periods):
     return merged_periods
 
 
+def _to_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def apply_availability_periods(vehicle, periods):
+    """
+    Приводит периоды доступности транспорта к переданному списку.
+    Периоды объединяются merge_periods и сравниваются с существующими строками: совпадающие не трогаются,
+    лишние строки переиспользуются через bulk_update, недостающие создаются bulk_create, остаток удаляется
+    одним DELETE. Все изменения выполняются в одной транзакции. Возвращает True, если что-то изменилось.
+    """
+    from vehicle.models import Availability
+    from vehicle.availability_calendar import bump_calendar_version
+    from vehicle.search_index import refresh_search_index_availability
+
+    periods = list(periods or [])
+    on_request = any(period.get('on_request') for period in periods)
+    desired = [] if on_request else merge_periods([
+        {'start_date': _to_date(period['start_date']), 'end_date': _to_date(period['end_date'])}
+        for period in periods if period.get('start_date') and period.get('end_date')
+    ])
+
+    with transaction.atomic():
+        existing = list(Availability.objects.select_for_update().filter(vehicle=vehicle).order_by('id'))
+
+        if on_request:
+            keep = next((availability for availability in existing if availability.on_request), None)
+            to_delete = [availability.pk for availability in existing if availability is not keep]
+            to_update, to_create = [], []
+            if keep is None:
+                to_create = [Availability(vehicle=vehicle, on_request=True)]
+        else:
+            wanted = {(period['start_date'], period['end_date']) for period in desired}
+            kept_keys = set()
+            reusable = []
+            for availability in existing:
+                key = (availability.start_date, availability.end_date)
+                if not availability.on_request and key in wanted and key not in kept_keys:
+                    kept_keys.add(key)
+                else:
+                    reusable.append(availability)
+
+            missing = sorted(wanted - kept_keys)
+            to_update = []
+            for availability, (start_date, end_date) in zip(reusable, missing):
+                availability.start_date, availability.end_date, availability.on_request = start_date, end_date, False
+                to_update.append(availability)
+            to_delete = [availability.pk for availability in reusable[len(to_update):]]
+            to_create = [Availability(vehicle=vehicle, start_date=start_date, end_date=end_date)
+                         for start_date, end_date in missing[len(to_update):]]
+
+        if to_update:
+            Availability.objects.bulk_update(to_update, ['start_date', 'end_date', 'on_request'])
+        if to_delete:
+            Availability.objects.filter(pk__in=to_delete).delete()
+        if to_create:
+            Availability.objects.bulk_create(to_create)
+
+        changed = bool(to_update or to_delete or to_create)
+        if changed:
+            vehicle_id = vehicle.pk
+            transaction.on_commit(lambda: refresh_search_index_availability(vehicle_id))
+            transaction.on_commit(lambda: bump_calendar_version(vehicle_id))
+    return changed
+
+
 def update_photo_order(vehicle, old_order, new_order):
     """
     Обновляет порядок фотографий при изменении одной из них.
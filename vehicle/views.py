@@ -1,44 +1,58 @@
 import os
+import json
+import binascii
 import logging
+from base64 import b64decode, b64encode
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
+from django.core.exceptions import FieldDoesNotExist
 from django.contrib.contenttypes.models import ContentType
-from django.contrib.postgres.search import TrigramSimilarity
-from django.db.models import Q, Min, Prefetch
+from django.contrib.postgres.search import TrigramSimilarity, SearchQuery, SearchRank
+from django.db import transaction, IntegrityError
+from django.db.models import Q, F, Min, Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
 from rest_framework.decorators import api_view, permission_classes, action
-from rest_framework.filters import OrderingFilter
+from rest_framework.exceptions import NotFound
 from rest_framework.generics import get_object_or_404, ListAPIView
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
 logger = logging.getLogger(__name__)
 
 from RentalGuru import settings
+from app.cache import CachedListMixin
 from app.models import Lessor
 from chat.models import Trip
 from manager.permissions import ManagerObjectPermission, IsFranchiseDirector, VehiclesAccess
 from notification.models import Notification
 from .filters import AutoFilter, BikeFilter, ShipFilter, HelicopterFilter, SpecialTechnicFilter, BaseFilter, \
-    VehicleModelFilter, VehicleBrandFilter
+    VehicleModelFilter, VehicleBrandFilter, VehicleOrderingFilter
 from .models import VehicleBrand, VehicleModel, Auto, Bike, Ship, Helicopter, SpecialTechnic, RatingUpdateLog, Vehicle, \
     AutoFeaturesAdditionally, BikeFeaturesAdditionally, ShipFeaturesAdditionally, \
     FeaturesForChildren, FeaturesEquipment, PaymentMethod, AutoFuelType, AutoTransmission, AutoBodyType, \
     BikeTransmission, VehicleClass, VehiclePhoto, VehicleDocument, AutoFeaturesFunctions, BikeFeaturesFunctions, \
-    ShipFeaturesFunctions, ShipType, TechnicType, BikeBodyType
+    ShipFeaturesFunctions, ShipType, TechnicType, BikeBodyType, VehicleSearchIndex
 from .permission import IsAdminOrLessor, IsAdminOrReadOnly, IsAdminOrOwner
 from .serializers.base import VehicleBrandSerializer, VehicleModelSerializer, \
-    PaymentMethodSerializer, VehicleClassSerializer, VehicleSerializer, UpdatePhotoOrderSerializer
+    PaymentMethodSerializer, VehicleClassSerializer, UpdatePhotoOrderSerializer
 from .serializers.auto import AutoGetSerializer, AutoListSerializer, AutoCreateSerializer, \
     AutoUpdateSerializer, AutoFeaturesAdditionallySerializer, FeaturesForChildrenSerializer, AutoFuelTypeSerializer, \
     AutoTransmissionSerializer, AutoBodyTypeSerializer, AutoFeaturesFunctionsSerializer
 from .serializers.bike import BikeGetSerializer, BikeListSerializer, BikeCreateSerializer, BikeUpdateSerializer, \
     BikeFeaturesAdditionallySerializer, BikeTransmissionSerializer, BikeFeaturesFunctionsSerializer, \
     BikeBodyTypeSerializer
+from .serializers.cards import build_vehicle_cards
+from .serializers.quote import RentQuoteRequestSerializer
 from .serializers.rating import UpdateRatingSerializer
 from .serializers.ship import ShipGetSerializer, ShipListSerializer, ShipCreateSerializer, ShipUpdateSerializer, \
     ShipFeaturesAdditionallySerializer, FeaturesEquipmentSerializer, ShipFeaturesFunctionsSerializer, ShipTypeSerializer
@@ -46,6 +60,13 @@ from .serializers.helicopter import HelicopterGetSerializer, HelicopterListSeria
     HelicopterUpdateSerializer
 from .serializers.specialtechnic import SpecialTechnicGetSerializer, SpecialTechnicListSerializer, \
     SpecialTechnicCreateSerializer, SpecialTechnicUpdateSerializer, TechnicTypeSerializer
+from .autocomplete import get_autocomplete_index
+from .availability_calendar import get_calendar
+from .geo import within_radius, distance_km, nearest_ordering
+from .gps import buffer_position, get_live_position
+from .pricing import get_price_table, quote_rent, quote_options
+from .tracks import get_track, TRACK_DEFAULT_POINTS, TRACK_MAX_POINTS
+from .ratings import RATING_FIELDS, add_vehicle_rating
 from .utils import update_photo_order
 
 
@@ -72,7 +93,131 @@ class VehicleModelViewSet(viewsets.ModelViewSet):
         return super().get_permissions()
 
 
+class VehicleCatalogPagination(LimitOffsetPagination):
+    """
+    Пагинация каталога транспорта.
+    По умолчанию работает как LimitOffsetPagination. При ?pagination=cursor включается keyset-пагинация
+    по полю сортировки (average_rating, price, count_trip, created_at) и id без COUNT(*):
+    в ответе возвращается ссылка next с курсором, по которой загружается следующая страница.
+    """
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    cursor_page_size = 20
+    cursor_max_page_size = 100
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = request.query_params.get(self.mode_query_param) == 'cursor'
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = min(self.get_limit(request) or self.cursor_page_size, self.cursor_max_page_size)
+        self.field, self.descending = self.get_cursor_ordering(queryset, view)
+
+        queryset = queryset.order_by(*self.get_order_by())
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(*position))
+
+        rows = list(queryset[:self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        rows = rows[:self.limit]
+        self.next_position = self.get_item_position(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'results': data,
+        })
+
+    @staticmethod
+    def is_orderable(queryset, field):
+        """ Поле есть в queryset: аннотация (price, distance) или поле модели """
+        if field in queryset.query.annotations:
+            return True
+        try:
+            queryset.model._meta.get_field(field)
+        except FieldDoesNotExist:
+            return False
+        return True
+
+    def get_cursor_ordering(self, queryset, view):
+        """
+        Сортировка берется из queryset после фильтров (OrderingFilter уже отбросил недоступные поля, например
+        distance без координат), а не из параметров запроса
+        """
+        ordering_fields = getattr(view, 'ordering_fields', None) or []
+        ordering = queryset.query.order_by[0] if queryset.query.order_by else None
+        if (not isinstance(ordering, str) or ordering.lstrip('-') not in ordering_fields or
+                not self.is_orderable(queryset, ordering.lstrip('-'))):
+            ordering = (getattr(view, 'ordering', None) or ['-id'])[0]
+            if not self.is_orderable(queryset, ordering.lstrip('-')):
+                ordering = '-id'
+        return ordering.lstrip('-'), ordering.startswith('-')
+
+    def get_order_by(self):
+        if self.descending:
+            return F(self.field).desc(nulls_last=True), F('id').desc()
+        return F(self.field).asc(nulls_last=True), F('id').asc()
+
+    def get_position_filter(self, value, pk):
+        """ Условие "строго после позиции (value, pk)" с учетом NULL в конце выдачи """
+        id_lookup = 'id__lt' if self.descending else 'id__gt'
+        if value is None:
+            return Q(**{f'{self.field}__isnull': True, id_lookup: pk})
+        value_lookup = f'{self.field}__lt' if self.descending else f'{self.field}__gt'
+        return (Q(**{value_lookup: value}) |
+                Q(**{self.field: value, id_lookup: pk}) |
+                Q(**{f'{self.field}__isnull': True}))
+
+    def get_item_position(self, item):
+        if isinstance(item, dict):
+            return item[self.field], item['id']
+        return getattr(item, self.field), item.id
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            return position['v'], int(position['id'])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, value, pk):
+        if isinstance(value, (Decimal, datetime)):
+            value = str(value)
+        data = json.dumps({'v': value, 'id': pk}).encode('utf-8')
+        return b64encode(data).decode('ascii')
+
+    def get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(*self.next_position))
+
+
+def annotate_price(queryset):
+    """ Минимальная цена аренды: из VehicleSearchIndex, если он включен, иначе агрегат по rent_prices """
+    if settings.VEHICLE_SEARCH_INDEX_ENABLED:
+        return queryset.annotate(price=F('search_index__price'))
+    return queryset.annotate(price=Min('rent_prices__price'))
+
+
 class BaseViewSet(viewsets.ModelViewSet):
+    pagination_class = VehicleCatalogPagination
+
+    def distinct_queryset(self, queryset):
+        """ DISTINCT нужен только при фильтрации через join-ы, при VehicleSearchIndex дублей нет """
+        if settings.VEHICLE_SEARCH_INDEX_ENABLED:
+            return queryset
+        return queryset.distinct()
+
     def get_permissions(self):
         if self.action == 'list':
             self.permission_classes = [AllowAny]
@@ -137,34 +282,36 @@ class BaseViewSet(viewsets.ModelViewSet):
                                "`price`, `-price`, "
                                "`count_trip`, `-count_trip`, "
                                "`average_rating`, `-average_rating`, "
-                               "`created_at`, `-created_at`."
+                               "`created_at`, `-created_at`, "
+                               "`distance`, `-distance` (только вместе с lat и lon)."
                        ),
                        enum=[
                            "price", "-price",
                            "count_trip", "-count_trip",
                            "average_rating", "-average_rating",
-                           "created_at", "-created_at"
+                           "created_at", "-created_at",
+                           "distance", "-distance"
                        ],
                    )
                ],
                )
 class AutoViewSet(BaseViewSet):
     queryset = Auto.objects.all()
-    filter_backends = (DjangoFilterBackend, OrderingFilter)
+    filter_backends = (DjangoFilterBackend, VehicleOrderingFilter)
     filterset_class = AutoFilter
-    ordering_fields = ['price', 'count_trip', 'average_rating', 'created_at']
+    ordering_fields = ['price', 'count_trip', 'average_rating', 'created_at', 'distance']
     ordering = ['-average_rating']
 
     def get_queryset(self):
         user = self.request.user
-        queryset = (Auto.objects.annotate(price=Min('rent_prices__price'))
+        queryset = (annotate_price(Auto.objects.all())
                     .select_related('owner', 'brand', 'model', 'transmission', 'fuel_type', 'body_type',
                                     'vehicle_class', 'city', 'owner__lessor')
                     .prefetch_related('payment_method', 'features_for_children', 'features_functions', 'photos',
                                       'features_additionally', 'availabilities', 'documents', 'rent_prices'))
         if user.is_authenticated:
             if user.role in ['admin', 'manager']:
-                return queryset.distinct()
+                return self.distinct_queryset(queryset)
             else:
                 is_renter = hasattr(user, 'renter')
                 is_lessor = hasattr(user, 'lessor')
@@ -176,7 +323,7 @@ class AutoViewSet(BaseViewSet):
             queryset = queryset.filter(verified=True)
         if not self.request.query_params.get('ordering'):
             queryset = queryset.order_by('-average_rating')
-        return queryset.distinct()
+        return self.distinct_queryset(queryset)
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -201,34 +348,36 @@ class AutoViewSet(BaseViewSet):
                                "`price`, `-price`, "
                                "`count_trip`, `-count_trip`, "
                                "`average_rating`, `-average_rating`, "
-                               "`created_at`, `-created_at`."
+                               "`created_at`, `-created_at`, "
+                               "`distance`, `-distance` (только вместе с lat и lon)."
                        ),
                        enum=[
                            "price", "-price",
                            "count_trip", "-count_trip",
                            "average_rating", "-average_rating",
-                           "created_at", "-created_at"
+                           "created_at", "-created_at",
+                           "distance", "-distance"
                        ],
                    )
                ],
                )
 class BikeViewSet(BaseViewSet):
     queryset = Bike.objects.all()
-    filter_backends = (DjangoFilterBackend, OrderingFilter)
+    filter_backends = (DjangoFilterBackend, VehicleOrderingFilter)
     filterset_class = BikeFilter
-    ordering_fields = ['price', 'count_trip', 'average_rating', 'created_at']
+    ordering_fields = ['price', 'count_trip', 'average_rating', 'created_at', 'distance']
     ordering = ['-average_rating']
 
     def get_queryset(self):
         user = self.request.user
-        queryset = (Bike.objects.annotate(price=Min('rent_prices__price'))
+        queryset = (annotate_price(Bike.objects.all())
                     .select_related('owner', 'brand', 'model', 'transmission', 'vehicle_class', 'city', 'owner__lessor',
                                     'body_type')
                     .prefetch_related('payment_method', 'features_functions', 'features_additionally', 'availabilities',
                                       'documents', 'rent_prices', 'photos'))
         if user.is_authenticated:
             if user.role in ['admin', 'manager']:
-                return queryset.distinct()
+                return self.distinct_queryset(queryset)
             else:
                 is_renter = hasattr(user, 'renter')
                 is_lessor = hasattr(user, 'lessor')
@@ -238,7 +387,7 @@ class BikeViewSet(BaseViewSet):
                     queryset = queryset.filter(verified=True)
         else:
             queryset = queryset.filter(verified=True)
-        return queryset.distinct()
+        return self.distinct_queryset(queryset)
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -263,33 +412,35 @@ class BikeViewSet(BaseViewSet):
                                "`price`, `-price`, "
                                "`count_trip`, `-count_trip`, "
                                "`average_rating`, `-average_rating`, "
-                               "`created_at`, `-created_at`."
+                               "`created_at`, `-created_at`, "
+                               "`distance`, `-distance` (только вместе с lat и lon)."
                        ),
                        enum=[
                            "price", "-price",
                            "count_trip", "-count_trip",
                            "average_rating", "-average_rating",
-                           "created_at", "-created_at"
+                           "created_at", "-created_at",
+                           "distance", "-distance"
                        ],
                    )
                ],
                )
 class ShipViewSet(BaseViewSet):
     queryset = Ship.objects.all()
-    filter_backends = (DjangoFilterBackend, OrderingFilter)
+    filter_backends = (DjangoFilterBackend, VehicleOrderingFilter)
     filterset_class = ShipFilter
-    ordering_fields = ['price', 'count_trip', 'average_rating', 'created_at']
+    ordering_fields = ['price', 'count_trip', 'average_rating', 'created_at', 'distance']
     ordering = ['-average_rating']
 
     def get_queryset(self):
         user = self.request.user
-        queryset = (Ship.objects.annotate(price=Min('rent_prices__price'))
+        queryset = (annotate_price(Ship.objects.all())
                     .select_related('owner', 'brand', 'model', 'vehicle_class', 'city', 'owner__lessor', 'type_ship')
                     .prefetch_related('payment_method', 'features_functions', 'features_additionally',
                                       'features_equipment', 'availabilities', 'documents', 'rent_prices', 'photos'))
         if user.is_authenticated:
             if user.role in ['admin', 'manager']:
-                return queryset.distinct()
+                return self.distinct_queryset(queryset)
             else:
                 is_renter = hasattr(user, 'renter')
                 is_lessor = hasattr(user, 'lessor')
@@ -300,7 +451,7 @@ class ShipViewSet(BaseViewSet):
         else:
             queryset = queryset.filter(verified=True)
             pass
-        return queryset.distinct()
+        return self.distinct_queryset(queryset)
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -325,32 +476,34 @@ class ShipViewSet(BaseViewSet):
                                "`price`, `-price`, "
                                "`count_trip`, `-count_trip`, "
                                "`average_rating`, `-average_rating`, "
-                               "`created_at`, `-created_at`."
+                               "`created_at`, `-created_at`, "
+                               "`distance`, `-distance` (только вместе с lat и lon)."
                        ),
                        enum=[
                            "price", "-price",
                            "count_trip", "-count_trip",
                            "average_rating", "-average_rating",
-                           "created_at", "-created_at"
+                           "created_at", "-created_at",
+                           "distance", "-distance"
                        ],
                    )
                ],
                )
 class HelicopterViewSet(BaseViewSet):
     queryset = Helicopter.objects.all()
-    filter_backends = (DjangoFilterBackend, OrderingFilter)
+    filter_backends = (DjangoFilterBackend, VehicleOrderingFilter)
     filterset_class = HelicopterFilter
-    ordering_fields = ['price', 'count_trip', 'average_rating', 'created_at']
+    ordering_fields = ['price', 'count_trip', 'average_rating', 'created_at', 'distance']
     ordering = ['-average_rating']
 
     def get_queryset(self):
         user = self.request.user
-        queryset = (Helicopter.objects.annotate(price=Min('rent_prices__price'))
+        queryset = (annotate_price(Helicopter.objects.all())
                     .select_related('owner', 'brand', 'model', 'vehicle_class', 'city', 'owner__lessor')
                     .prefetch_related('payment_method', 'availabilities', 'documents', 'rent_prices', 'photos'))
         if user.is_authenticated:
             if user.role in ['admin', 'manager']:
-                return queryset.distinct()
+                return self.distinct_queryset(queryset)
             else:
                 is_renter = hasattr(user, 'renter')
                 is_lessor = hasattr(user, 'lessor')
@@ -362,7 +515,7 @@ class HelicopterViewSet(BaseViewSet):
         else:
             queryset = queryset.filter(verified=True)
             pass
-        return queryset.distinct()
+        return self.distinct_queryset(queryset)
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -387,32 +540,34 @@ class HelicopterViewSet(BaseViewSet):
                                "`price`, `-price`, "
                                "`count_trip`, `-count_trip`, "
                                "`average_rating`, `-average_rating`, "
-                               "`created_at`, `-created_at`."
+                               "`created_at`, `-created_at`, "
+                               "`distance`, `-distance` (только вместе с lat и lon)."
                        ),
                        enum=[
                            "price", "-price",
                            "count_trip", "-count_trip",
                            "average_rating", "-average_rating",
-                           "created_at", "-created_at"
+                           "created_at", "-created_at",
+                           "distance", "-distance"
                        ],
                    )
                ],
                )
 class SpecialTechnicViewSet(BaseViewSet):
     queryset = SpecialTechnic.objects.all()
-    filter_backends = (DjangoFilterBackend, OrderingFilter)
+    filter_backends = (DjangoFilterBackend, VehicleOrderingFilter)
     filterset_class = SpecialTechnicFilter
-    ordering_fields = ['price', 'count_trip', 'average_rating', 'created_at']
+    ordering_fields = ['price', 'count_trip', 'average_rating', 'created_at', 'distance']
     ordering = ['-average_rating']
 
     def get_queryset(self):
         user = self.request.user
-        queryset = (SpecialTechnic.objects.annotate(price=Min('rent_prices__price'))
+        queryset = (annotate_price(SpecialTechnic.objects.all())
                     .select_related('owner', 'brand', 'model', 'city', 'owner__lessor', 'type_technic')
                     .prefetch_related('payment_method', 'availabilities', 'documents', 'rent_prices', 'photos'))
         if user.is_authenticated:
             if user.role in ['admin', 'manager']:
-                return queryset.distinct()
+                return self.distinct_queryset(queryset)
             else:
                 is_renter = hasattr(user, 'renter')
                 is_lessor = hasattr(user, 'lessor')
@@ -424,7 +579,7 @@ class SpecialTechnicViewSet(BaseViewSet):
         else:
             queryset = queryset.filter(verified=True)
             pass
-        return queryset.distinct()
+        return self.distinct_queryset(queryset)
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -459,59 +614,39 @@ class UpdateRatingView(APIView):
             if not model:
                 return Response({"error": "Неверный тип транспорта"}, status=status.HTTP_400_BAD_REQUEST)
 
-            try:
-                vehicle = model.objects.get(id=vehicle_id)
-            except model.DoesNotExist:
+            vehicle = model.objects.filter(id=vehicle_id).select_related('owner').only('id', 'owner').first()
+            if vehicle is None:
                 return Response({"error": "Транспорт не найден"}, status=status.HTTP_404_NOT_FOUND)
 
             content_type = ContentType.objects.get_for_model(vehicle)
+            scores = {field: data.get(field) for field in RATING_FIELDS}
 
-            # Проверка, обновлял ли пользователь уже рейтинг
-            if RatingUpdateLog.objects.filter(user=request.user, content_type=content_type,
-                                              object_id=vehicle_id).exists():
+            try:
+                with transaction.atomic():
+                    # Уникальность (user, content_type, object_id) защищает от повторной оценки при гонке запросов
+                    RatingUpdateLog.objects.create(
+                        user=request.user,
+                        content_type=content_type,
+                        object_id=vehicle_id,
+                        cleanliness=data.get('Cleanliness'),
+                        maintenance=data.get('Maintenance'),
+                        communication=data.get('Communication'),
+                        convenience=data.get('Convenience'),
+                        accuracy=data.get('Accuracy')
+                    )
+                    result = add_vehicle_rating(vehicle_id, scores)
+                    if not Lessor.objects.filter(user_id=vehicle.owner_id).update(count_trip=F('count_trip') + 1):
+                        raise Lessor.DoesNotExist
+            except IntegrityError:
                 return Response({"error": "Вы уже обновили рейтинг этого автомобиля."},
                                 status=status.HTTP_403_FORBIDDEN)
-
-            try:
-                trip = Trip.objects.filter(
-                    organizer=request.user,
-                    content_type=content_type,
-                    object_id=vehicle_id,
-                    status='finished'
-                ).first()
-            except Trip.DoesNotExist:
-                return Response({"error": "Не найдено соответствующей поездки"}, status=status.HTTP_404_NOT_FOUND)
-
-            # Обновляем рейтинги
-            ratings_fields = ['Cleanliness', 'Maintenance', 'Communication', 'Convenience', 'Accuracy']
-            for field in ratings_fields:
-                rating = data.get(field)
-                if rating is not None:
-                    field_ratings = vehicle.ratings.get(field, {})
-                    star_key = f"{rating}_stars"
-                    field_ratings[star_key] = field_ratings.get(star_key, 0) + 1
-                    vehicle.ratings[field] = field_ratings
-
-            vehicle.save()
-
-            try:
-                lessor = Lessor.objects.get(user=vehicle.owner)
-                lessor.count_trip += 1
-                lessor.save()
             except Lessor.DoesNotExist:
                 return Response({"error": "Арендодатель не найден"}, status=status.HTTP_404_NOT_FOUND)
 
-            # Логируем обновление рейтинга
-            RatingUpdateLog.objects.create(
-                user=request.user,
-                content_type=content_type,
-                object_id=vehicle_id,
-                cleanliness=data.get('Cleanliness'),
-                maintenance=data.get('Maintenance'),
-                communication=data.get('Communication'),
-                convenience=data.get('Convenience'),
-                accuracy=data.get('Accuracy')
-            )
+            if result is not None:
+                average_rating = result[1]
+                transaction.on_commit(lambda: VehicleSearchIndex.objects.filter(vehicle_id=vehicle_id).update(
+                    average_rating=average_rating))
 
             # Отправка уведомлений
             content = f'Обновлен рейтинг для {vehicle}'
@@ -530,11 +665,18 @@ def update_gps_location(request):
     vehicle_id = request.data.get('vehicle_id')
     latitude = request.data.get('latitude')
     longitude = request.data.get('longitude')
+    speed = request.data.get('speed')
 
-    vehicle = Vehicle.objects.get(id=vehicle_id)
-    vehicle.latitude = latitude
-    vehicle.longitude = longitude
-    vehicle.save()
+    try:
+        vehicle_id = int(vehicle_id)
+        latitude = float(latitude)
+        longitude = float(longitude)
+        speed = float(speed) if speed is not None else None
+    except (TypeError, ValueError):
+        return Response({"error": "Неверные vehicle_id или координаты"}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Координаты копятся в Redis и записываются в базу пачками задачей flush_gps_positions
+    buffer_position(vehicle_id, latitude, longitude, speed=speed)
 
     channel_layer = get_channel_layer()
     async_to_sync(channel_layer.group_send)(
@@ -558,119 +700,188 @@ def gps_tracking_view(request, vehicle_id):
     if not request.user != vehicle.owner:
         return Response({"error": "У вас нет разрешения на отслеживание этого транспортного средства"}, status=403)
 
+    position = get_live_position(vehicle.id)
+
     data = {
         'vehicle_id': vehicle.id,
         'brand': vehicle.brand.name,
         'model': vehicle.model.name,
-        'latitude': vehicle.latitude,
-        'longitude': vehicle.longitude,
-        'last_update': vehicle.last_update.isoformat(),
+        'latitude': position['latitude'] if position else vehicle.latitude,
+        'longitude': position['longitude'] if position else vehicle.longitude,
+        'last_update': (
+            datetime.fromtimestamp(position['timestamp'], tz=timezone.get_current_timezone())
+            if position and position.get('timestamp') else vehicle.last_update
+        ).isoformat(),
         'websocket_url': f'/ws/gps_tracking/{vehicle.id}/',
     }
 
     return Response(data)
 
 
+@extend_schema(summary="Трек поездки",
+               description="GPS-трек транспорта за время поездки, прореженный на сервере до заданного числа точек. "
+                           "Доступен арендатору, владельцу транспорта и администраторам.",
+               parameters=[
+                   OpenApiParameter("start", type=OpenApiTypes.DATETIME,
+                                    description="Начало интервала (по умолчанию начало поездки)"),
+                   OpenApiParameter("end", type=OpenApiTypes.DATETIME,
+                                    description="Конец интервала (по умолчанию конец поездки)"),
+                   OpenApiParameter("points", type=OpenApiTypes.INT,
+                                    description=f"Максимум точек (по умолчанию {TRACK_DEFAULT_POINTS}, "
+                                                f"не более {TRACK_MAX_POINTS})"),
+               ])
+class TripTrackView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @staticmethod
+    def trip_bounds(trip):
+        start = datetime.combine(trip.start_date, trip.start_time or time.min)
+        end = datetime.combine(trip.end_date, trip.end_time or time.max)
+        current_tz = timezone.get_current_timezone()
+        return timezone.make_aware(start, current_tz), timezone.make_aware(end, current_tz)
+
+    @staticmethod
+    def parse_datetime_param(value, default):
+        if not value:
+            return default
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(value)
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+    def get(self, request, trip_id):
+        trip = get_object_or_404(Trip, id=trip_id)
+        owner_id = Vehicle.objects.non_polymorphic().filter(id=trip.object_id).values_list('owner_id', flat=True).first()
+
+        user = request.user
+        if user.id not in (trip.organizer_id, owner_id) and user.role not in ['admin', 'manager']:
+            return Response({"error": "У вас нет доступа к треку этой поездки"}, status=status.HTTP_403_FORBIDDEN)
+
+        trip_start, trip_end = self.trip_bounds(trip)
+        try:
+            start = self.parse_datetime_param(request.query_params.get('start'), trip_start)
+            end = self.parse_datetime_param(request.query_params.get('end'), trip_end)
+            points = int(request.query_params.get('points', TRACK_DEFAULT_POINTS))
+        except ValueError:
+            return Response({"error": "Неверные start, end или points"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if end <= start:
+            return Response({"error": "end должен быть позже start"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Трек отдается только в пределах поездки: точки других аренд этого транспорта недоступны
+        start, end = max(start, trip_start), min(end, trip_end)
+        if end <= start:
+            return Response({"error": "Период не пересекается с поездкой"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'trip_id': trip.id,
+            'vehicle_id': trip.object_id,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'points': get_track(trip.object_id, start, end, points),
+        })
+
+
 @extend_schema(summary="Список функций автомобилей", description="Список функций автомобилей")
-class AutoFeaturesFunctionsListView(ListAPIView):
+class AutoFeaturesFunctionsListView(CachedListMixin, ListAPIView):
     queryset = AutoFeaturesFunctions.objects.all()
     serializer_class = AutoFeaturesFunctionsSerializer
 
 
 @extend_schema(summary="Список функций мотоциклов", description="Список функций мотоциклов")
-class BikeFeaturesFunctionsListView(ListAPIView):
+class BikeFeaturesFunctionsListView(CachedListMixin, ListAPIView):
     queryset = BikeFeaturesFunctions.objects.all()
     serializer_class = BikeFeaturesFunctionsSerializer
 
 
 @extend_schema(summary="Список функций суден", description="Список функций суден")
-class ShipFeaturesFunctionsListView(ListAPIView):
+class ShipFeaturesFunctionsListView(CachedListMixin, ListAPIView):
     queryset = ShipFeaturesFunctions.objects.all()
     serializer_class = ShipFeaturesFunctionsSerializer
 
 
 @extend_schema(summary="Список дополнительных особенностей авто", description="Список дополнительных особенностей авто")
-class AutoFeaturesAdditionallyListView(ListAPIView):
+class AutoFeaturesAdditionallyListView(CachedListMixin, ListAPIView):
     queryset = AutoFeaturesAdditionally.objects.all()
     serializer_class = AutoFeaturesAdditionallySerializer
 
 
 @extend_schema(summary="Список дополнительных особенностей мотоциклов",
                description="Список дополнительных особенностей мотоциклов")
-class BikeFeaturesAdditionallyListView(ListAPIView):
+class BikeFeaturesAdditionallyListView(CachedListMixin, ListAPIView):
     queryset = BikeFeaturesAdditionally.objects.all()
     serializer_class = BikeFeaturesAdditionallySerializer
 
 
 @extend_schema(summary="Список дополнительных особенностей суден",
                description="Список дополнительных особенностей суден")
-class ShipFeaturesAdditionallyListView(ListAPIView):
+class ShipFeaturesAdditionallyListView(CachedListMixin, ListAPIView):
     queryset = ShipFeaturesAdditionally.objects.all()
     serializer_class = ShipFeaturesAdditionallySerializer
 
 
 @extend_schema(summary="Список особенностей авто для детей", description="Список особенностей авто для детей")
-class FeaturesForChildrenListView(ListAPIView):
+class FeaturesForChildrenListView(CachedListMixin, ListAPIView):
     queryset = FeaturesForChildren.objects.all()
     serializer_class = FeaturesForChildrenSerializer
 
 
 @extend_schema(summary="Список оборудования для суден", description="Список оборудования для суден")
-class FeaturesEquipmentListView(ListAPIView):
+class FeaturesEquipmentListView(CachedListMixin, ListAPIView):
     queryset = FeaturesEquipment.objects.all()
     serializer_class = FeaturesEquipmentSerializer
 
 
 @extend_schema(summary="Список способов платежей", description="Список способов платежей")
-class PaymentMethodListView(ListAPIView):
+class PaymentMethodListView(CachedListMixin, ListAPIView):
     queryset = PaymentMethod.objects.all()
     serializer_class = PaymentMethodSerializer
 
 
 @extend_schema(summary="Виды топлива авто", description="Виды топлива")
-class AutoFuelTypeListView(ListAPIView):
+class AutoFuelTypeListView(CachedListMixin, ListAPIView):
     queryset = AutoFuelType.objects.all()
     serializer_class = AutoFuelTypeSerializer
 
 
 @extend_schema(summary="Коробки передач авто", description="Коробки передач для авто")
-class AutoTransmissionListView(ListAPIView):
+class AutoTransmissionListView(CachedListMixin, ListAPIView):
     queryset = AutoTransmission.objects.all()
     serializer_class = AutoTransmissionSerializer
 
 
 @extend_schema(summary="Типы кузова авто", description="Типы кузова авто")
-class AutoBodyTypeListView(ListAPIView):
+class AutoBodyTypeListView(CachedListMixin, ListAPIView):
     queryset = AutoBodyType.objects.all()
     serializer_class = AutoBodyTypeSerializer
 
 
 @extend_schema(summary="Типы мотоциклов", description="Типы мотоциклов")
-class BikeBodyTypeListView(ListAPIView):
+class BikeBodyTypeListView(CachedListMixin, ListAPIView):
     queryset = BikeBodyType.objects.all()
     serializer_class = BikeBodyTypeSerializer
 
 
 @extend_schema(summary="Типы суден", description="Типы суден")
-class ShipTypeListView(ListAPIView):
+class ShipTypeListView(CachedListMixin, ListAPIView):
     queryset = ShipType.objects.all()
     serializer_class = ShipTypeSerializer
 
 
 @extend_schema(summary="Типы спецтехники", description="Типы спецтехники")
-class TechnicTypeListView(ListAPIView):
+class TechnicTypeListView(CachedListMixin, ListAPIView):
     queryset = TechnicType.objects.all()
     serializer_class = TechnicTypeSerializer
 
 
 @extend_schema(summary="Коробка передач мотоциклов", description="Коробка передач мотоциклов")
-class BikeTransmissionListView(ListAPIView):
+class BikeTransmissionListView(CachedListMixin, ListAPIView):
     queryset = BikeTransmission.objects.all()
     serializer_class = BikeTransmissionSerializer
 
 
 @extend_schema(summary="Классы транспорта", description="Классы транспорта")
-class VehicleClassListView(ListAPIView):
+class VehicleClassListView(CachedListMixin, ListAPIView):
     queryset = VehicleClass.objects.all()
     serializer_class = VehicleClassSerializer
 
@@ -684,7 +895,38 @@ VEHICLE_MODELS = {
 }
 
 
-class AllVehiclesPagination(LimitOffsetPagination):
+def hydrate_vehicles(rows):
+    """
+    Загружает объекты конкретных типов транспорта для строк страницы (id, polymorphic_ctype_id).
+    Для каждого типа выполняется один запрос с select_related/prefetch_related, исходный порядок сохраняется.
+    """
+    ids_by_ctype = defaultdict(list)
+    for row in rows:
+        ids_by_ctype[row['polymorphic_ctype_id']].append(row['id'])
+
+    vehicles = {}
+    for ctype_id, ids in ids_by_ctype.items():
+        model_cls = ContentType.objects.get_for_id(ctype_id).model_class()
+        queryset = (model_cls.objects.filter(id__in=ids)
+                    .select_related('brand', 'model', 'city', 'owner', 'owner__lessor')
+                    .prefetch_related('photos', 'availabilities', 'rent_prices'))
+        vehicles.update({vehicle.id: vehicle for vehicle in queryset})
+
+    return [vehicles[row['id']] for row in rows if row['id'] in vehicles]
+
+
+def serialize_vehicles(vehicles):
+    """ Сериализация списка транспорта сериализатором, соответствующим типу объекта """
+    serialized_data = []
+    for obj in vehicles:
+        for model_cls, serializer_cls in VEHICLE_MODELS.values():
+            if isinstance(obj, model_cls):
+                serialized_data.append(serializer_cls(obj).data)
+                break
+    return serialized_data
+
+
+class AllVehiclesPagination(VehicleCatalogPagination):
     default_limit = 10
     max_limit = 100
 
@@ -710,6 +952,10 @@ class AllVehiclesPagination(LimitOffsetPagination):
                                     description='Number of results to return.'),
                    OpenApiParameter('offset', type=int, location=OpenApiParameter.QUERY,
                                     description='The initial index from which to return the results.'),
+                   OpenApiParameter('pagination', type=OpenApiTypes.STR, enum=['cursor'],
+                                    description='Режим cursor: keyset-пагинация без подсчета общего количества'),
+                   OpenApiParameter('cursor', type=OpenApiTypes.STR,
+                                    description='Курсор следующей страницы из поля next (для pagination=cursor)'),
                    OpenApiParameter("lessor_id", type=OpenApiTypes.INT, description="ID арендодателя"),
                    OpenApiParameter("vehicle_type", type=OpenApiTypes.STR,
                                     enum=['auto', 'bike', 'ship', 'helicopter', 'specialtechnic'],
@@ -729,13 +975,15 @@ class AllVehiclesPagination(LimitOffsetPagination):
                                            "`price`, `-price`, "
                                            "`count_trip`, `-count_trip`, "
                                            "`average_rating`, `-average_rating`, "
-                                           "`created_at`, `-created_at`."
+                                           "`created_at`, `-created_at`, "
+                                           "`distance`, `-distance` (только вместе с lat и lon)."
                                    ),
                                    enum=[
                                        "price", "-price",
                                        "count_trip", "-count_trip",
                                        "average_rating", "-average_rating",
-                                       "created_at", "-created_at"
+                                       "created_at", "-created_at",
+                                       "distance", "-distance"
                                    ],
                                )
                            ],
@@ -743,86 +991,193 @@ class AllVehiclesPagination(LimitOffsetPagination):
 class AllVehiclesListView(ListAPIView):
     permission_classes = [AllowAny]
     pagination_class = AllVehiclesPagination
-    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, VehicleOrderingFilter]
     filterset_class = BaseFilter
-    ordering_fields = ['price', 'count_trip', 'average_rating', 'created_at']
+    ordering_fields = ['price', 'count_trip', 'average_rating', 'created_at', 'distance']
     ordering = ['-average_rating']
 
+    def get_ordering(self):
+        ordering = self.request.GET.get('ordering')
+        if ordering and ordering.lstrip('-') in self.ordering_fields:
+            return ordering
+        return self.ordering[0]
+
     def get_queryset(self):
+        """
+        Фильтрация, сортировка и пагинация выполняются одним запросом к базовой таблице Vehicle.
+        Возвращаются только id и тип транспорта, объекты страницы догружаются в list().
+        """
         request = self.request
         user = request.user
 
-        # если ordering передан — используем его, иначе из self.ordering
-        ordering = request.GET.get('ordering') or self.ordering[0]
+        queryset = annotate_price(Vehicle.objects.non_polymorphic())
 
         vehicle_type = request.GET.get('vehicle_type')
+        if vehicle_type:
+            config = VEHICLE_MODELS.get(vehicle_type.lower())
+            if config is None:
+                return queryset.none().values('id', 'polymorphic_ctype_id')
+            queryset = queryset.filter(polymorphic_ctype=ContentType.objects.get_for_model(config[0]))
 
-        models_to_query = VEHICLE_MODELS.items() if not vehicle_type else [
-            (vehicle_type.lower(), VEHICLE_MODELS.get(vehicle_type.lower()))
-        ]
+        # фильтрация по пользователю
+        if user.is_authenticated:
+            if hasattr(user, 'renter'):
+                queryset = queryset.filter(verified=True)
+            elif hasattr(user, 'lessor'):
+                queryset = queryset.filter(owner=user)
+            elif hasattr(user, 'manager'):
+                cities = user.manager.cities.all().values_list('id', flat=True)
+                if cities:
+                    queryset = queryset.filter(city__in=cities)
+        else:
+            queryset = queryset.filter(verified=True)
 
-        all_vehicles = []
-        for type_name, config in models_to_query:
-            if config is None:
-                continue
-            model_cls, _ = config
-
-            base_qs = model_cls.objects.all().annotate(price=Min('rent_prices__price'))
-
-            # фильтрация по пользователю
-            if user.is_authenticated:
-                if hasattr(user, 'renter'):
-                    base_qs = base_qs.filter(verified=True)
-                elif hasattr(user, 'lessor'):
-                    base_qs = base_qs.filter(owner=user)
-                elif hasattr(user, 'manager'):
-                    cities = user.manager.cities.all().values_list('id', flat=True)
-                    if cities:
-                        base_qs = base_qs.filter(city__in=cities)
-            else:
-                base_qs = base_qs.filter(verified=True)
-
-            # фильтрация по lessor_id
-            lessor_id = request.GET.get("lessor_id")
-            if lessor_id:
-                base_qs = base_qs.filter(owner__lessor__id=lessor_id)
-
-            # фильтрация через BaseFilter
-            filterset = self.filterset_class(request.GET, queryset=base_qs)
-            if filterset.is_valid():
-                base_qs = filterset.qs
-
-            base_qs = base_qs.prefetch_related(
-                'photos',
-                'availabilities',
-                'rent_prices',
-            ).select_related(
-                'brand', 'model', 'city', 'owner', 'owner__lessor'
-            )
+        # фильтрация по lessor_id
+        lessor_id = request.GET.get("lessor_id")
+        if lessor_id:
+            queryset = queryset.filter(owner__lessor__id=lessor_id)
 
-            base_qs = base_qs.order_by(ordering)
-            all_vehicles.extend(list(base_qs))
+        # фильтрация через BaseFilter
+        filterset = self.filterset_class(request.GET, queryset=queryset)
+        if filterset.is_valid():
+            queryset = filterset.qs
 
-        return sorted(
-            all_vehicles,
-            key=lambda obj: getattr(obj, ordering.strip('-')),
-            reverse=ordering.startswith('-')
-        )
+        ordering = self.get_ordering()
+        if ordering.lstrip('-') == 'distance' and 'distance' not in queryset.query.annotations:
+            ordering = self.ordering[0]
+        return (queryset.order_by(ordering, '-id' if ordering.startswith('-') else 'id')
+                .values('id', 'polymorphic_ctype_id', ordering.lstrip('-')))
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
         paginator = self.pagination_class()
         page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(build_vehicle_cards(row['id'] for row in page))
+
+
+@extend_schema(summary="Ближайший транспорт",
+               description="N ближайших к точке транспортных средств, отсортированных по расстоянию. "
+                           "Поиск выполняется по GiST-индексу ll_to_earth(latitude, longitude).",
+               parameters=[
+                   OpenApiParameter("lat", type=OpenApiTypes.NUMBER, required=True, description="Широта"),
+                   OpenApiParameter("lon", type=OpenApiTypes.NUMBER, required=True, description="Долгота"),
+                   OpenApiParameter("limit", type=OpenApiTypes.INT, description="Количество (по умолчанию 10, не более 100)"),
+                   OpenApiParameter("radius", type=OpenApiTypes.NUMBER, description="Ограничение радиуса в км"),
+                   OpenApiParameter("vehicle_type", type=OpenApiTypes.STR,
+                                    enum=['auto', 'bike', 'ship', 'helicopter', 'specialtechnic'],
+                                    description="Тип транспорта"),
+               ])
+class NearestVehiclesView(APIView):
+    permission_classes = [AllowAny]
+    default_limit = 10
+    max_limit = 100
+
+    def get(self, request):
+        try:
+            lat = float(request.query_params['lat'])
+            lon = float(request.query_params['lon'])
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+            radius = request.query_params.get('radius')
+            radius = float(radius) if radius else None
+        except (KeyError, ValueError, TypeError):
+            return Response({"detail": "Необходимо указать корректные lat и lon"}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Vehicle.objects.non_polymorphic().filter(
+            verified=True, latitude__isnull=False, longitude__isnull=False
+        )
+
+        vehicle_type = request.query_params.get('vehicle_type')
+        if vehicle_type:
+            config = VEHICLE_MODELS.get(vehicle_type.lower())
+            if config is None:
+                return Response([])
+            queryset = queryset.filter(polymorphic_ctype=ContentType.objects.get_for_model(config[0]))
+
+        if radius:
+            queryset = queryset.filter(within_radius(lat, lon, radius))
+
+        rows = list(queryset.annotate(distance=distance_km(lat, lon))
+                    .order_by(nearest_ordering(lat, lon))
+                    .values('id', 'polymorphic_ctype_id', 'distance')[:max(limit, 0)])
+        if radius:
+            rows = [row for row in rows if row['distance'] <= radius]
+
+        distances = {row['id']: row['distance'] for row in rows}
+        data = build_vehicle_cards(row['id'] for row in rows)
+        for item in data:
+            item['distance'] = round(distances[item['id']], 3)
+        return Response(data)
+
+
+@extend_schema(summary="Расчет стоимости аренды",
+               description="Предварительный расчет стоимости аренды транспорта без создания заявки. "
+                           "Возвращает выбранный тариф и стоимость по каждому тарифу транспорта.",
+               parameters=[
+                   OpenApiParameter("start_date", type=OpenApiTypes.DATE, required=True, description="Дата начала"),
+                   OpenApiParameter("end_date", type=OpenApiTypes.DATE, required=True, description="Дата окончания"),
+                   OpenApiParameter("start_time", type=OpenApiTypes.TIME, description="Время начала"),
+                   OpenApiParameter("end_time", type=OpenApiTypes.TIME, description="Время окончания"),
+                   OpenApiParameter("delivery", type=OpenApiTypes.BOOL, description="С доставкой"),
+               ])
+class RentQuoteView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, vehicle_id):
+        serializer = RentQuoteRequestSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
 
-        # Сериализация с разными сериализаторами в зависимости от типа объекта
-        serialized_data = []
-        for obj in page:
-            for model_cls, serializer_cls in VEHICLE_MODELS.values():
-                if isinstance(obj, model_cls):
-                    serialized_data.append(serializer_cls(obj).data)
-                    break
+        table = get_price_table(vehicle_id)
+        if table is None:
+            return Response({"error": "Транспорт не найден"}, status=status.HTTP_404_NOT_FOUND)
 
-        return paginator.get_paginated_response(serialized_data)
+        period_args = (table, data['start_date'], data['end_date'], data['start_time'], data['end_time'])
+        try:
+            quote = quote_rent(*period_args, delivery=data['delivery'])
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'vehicle_id': vehicle_id,
+            **quote,
+            'options': quote_options(*period_args),
+        })
+
+
+@extend_schema(summary="Календарь доступности",
+               description="Сетка дней по месяцам со статусами free / booked / on_request / unavailable, "
+                           "построенная из периодов доступности, принятых заявок и активных поездок.",
+               parameters=[
+                   OpenApiParameter("month", type=OpenApiTypes.STR,
+                                    description="Первый месяц в формате YYYY-MM (по умолчанию текущий)"),
+                   OpenApiParameter("months", type=OpenApiTypes.INT,
+                                    description="Количество месяцев (по умолчанию 1, не более 12)"),
+               ])
+class VehicleCalendarView(APIView):
+    permission_classes = [AllowAny]
+    max_months = 12
+    # Допустимый месяц начала календаря: не дальше max_years_range лет от текущего года
+    max_years_range = 5
+
+    def get(self, request, vehicle_id):
+        try:
+            month_param = request.query_params.get('month')
+            first = datetime.strptime(month_param, '%Y-%m') if month_param else timezone.localdate()
+            months = min(max(int(request.query_params.get('months', 1)), 1), self.max_months)
+        except ValueError:
+            return Response({"error": "Неверные month или months"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if abs(first.year - timezone.localdate().year) > self.max_years_range:
+            return Response({"error": f"month должен быть в пределах {self.max_years_range} лет от текущего года"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if not Vehicle.objects.non_polymorphic().filter(id=vehicle_id).exists():
+            return Response({"error": "Транспорт не найден"}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'vehicle_id': vehicle_id,
+            'months': get_calendar(vehicle_id, first.year, first.month, months),
+        })
 
 
 @extend_schema(summary="Удаление фото транспорта", description="Удаление фото транспорта по id")
@@ -847,16 +1202,14 @@ class VehiclePhotoDeleteView(APIView):
 
 class VehicleSearchViewSet(viewsets.ViewSet):
     pagination_class = LimitOffsetPagination
-
-    def get_serializer_for_model(self, model_class):
-        serializers = {
-            Auto: AutoListSerializer,
-            Bike: BikeListSerializer,
-            Ship: ShipListSerializer,
-            Helicopter: HelicopterListSerializer,
-            SpecialTechnic: SpecialTechnicListSerializer,
-        }
-        return serializers.get(model_class, VehicleSerializer)
+    similarity_threshold = 0.3
+    vehicle_type_mapping = {
+        'auto': Auto,
+        'bike': Bike,
+        'ship': Ship,
+        'helicopter': Helicopter,
+        'special_technic': SpecialTechnic
+    }
 
     @extend_schema(summary="Поиск транспорта",
                    parameters=[
@@ -873,7 +1226,12 @@ class VehicleSearchViewSet(viewsets.ViewSet):
                                                                                                      /vehicle-search/search/?q=поисковый_запрос&type=special_technic\n""")
     @action(detail=False, methods=['get'])
     def search(self, request):
-        query = request.query_params.get('q', '')
+        """
+        Ранжированный поиск одним запросом к базовой таблице Vehicle: полнотекстовое совпадение по
+        model.search_vector (GIN) плюс триграммная близость названий марки и модели.
+        Пагинация выполняется в SQL, объекты конкретных типов загружаются только для страницы.
+        """
+        query = request.query_params.get('q', '').strip()
         vehicle_type = request.query_params.get('type', None)
 
         if not query:
@@ -883,51 +1241,34 @@ class VehicleSearchViewSet(viewsets.ViewSet):
 
         query_parts = query.split()
         brand_query = query_parts[0]
-        model_query = " ".join(query_parts[1:])
-
-        matching_brands = VehicleBrand.objects.annotate(
-            similarity=TrigramSimilarity('name', brand_query)
-        ).filter(similarity__gt=0.3).order_by('-similarity')
-
-        matching_models = VehicleModel.objects.annotate(
-            similarity=TrigramSimilarity('name', model_query)
-        ).filter(similarity__gt=0.3).order_by('-similarity')
-
-        if matching_models.exists():
-            model_ids = matching_models.values_list('id', flat=True)
-            vehicle_query = Q(brand__in=matching_brands) & Q(model__in=matching_models)
-        else:
-            vehicle_query = Q(brand__in=matching_brands)
+        model_query = " ".join(query_parts[1:]) or query
 
-        vehicle_query &= Q(verified=True)
+        search_query = (SearchQuery(query, config='english', search_type='websearch') |
+                        SearchQuery(query, config='russian', search_type='websearch'))
 
-        vehicle_type_mapping = {
-            'auto': Auto,
-            'bike': Bike,
-            'ship': Ship,
-            'helicopter': Helicopter,
-            'special_technic': SpecialTechnic
-        }
+        queryset = Vehicle.objects.non_polymorphic().filter(verified=True)
+        if vehicle_type and vehicle_type in self.vehicle_type_mapping:
+            queryset = queryset.filter(
+                polymorphic_ctype=ContentType.objects.get_for_model(self.vehicle_type_mapping[vehicle_type])
+            )
 
-        all_vehicles = []
-        if vehicle_type and vehicle_type in vehicle_type_mapping:
-            model_class = vehicle_type_mapping[vehicle_type]
-            all_vehicles = model_class.objects.filter(vehicle_query)
-        else:
-            for model_class in vehicle_type_mapping.values():
-                all_vehicles.extend(model_class.objects.filter(vehicle_query))
+        queryset = (queryset
+                    .annotate(text_rank=SearchRank(F('model__search_vector'), search_query),
+                              brand_similarity=TrigramSimilarity('brand__name', brand_query),
+                              model_similarity=TrigramSimilarity('model__name', model_query))
+                    .filter(Q(model__search_vector=search_query) |
+                            Q(brand_similarity__gt=self.similarity_threshold))
+                    .annotate(rank=F('text_rank') + F('brand_similarity') + F('model_similarity'))
+                    .order_by('-rank', '-average_rating', 'id')
+                    .values('id', 'polymorphic_ctype_id'))
 
         paginator = self.pagination_class()
-        paginated_vehicles = paginator.paginate_queryset(all_vehicles, request)
+        paginated_vehicles = paginator.paginate_queryset(queryset, request)
 
         if paginated_vehicles is None:
             return Response({"vehicles": []})
 
-        result = []
-        for vehicle in paginated_vehicles:
-            serializer = self.get_serializer_for_model(type(vehicle))
-            result.append(serializer(vehicle).data)
-
+        result = build_vehicle_cards(row['id'] for row in paginated_vehicles)
         return paginator.get_paginated_response(result)
 
     @extend_schema(summary="Автозаполнение поисковой строки", description="Автозаполнение поисковой строки")
@@ -937,17 +1278,7 @@ class VehicleSearchViewSet(viewsets.ViewSet):
         if not query:
             return Response({"suggestions": []})
 
-        exact_brand = VehicleBrand.objects.filter(name__iexact=query).first()
-        if exact_brand:
-            models = VehicleModel.objects.filter(brand=exact_brand).values_list('name', flat=True)
-            return Response({"suggestions": [f"{exact_brand.name} {model}" for model in models]})
-
-        matching_brands = VehicleBrand.objects.annotate(
-            similarity=TrigramSimilarity('name', query)
-        ).filter(similarity__gt=0.3).order_by('-similarity')[:5]
-
-        suggestions = [brand.name for brand in matching_brands]
-        return Response({"suggestions": suggestions})
+        return Response({"suggestions": get_autocomplete_index().suggest(query)})
 
 
 @extend_schema(summary="Удаление документа", description="Удаление документа")